@@ -0,0 +1,53 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from os import path
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from classification_engines.gower_nmds_classification import GowerNMDS
+from classification_engines.embedding import stress
+
+#runtime and stress of every embedding of the GowerNMDS engine on synthetic records like the
+#features of the examples: numeric columns and a categorical one, with a few outliers
+
+def records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'bytes': rng.normal(500, 50, n).round(),
+        'entropy': rng.random(n) * 4,
+        'numbers': rng.integers(0, 5, n),
+        'tld': pd.Series(rng.choice(['com', 'net', 'org'], n), dtype=object)
+    })
+    outliers = rng.choice(n, max(n // 100, 1), replace=False)
+    df.loc[outliers, 'bytes'] = 5000
+    return df
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', help='Number of records of every run', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--embeddings', nargs='+', default=GowerNMDS.embeddings, choices=GowerNMDS.embeddings)
+    parser.add_argument('--landmarks', type=int, default=200)
+    args = parser.parse_args()
+    console = Console()
+    table = Table(title='2D embeddings')
+    for column in ['Records', 'Embedding', 'Time (s)', 'Stress']:
+        table.add_column(column, justify='left' if column == 'Embedding' else 'right')
+    for n in args.sizes:
+        df = records(n)
+        for embedding in args.embeddings:
+            engine = GowerNMDS(embedding=embedding, landmarks=args.landmarks)
+            engine.setup(df, np.ones(len(df.columns)))
+            start = time.perf_counter()
+            points = engine.embed()
+            elapsed = time.perf_counter() - start
+            table.add_row(str(n), embedding, '%.3f' % elapsed, '%.4f' % stress(engine.raw_matrix_, points))
+            console.print('%d records, %s: %.3fs' % (n, embedding, elapsed), style='khaki3')
+    console.print(table)
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,13 @@ import pickle
 import argparse
 
 import data_drivers as drivers
+import telemetry
 
 
 from feature_engine.feature_engine import FeatureEngine
+from feature_engine.feature_cache import FeatureCache
 from classification_engines import gower_nmds_classification
+from classification_engines import gower_knn_classification
 from report import Report
 from rich.console import Console
 from rich.panel import Panel
@@ -41,7 +44,17 @@ class Anomal():
         parser.add_argument('-in', '--input-file', help='Specify name of the input that inside the base folder')
         parser.add_argument('-out', '--output-file', help='Specify the name of the output data inside the base folder')
         parser.add_argument('-ff', '--features-file', help='Specify the name of the file in the base folder that has the features')
+        parser.add_argument('--chunksize', help='Stream static inputs in chunks of this many rows to bound memory usage', type=int)
         parser.add_argument('--collection-time', help='Specify the overall time to collect data in real time drivers', type=float)
+        parser.add_argument('--batch-size', help='Maximum number of records processed together by real time drivers', type=int)
+        parser.add_argument('--batch-timeout', help='Seconds real time drivers wait to fill a batch', type=float)
+        parser.add_argument('--buffer-capacity', help='Maximum number of records buffered by real time drivers', type=int)
+        parser.add_argument('--overflow-policy', help='What real time drivers do with new records when the buffer is full', choices=['block', 'drop_oldest', 'drop_newest'])
+        parser.add_argument('--framing', help='How records are delimited in TCP streams', choices=['ndjson', 'length_prefixed'])
+        parser.add_argument('--payload-format', help='Format of the datagrams received by the UDP driver', choices=['auto', 'json', 'syslog'])
+        parser.add_argument('--wal-path', help='Folder of the write-ahead log of the records received by real time drivers, inside the base folder')
+        parser.add_argument('--window-size', help='Classify real time inputs continuously in windows of this many seconds', type=float)
+        parser.add_argument('--window-step', help='Seconds between the start of consecutive windows, the window size by default', type=float)
         parser.add_argument('--tcp-in-host', help='Specify the host of a real time driver')
         parser.add_argument('--tcp-in-port', help='Specify the port of a real time driver', type=int)
         parser.add_argument('-sF', help='Save feature engine result', action='store_true')
@@ -49,6 +62,17 @@ class Anomal():
         parser.add_argument('-sFC', help='Save both feature and classification engines result', action='store_true')
         parser.add_argument('-p', '--report-port', help='Select the port on which the report will run', nargs='?', type=int, default=8080)
         parser.add_argument('--no-ui', help='Use the system without the tui', action='store_true')
+        parser.add_argument('-w', '--workers', help='Number of worker processes used to compute metrics and flags', type=int)
+        parser.add_argument('--dedup', help='Call per-record metrics and flags once per distinct input value', action='store_true')
+        parser.add_argument('--cache', help='Keep computed metrics in the feature cache for the next runs', action='store_true')
+        parser.add_argument('--no-cache', help='Bypass the feature cache and compute every metric', action='store_true')
+        parser.add_argument('--clear-cache', help='Remove every entry of the feature cache before running', action='store_true')
+        parser.add_argument('--cache-size', help='Maximum size of the feature cache in MB', type=int)
+        parser.add_argument('--profile', help='Profile every stage of the feature engine and save the results as json, the stages of a level run one at a time', action='store_true')
+        parser.add_argument('--gower-backend', help='Where the Gower distances are kept: in memory, in a memory-mapped file or only the upper triangle', choices=['condensed', 'dense', 'memmap'])
+        parser.add_argument('--embedding', help='How the 2D representation of the report is computed', choices=['nmds', 'classical', 'landmark'])
+        parser.add_argument('--metrics-port', help='Expose ingestion and pipeline metrics in the Prometheus format on this port', type=int)
+        parser.add_argument('--explain', help='Print the execution plan of the features file and exit', action='store_true')
         return parser
 
     def arg_check(self, param, msg):
@@ -111,6 +135,15 @@ class Anomal():
         elif arg == 'TCP':
             if input_type:
                 return drivers.TCPDriver.TCPInputDriver(), True
+        elif arg == 'ASYNCTCP':
+            if input_type:
+                return drivers.AsyncTCPDriver.AsyncTCPInputDriver(), True
+        elif arg == 'REPLAY':
+            if input_type:
+                return drivers.ReplayDriver.ReplayInputDriver(), False
+        elif arg == 'UDP':
+            if input_type:
+                return drivers.UDPDriver.UDPInputDriver(), True
         elif arg == 'TERMINAL':
             if not input_type:
                 return drivers.TerminalDriver.TerminalOutputDriver(), False
@@ -119,9 +152,9 @@ class Anomal():
 
     def setup_drivers(self, config, base_folder, in_driver, in_driver_name, out_driver, out_driver_name):
         try:
-            if in_driver_name == 'CSV':
-                in_driver.setup(base_folder + self.args['input_file'] if config == None else base_folder + config['data']['in_path'])
-            elif in_driver_name == 'TCP':
+            if in_driver_name in ['CSV', 'REPLAY']:
+                in_driver.setup(base_folder + self.args['input_file'] if config == None else base_folder + config['data']['in_path'], self.get_chunksize(config))
+            elif in_driver_name in ['TCP', 'ASYNCTCP']:
                 if config == None:
                     self.arg_check(self.args['collection-time'], 'Collection Time not provided')
                     self.arg_check(self.args['collection_time'] > 0, 'Collection Time lower than zero')
@@ -129,9 +162,20 @@ class Anomal():
                     self.arg_check(self.args['tcp_in_port'], 'TCP port not provided')
                     self.arg_check(self.args['tcp_in_port'] > 0, 'TCP port has to be greater than 0')
                     self.arg_check(self.args['tcp_in_port'] < 65536, 'TCP port has to be lower than 65536')
-                    in_driver.setup(self.args['tcp_in_host'], self.args['tcp_in_port'], self.args['--collection-time'])
+                    in_driver.setup(self.args['tcp_in_host'], self.args['tcp_in_port'], self.args['--collection-time'], *self.get_batching(config), *self.get_buffering(config), *self.get_framing(config))
+                else:
+                    in_driver.setup(config['data']['host'], int(config['data']['port']), float(config['data']['collection_time']), *self.get_batching(config), *self.get_buffering(config), *self.get_framing(config))
+            elif in_driver_name == 'UDP':
+                if config == None:
+                    self.arg_check(self.args['collection_time'], 'Collection Time not provided')
+                    self.arg_check(self.args['tcp_in_host'], 'UDP host not provided')
+                    self.arg_check(self.args['tcp_in_port'], 'UDP port not provided')
+                    self.arg_check(0 < self.args['tcp_in_port'] < 65536, 'UDP port has to be between 1 and 65535')
+                    in_driver.setup(self.args['tcp_in_host'], self.args['tcp_in_port'], self.args['collection_time'], *self.get_batching(config), *self.get_buffering(config), self.get_payload_format(config))
                 else:
-                    in_driver.setup(config['data']['host'], int(config['data']['port']), float(config['data']['collection_time']))
+                    in_driver.setup(config['data']['host'], int(config['data']['port']), float(config['data']['collection_time']), *self.get_batching(config), *self.get_buffering(config), self.get_payload_format(config))
+            log = self.get_log(config, base_folder)
+            if log is not None and in_driver_name in ['TCP', 'ASYNCTCP', 'UDP']: in_driver.setup_log(*log)
         except Exception as e:
             exit('Something went wrong reading input driver from config file, check it again please')
         try:
@@ -151,9 +195,99 @@ class Anomal():
             exit("Something failed when trying to connect to the output database. Please check again")
         return in_driver, out_driver
 
-    def get_classification_engine_instance(self, engine):
+    def get_chunksize(self, config):
+        if self.args['chunksize']:
+            return self.args['chunksize']
+        if config != None and 'chunksize' in config['data']:
+            return int(config['data']['chunksize'])
+        return None
+
+    #records per micro-batch and seconds to wait for them in real time drivers
+    def get_batching(self, config):
+        data = config['data'] if config != None else {}
+        batch_size = self.args['batch_size'] if self.args['batch_size'] else int(data.get('batch_size', 1000))
+        batch_timeout = self.args['batch_timeout'] if self.args['batch_timeout'] is not None else float(data.get('batch_timeout', 0.1))
+        return batch_size, batch_timeout
+
+    #size of the buffer of real time drivers and what to do when it is full
+    def get_buffering(self, config):
+        data = config['data'] if config != None else {}
+        capacity = self.args['buffer_capacity'] if self.args['buffer_capacity'] else int(data.get('buffer_capacity', 100000))
+        policy = self.args['overflow_policy'] if self.args['overflow_policy'] else data.get('overflow_policy', 'block')
+        return capacity, policy
+
+    #how records are delimited in TCP streams and the longest record accepted
+    def get_framing(self, config):
+        data = config['data'] if config != None else {}
+        framing = self.args['framing'] if self.args['framing'] else data.get('framing', 'ndjson')
+        return framing, int(data.get('max_record_bytes', 1048576))
+
+    def get_payload_format(self, config):
+        if self.args['payload_format']:
+            return self.args['payload_format']
+        return config['data'].get('payload_format', 'auto') if config != None else 'auto'
+
+    #folder, segment size and sync interval of the write-ahead log, None if it is not used
+    def get_log(self, config, base_folder):
+        data = config['data'] if config != None else {}
+        folder = self.args['wal_path'] if self.args['wal_path'] else data.get('wal_path')
+        if not folder: return None
+        return base_folder + folder, int(data.get('wal_segment_size_mb', 64)) * 2**20, float(data.get('wal_sync_interval', 1.0))
+
+    #window size and step in seconds, None if the windowed mode is not used
+    def get_windowing(self, config):
+        data = config['data'] if config != None else {}
+        size = self.args['window_size'] if self.args['window_size'] else data.get('window_size')
+        if size is None: return None
+        step = self.args['window_step'] if self.args['window_step'] else data.get('window_step', size)
+        return float(size), float(step)
+
+    def get_workers(self, config):
+        if self.args['workers']:
+            return self.args['workers']
+        if config != None and 'workers' in config['setup']:
+            return int(config['setup']['workers'])
+        return 1
+
+    def get_dedup(self, config):
+        if self.args['dedup']:
+            return True
+        return config != None and bool(config['setup'].get('dedup_metrics', False))
+
+    #the cache is only used when it is asked for, but it can be cleared anyway
+    def get_feature_cache(self, config):
+        setup = config['setup'] if config != None else {}
+        enabled = (self.args['cache'] or bool(setup.get('cache', False))) and not self.args['no_cache']
+        folder = self.base_folder + setup.get('cache_folder', '.anomal_cache/')
+        if not enabled and not (self.args['clear_cache'] and path.isdir(folder)):
+            return None
+        size_mb = self.args['cache_size'] if self.args['cache_size'] else int(setup.get('cache_size_mb', 1024))
+        cache = FeatureCache(folder, size_mb * 1024 * 1024)
+        if self.args['clear_cache']:
+            self.console.print('Clearing feature cache', style='khaki3')
+            cache.clear()
+        return cache if enabled else None
+
+    def get_classification_engine_instance(self, engine, config=None):
         if engine == 'Gower':
-            return gower_nmds_classification.GowerNMDS()
+            return gower_nmds_classification.GowerNMDS(*self.get_gower_settings(config))
+        if engine == 'GowerKNN':
+            return gower_knn_classification.GowerKNN(*self.get_knn_settings(config))
+
+    #where the distances are kept, rows per tile, folder of the memory-mapped matrices,
+    #processes that compute them and how the 2D representation is computed
+    def get_gower_settings(self, config):
+        setup = config['setup'] if config != None else {}
+        backend = self.args['gower_backend'] if self.args['gower_backend'] else setup.get('gower_backend', 'condensed')
+        memmap_folder = self.base_folder + setup['gower_memmap_folder'] if 'gower_memmap_folder' in setup else None
+        embedding = self.args['embedding'] if self.args['embedding'] else setup.get('embedding', 'nmds')
+        return backend, int(setup.get('gower_tile_rows', 1024)), memmap_folder, int(setup.get('gower_workers', 1)), embedding, int(setup.get('landmarks', 500))
+
+    #neighbours per record, rows per tile, fraction of records labelled as anomalies, how the
+    #score is computed and landmarks of the 2D representation
+    def get_knn_settings(self, config):
+        setup = config['setup'] if config != None else {}
+        return int(setup.get('knn_k', 10)), int(setup.get('gower_tile_rows', 1024)), float(setup.get('knn_contamination', 0.05)), setup.get('knn_score', 'mean'), int(setup.get('landmarks', 500))
 
     def open_yaml(self, path):
         try:
@@ -171,20 +305,89 @@ class Anomal():
             return np.array(weights)
         return None
 
-    def get_classification_engine(self, base_folder, config, df):
-        #get name of engine
+    #name of the engine and the file its weights are read from
+    def get_classification_settings(self, config):
         if config != None:
-            engine_name = config['setup']['classification_engine']
-            weights_param = config['features']['path']
-        else:
-            engine_name = self.args['class_engine']
-            weights_param = self.args['features_file']
-        classification_engine = self.get_classification_engine_instance(engine_name)
-        weights = self.parse_features_weights(base_folder, weights_param)
+            return config['setup']['classification_engine'], config['features']['path']
+        return self.args['class_engine'], self.args['features_file']
+
+    def get_classification_engine(self, base_folder, config, df, weights=None):
+        #get name of engine
+        engine_name, weights_param = self.get_classification_settings(config)
+        classification_engine = self.get_classification_engine_instance(engine_name, config)
+        if weights is None: weights = self.parse_features_weights(base_folder, weights_param)
         #setup the engine
-        classification_engine.setup(df, weights)
+        with telemetry.classification_seconds.time():
+            classification_engine.setup(df, weights)
+        telemetry.classified_records.inc(len(df))
         return classification_engine
 
+    #port of the metrics endpoint, None if it is disabled
+    def get_metrics_port(self, config):
+        if self.args['metrics_port'] is not None:
+            return self.args['metrics_port']
+        if config != None and 'metrics_port' in config['setup']:
+            return int(config['setup']['metrics_port'])
+        return None
+
+    def start_metrics_server(self, config, in_driver):
+        port = self.get_metrics_port(config)
+        if port is None: return None
+        if hasattr(in_driver, 'register_metrics'): in_driver.register_metrics(telemetry.registry)
+        server = telemetry.MetricsServer(telemetry.registry, 'localhost', port)
+        try:
+            server.start()
+        except OSError as e:
+            self.console.print('Metrics endpoint could not be started: %s' % e, style='khaki3')
+            return None
+        self.console.print('Metrics available at localhost:%d/metrics' % server.port, style='khaki3')
+        return server
+
+    #classify every window and save its results until interrupted
+    def run_windowed(self, config, feature_engine, features_file, in_driver, out_driver, window_size, window_step):
+        self.console.print('Classifying windows of %gs every %gs, press Ctrl+C to stop' % (window_size, window_step), style='khaki3')
+        #the weights don't change between windows
+        weights = self.parse_features_weights(self.base_folder, self.get_classification_settings(config)[1])
+        classification_engine = None
+        try:
+            for window, df, flags_results in feature_engine.run_windowed(self.base_folder + features_file, window_size, window_step):
+                flagged = sum(len(f['result']) for f in flags_results if hasattr(f['result'], '__len__'))
+                self.console.print('Window %d: %d records, %d flagged' % (window, len(df) if df is not None else 0, flagged), style='indian_red')
+                #a window needs at least two records to be clustered
+                if df is not None and len(df) > 1:
+                    classification_engine = self.slide_classification_engine(config, classification_engine, df, weights)
+                    Zd, clusters = classification_engine.calculate_linkage()
+                    result = df.assign(cluster=clusters)
+                    if getattr(classification_engine, 'scores_', None) is not None: result['score'] = classification_engine.scores_
+                    out_driver.save(result, 'window_%d_behavior_analysis.csv' % window)
+                for f in flags_results:
+                    if isinstance(f['result'], pd.DataFrame) and len(f['result']) > 0:
+                        out_driver.save(f['result'], 'window_%d_%s.csv' % (window, f['name']))
+        except KeyboardInterrupt:
+            self.console.print('Stopping', style='khaki3')
+        finally:
+            feature_engine.shutdown_workers()
+            in_driver.disconnect()
+            out_driver.disconnect()
+
+    #the engine of the previous window is reused when it can drop and add rows: the records of
+    #the step the window left behind are dropped and only the distances of the new step are
+    #computed. Anything else is classified from scratch
+    def slide_classification_engine(self, config, engine, df, weights):
+        previous = engine.data_ if engine is not None and hasattr(engine, 'drop_first') else None
+        if previous is None or not df.index.is_unique or not previous.columns.equals(df.columns):
+            return self.get_classification_engine(self.base_folder, config, df, weights)
+        kept = previous.index.isin(df.index)
+        dropped = int(np.argmax(kept)) if kept.any() else len(previous)
+        shared = len(previous) - dropped
+        if shared == 0 or not previous.index[dropped:].equals(df.index[:shared]):
+            return self.get_classification_engine(self.base_folder, config, df, weights)
+        with telemetry.classification_seconds.time():
+            engine.drop_first(dropped)
+            engine.append(df.iloc[shared:])
+        telemetry.classified_records.inc(len(df) - shared)
+        return engine
+
     def print_banner(self):
         logo = '''
                                                                                                                             
@@ -234,9 +437,26 @@ class Anomal():
         features_file = self.extract_paths(config)[2]
         #instantiate feature engine
         self.console.print('Starting Feature Engine', style='khaki3')
-        feature_engine = FeatureEngine(in_driver, out_driver, in_real_time, self.base_folder + features_file, self.args['sF'] or self.args['sFC'], self.console, True)
+        feature_engine = FeatureEngine(in_driver, out_driver, in_real_time, self.base_folder + features_file, self.args['sF'] or self.args['sFC'], self.console, True, self.get_workers(config), self.get_dedup(config), self.get_feature_cache(config) if not in_real_time else None, self.args['profile'])
+        if self.args['explain']:
+            feature_engine.explain(self.base_folder + features_file)
+            in_driver.disconnect()
+            return
+        self.start_metrics_server(config, in_driver)
+        windowing = self.get_windowing(config)
+        if in_real_time and windowing is not None:
+            return self.run_windowed(config, feature_engine, features_file, in_driver, out_driver, *windowing)
         #run feature engine, get new dataframe
         df_original, df, flags_results = feature_engine.run(self.base_folder + features_file)
+        if in_real_time and getattr(in_driver, 'buffer', None) is not None:
+            stats = in_driver.buffer.stats()
+            self.console.print('Input buffer: %d accepted, %d dropped, high-water mark %d' % (stats['accepted'], stats['dropped'], stats['high_water_mark']), style='khaki3')
+            if hasattr(in_driver, 'kernel_drops') and in_driver.kernel_drops > 0: self.console.print('%d datagrams dropped by the socket, increase the receive buffer (net.core.rmem_max)' % in_driver.kernel_drops, style='khaki3')
+            if in_driver.parse_errors > 0: self.console.print('%d records could not be decoded' % in_driver.parse_errors, style='khaki3')
+            if len(in_driver.batch_decoder.extra_keys) > 0: self.console.print('Fields ignored because they were not in the first records: %s' % ', '.join(sorted(in_driver.batch_decoder.extra_keys)), style='khaki3')
+        if self.args['profile']:
+            feature_engine.profiler.save(self.base_folder + 'feature_engine_profile.json')
+            self.console.print('Profile saved to %s' % (self.base_folder + 'feature_engine_profile.json'), style='khaki3')
         #Start Classification Engine
         self.console.print('Starting Classification Engine', style='indian_red')
         #Get already started classification engine
@@ -244,14 +464,19 @@ class Anomal():
             classification_engine = self.get_classification_engine(self.base_folder, config, df)
             #Save classification engine's results
             if self.args['sC'] or self.args['sFC']:
-                out_driver.save(classification_engine.matrix_to_dataframe, 'classification_result.csv')
+                out_driver.save(classification_engine.matrix_to_dataframe(), 'classification_result.csv')
         else:
             self.console.print('No features found, skipping Classification Engine')
             classification_engine = None
         self.console.print('Creating Report', style='spring_green2')
-        report = Report(df, df_original, classification_engine, flags_results)
+        #when streaming, the suspects are read again from the input instead of keeping every record
+        original_loader = in_driver.get_rows if df_original is None and not in_real_time else None
+        report = Report(df, df_original, classification_engine, flags_results, original_loader)
         self.console.print('Creating diagrams', style='spring_green2')
         if df is not None: report.bake_data()
+        #the results were saved and the report was built, the records of the collection don't
+        #have to be read again from the write-ahead log
+        if in_real_time and hasattr(in_driver, 'commit'): in_driver.commit()
         self.console.print('Report available at localhost:%d'% self.args['report_port'], style='spring_green2')
         environ['PYWEBIO_SCRIPT_MODE_PORT'] = str(self.args['report_port'])
         report.start()
@@ -0,0 +1,59 @@
+import numpy as np
+from scipy.sparse.linalg import eigsh
+
+#fast 2D representations of a distance matrix, alternatives to the non-metric MDS of sklearn.
+#Both are deterministic and don't iterate over the whole matrix
+
+#classical (Torgerson) MDS: the coordinates are the top eigenvectors of the double centered
+#matrix of squared distances, only the k largest ones are computed
+def classical_mds(distances, k=2):
+    n = distances.shape[0]
+    B = np.square(distances, dtype=np.float64)
+    row_means = B.mean(axis=1)
+    B -= row_means[:, None]
+    B -= row_means[None, :]
+    B += row_means.mean()
+    B *= -0.5
+    values, vectors = top_eigenvectors(B, k)
+    return coordinates(values, vectors, n, k)
+
+#landmark MDS: classical MDS of a few landmark rows, the rest are placed from their distances
+#to the landmarks. rows(indexes) returns the distances from those rows to every row, so only
+#landmarks x n distances are read
+def landmark_mds(rows, n, landmarks=500, k=2, seed=0):
+    if n <= landmarks: return classical_mds(rows(np.arange(n)), k)
+    chosen = np.sort(np.random.default_rng(seed).choice(n, landmarks, replace=False))
+    squared = np.square(rows(chosen), dtype=np.float64)
+    landmark_squared = squared[:, chosen]
+    means = landmark_squared.mean(axis=0)
+    B = landmark_squared - landmark_squared.mean(axis=1)[:, None] - means[None, :] + means.mean()
+    values, vectors = top_eigenvectors(-0.5 * B, k)
+    #every row is placed by triangulation with the pseudoinverse of the landmark coordinates
+    positive = values > 0
+    pseudoinverse = np.zeros((k, landmarks))
+    pseudoinverse[positive] = (vectors[:, positive] / np.sqrt(values[positive])).T
+    return -0.5 * (squared - means[:, None]).T @ pseudoinverse.T
+
+def top_eigenvectors(B, k):
+    #eigsh needs k to be smaller than the size of the matrix
+    if B.shape[0] <= k + 1:
+        values, vectors = np.linalg.eigh(B)
+    else:
+        values, vectors = eigsh(B, k=k, which='LA', v0=np.ones(B.shape[0]))
+    order = np.argsort(values)[::-1][:k]
+    return values[order], vectors[:, order]
+
+def coordinates(values, vectors, n, k):
+    out = np.zeros((n, k))
+    kept = min(k, len(values))
+    out[:, :kept] = vectors[:, :kept] * np.sqrt(np.clip(values[:kept], 0, None))
+    return out
+
+#Kruskal's stress-1 of an embedding, how much its distances differ from the original ones. The
+#embedding is scaled first, non-metric embeddings only keep the order of the distances
+def stress(distances, points):
+    upper = np.triu_indices(distances.shape[0], 1)
+    original = distances[upper].astype(np.float64)
+    embedded = np.sqrt(np.square(points[upper[0]] - points[upper[1]]).sum(axis=1))
+    scale = (original * embedded).sum() / np.square(embedded).sum() if embedded.any() else 0.0
+    return np.sqrt(np.square(original - scale * embedded).sum() / np.square(original).sum())
@@ -0,0 +1,128 @@
+import numpy as np
+from gower.gower_dist import gower_get
+
+#the steps of gower.gower_matrix split apart, so blocks of the matrix can be computed separately
+#with exactly the same values as the whole matrix
+
+#columns without a numeric dtype are compared as categories. Unlike gower, pandas extension
+#dtypes like strings are accepted (as categories)
+def categorical_features(df):
+    return np.array([not (isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.number)) for dtype in df.dtypes])
+
+#min and max of every numeric column, as gower computes them
+def numeric_bounds(Z_num):
+    mins = np.zeros(Z_num.shape[1])
+    maxs = np.zeros(Z_num.shape[1])
+    for col in range(Z_num.shape[1]):
+        col_array = Z_num[:, col].astype(np.float32)
+        if len(col_array) == 0: continue
+        col_max, col_min = np.nanmax(col_array), np.nanmin(col_array)
+        maxs[col] = 0.0 if np.isnan(col_max) else col_max
+        mins[col] = 0.0 if np.isnan(col_min) else col_min
+    return mins, maxs
+
+#ranges of the numeric columns relative to their max, numeric values are divided by the max.
+#Computed in float32 like gower does
+def numeric_ranges(mins, maxs):
+    return np.array([np.abs(1 - np.float32(mn) / np.float32(mx)) if mx != 0 else 0.0 for mn, mx in zip(mins, maxs)])
+
+#everything needed to compare rows of the data. Z is the data as an array, like gower uses it
+class GowerState():
+
+    cat_features = None
+    weight = None
+    mins = None
+    maxs = None
+    ranges = None
+    Z_cat = None
+    Z_num = None
+
+    def __init__(self, Z, cat_features, weight, mins=None, maxs=None):
+        self.cat_features = cat_features
+        self.weight = weight if weight is not None else np.ones(Z.shape[1])
+        Z_num = Z[:, np.logical_not(cat_features)]
+        if mins is None: mins, maxs = numeric_bounds(Z_num)
+        self.mins, self.maxs = mins, maxs
+        self.ranges = numeric_ranges(mins, maxs)
+        self.Z_num = np.divide(Z_num, maxs, out=np.zeros_like(Z_num), where=maxs != 0)
+        self.Z_cat = Z[:, cat_features]
+
+    #distances from row i to the rows in rows (a slice or an index array)
+    def row_distances(self, i, rows):
+        return gower_get(self.Z_cat[i, :], self.Z_num[i, :], self.Z_cat[rows], self.Z_num[rows],
+                         self.weight[self.cat_features], self.weight[np.logical_not(self.cat_features)],
+                         self.weight.sum(), self.cat_features, self.ranges, self.maxs)
+
+    #distances between the rows in rows_x and the ones in rows_y (ranges)
+    def block(self, rows_x, rows_y):
+        out = np.zeros((len(rows_x), len(rows_y)), dtype=np.float32)
+        y = slice(rows_y.start, rows_y.stop)
+        for k, i in enumerate(rows_x):
+            out[k, :] = self.row_distances(i, y)
+        return out
+
+    #the whole symmetric matrix, only computing the upper triangle like gower_matrix. It is
+    #written tile_rows rows at a time into out, which can be a memory-mapped file, and the lower
+    #triangle is copied from the upper one a tile at a time
+    def matrix(self, out=None, tile_rows=1024):
+        n = self.Z_cat.shape[0]
+        if out is None: out = np.zeros((n, n), dtype=np.float32)
+        for start, stop in row_tiles(n, tile_rows):
+            for i in range(start, stop):
+                out[i, i:] = self.row_distances(i, slice(i, n))
+        return mirror(out, tile_rows)
+
+    #the upper triangle in condensed form (like squareform) and the diagonal, tile_rows rows at a
+    #time. out can be a memory-mapped file
+    def condensed(self, out=None, tile_rows=1024):
+        n = self.Z_cat.shape[0]
+        if out is None: out = np.zeros(n * (n - 1) // 2, dtype=np.float32)
+        diagonal = np.zeros(n, dtype=np.float32)
+        for start, stop in row_tiles(n, tile_rows):
+            for i in range(start, stop):
+                res = self.row_distances(i, slice(i, n))
+                diagonal[i] = res[0]
+                out[condensed_start(n, i):condensed_start(n, i + 1)] = res[1:]
+        return out, diagonal
+
+
+#ranges of tile_rows rows covering n rows
+def row_tiles(n, tile_rows):
+    return [(start, min(start + tile_rows, n)) for start in range(0, n, tile_rows)]
+
+#copy the upper triangle of a square matrix to the lower one, a tile of rows at a time
+def mirror(out, tile_rows=1024):
+    for start, stop in row_tiles(out.shape[0], tile_rows):
+        out[start:stop, :start] = out[:start, start:stop].T
+        tile = np.asarray(out[start:stop, start:stop])
+        out[start:stop, start:stop] = np.triu(tile) + np.triu(tile, 1).T
+    return out
+
+#position in the condensed form of the distance between row i and row i + 1. The distances from
+#row i to the next rows follow it
+def condensed_start(n, i):
+    return n * i - i * (i + 1) // 2
+
+#rows of the square matrix from its condensed form and diagonal, without expanding the rest
+def expand_rows(condensed, diagonal, rows):
+    n = len(diagonal)
+    rows = np.asarray(rows)
+    out = np.empty((len(rows), n), dtype=condensed.dtype)
+    j = np.arange(n)
+    for k, i in enumerate(rows):
+        #distances to the previous rows are in their part of the condensed form
+        out[k, :i] = condensed[condensed_start(n, j[:i]) + (i - j[:i] - 1)]
+        out[k, i] = diagonal[i]
+        out[k, i + 1:] = condensed[condensed_start(n, i):condensed_start(n, i + 1)]
+    return out
+
+#condensed form of a square matrix, tile_rows rows at a time so a memory-mapped matrix is never
+#read at once
+def condense(matrix, tile_rows=1024):
+    n = matrix.shape[0]
+    out = np.empty(n * (n - 1) // 2, dtype=matrix.dtype)
+    for start, stop in row_tiles(n, tile_rows):
+        block = np.asarray(matrix[start:stop])
+        for k, i in enumerate(range(start, stop)):
+            out[condensed_start(n, i):condensed_start(n, i + 1)] = block[k, i + 1:]
+    return out
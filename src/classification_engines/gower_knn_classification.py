@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from .gower_blocks import GowerState, categorical_features, numeric_bounds, row_tiles
+from .embedding import landmark_mds
+
+#scores every record by the gower distances to its k nearest neighbours, records far from any
+#other record are the anomalies. The distances are computed a tile of rows at a time, only the
+#upper triangle like the condensed matrix, and every tile is reduced to the k nearest neighbours
+#of its rows (and of the rows after it) before the next one, so only n x k distances are kept
+class GowerKNN():
+
+    #how the score of a record is computed from the distances to its neighbours:
+    #   mean: mean distance to the k nearest neighbours
+    #   kth: distance to the k-th nearest neighbour
+    scores = ['mean', 'kth']
+
+    weights_ = None
+    features_vectors_ = None
+    data_ = None
+    state_ = None
+    neighbors_ = None #positions of the k nearest neighbours of every row, nearest first
+    distances_ = None #distances to them
+    scores_ = None #anomaly score of every row, higher is more anomalous
+    k_ = 10
+    tile_rows_ = 1024
+    contamination_ = 0.05
+    score_ = 'mean'
+    landmarks_ = 500
+
+    #contamination is the fraction of records labelled as anomalies
+    def __init__(self, k=10, tile_rows=1024, contamination=0.05, score='mean', landmarks=500):
+        if k <= 0:
+            raise ValueError('Please provide a valid number of neighbours')
+        if tile_rows <= 0:
+            raise ValueError('Please provide a valid number of rows per tile')
+        if not 0 < contamination < 1:
+            raise ValueError('Please provide a contamination between 0 and 1')
+        if score not in self.scores:
+            raise ValueError('Unknown knn score %s, use one of %s' % (score, ', '.join(self.scores)))
+        if landmarks <= 2:
+            raise ValueError('Please provide more than 2 landmarks')
+        self.k_ = k
+        self.tile_rows_ = tile_rows
+        self.contamination_ = contamination
+        self.score_ = score
+        self.landmarks_ = landmarks
+
+    def setup(self, df, weights):
+        self.weights_ = weights
+        self.data_ = df
+        try:
+            Z = np.asarray(df)
+            cat_features = categorical_features(df)
+            self.state_ = GowerState(Z, cat_features, weights, *numeric_bounds(Z[:, np.logical_not(cat_features)]))
+            self.neighbors_, self.distances_ = self.nearest(self.state_)
+        except IndexError as e:
+            print('There was an error computing the distances, check that the columns are ok')
+            exit(e)
+        if self.distances_.shape[1] == 0:
+            self.scores_ = np.zeros(len(df))
+        else:
+            self.scores_ = self.distances_.mean(axis=1, dtype=np.float64) if self.score_ == 'mean' else self.distances_[:, -1].astype(np.float64)
+
+    #k nearest neighbours of every row. Each tile has the distances from its rows to themselves
+    #and to the rows after them: its rows take their nearest ones from it, and the rows after it
+    #take the nearest ones of its rows. The rows before it already gave theirs
+    def nearest(self, state):
+        n = state.Z_cat.shape[0]
+        k = min(self.k_, n - 1)
+        distances = np.full((n, max(k, 0)), np.inf, dtype=np.float32)
+        neighbors = np.full((n, max(k, 0)), -1, dtype=np.int64)
+        if k <= 0: return neighbors, distances
+        for start, stop in row_tiles(n, self.tile_rows_):
+            m = stop - start
+            block = np.empty((m, n - start), dtype=np.float32)
+            for i in range(start, stop):
+                block[i - start, i - start:] = state.row_distances(i, slice(i, n))
+            #the distances between the rows of the tile are mirrored, and a row is not its own
+            #neighbour
+            tile = block[:, :m]
+            block[:, :m] = np.triu(tile, 1) + np.triu(tile, 1).T
+            block[np.arange(m), np.arange(m)] = np.inf
+            keep = smallest(block, k, axis=1)
+            distances[start:stop], neighbors[start:stop] = merge(distances[start:stop], neighbors[start:stop], np.take_along_axis(block, keep, 1), keep + start, k)
+            if stop < n:
+                after = block[:, m:]
+                keep = smallest(after, k, axis=0)
+                distances[stop:], neighbors[stop:] = merge(distances[stop:], neighbors[stop:], np.take_along_axis(after, keep, 0).T, keep.T + start, k)
+        order = np.argsort(distances, axis=1, kind='stable')
+        return np.take_along_axis(neighbors, order, 1), np.take_along_axis(distances, order, 1)
+
+    #rows ranked by their score, the most anomalous first
+    def ranking(self):
+        order = np.argsort(-self.scores_, kind='stable')
+        return pd.DataFrame({'score': self.scores_[order], 'rank': np.arange(1, len(order) + 1)}, index=self.data_.index[order])
+
+    #there is no matrix to save, the result is the score and the nearest neighbours of every row
+    def matrix_to_dataframe(self):
+        result = pd.DataFrame({'score': self.scores_}, index=self.data_.index)
+        for j in range(self.neighbors_.shape[1]):
+            result['neighbor_%d' % (j + 1)] = self.data_.index[self.neighbors_[:, j]]
+            result['distance_%d' % (j + 1)] = self.distances_[:, j]
+        return result
+
+    #no hierarchy: the records with the highest scores are the anomalous group (2), the rest are
+    #the normal one (1)
+    def calculate_linkage(self):
+        n = len(self.scores_)
+        clusters = np.ones(n, dtype=np.int32)
+        if n > 1:
+            anomalies = max(int(np.ceil(self.contamination_ * n)), 1)
+            clusters[np.argsort(-self.scores_, kind='stable')[:anomalies]] = 2
+        return None, clusters
+
+    #the matrix for the heatmap of the report, only between sampled rows of large datasets
+    def heatmap_matrix(self, max_size=1000):
+        n = len(self.data_)
+        rows = np.arange(n) if n <= max_size else np.linspace(0, n - 1, max_size).astype(int)
+        return np.array([self.state_.row_distances(i, rows) for i in rows], dtype=np.float32)
+
+    #distances from the given rows to every row
+    def distance_rows(self, rows):
+        n = len(self.data_)
+        return np.array([self.state_.row_distances(i, slice(0, n)) for i in rows], dtype=np.float32)
+
+    #landmark MDS, the only embedding that doesn't need the whole matrix
+    def _2d_representation(self):
+        mds_result = landmark_mds(self.distance_rows, len(self.data_), self.landmarks_)
+        xs = mds_result[:,0]
+        ys = mds_result[:,1]
+        scaled_x = xs * 1.0/(xs.max() - xs.min())
+        scaled_y = ys * 1.0/(ys.max() - ys.min())
+        self.features_vectors_ = np.transpose(mds_result[:2])
+        return scaled_x, scaled_y, self.features_vectors_
+
+
+#positions of the k smallest values along an axis, all of them if there are fewer
+def smallest(values, k, axis):
+    if values.shape[axis] <= k:
+        positions = np.arange(values.shape[axis])
+        return np.broadcast_to(positions[:, None] if axis == 0 else positions, values.shape).copy()
+    return np.take(np.argpartition(values, k - 1, axis=axis), np.arange(k), axis=axis)
+
+#k nearest of the current neighbours of some rows and new candidates
+def merge(distances, neighbors, new_distances, new_neighbors, k):
+    d = np.concatenate([distances, new_distances], axis=1)
+    idx = np.concatenate([neighbors, new_neighbors], axis=1)
+    keep = np.argpartition(d, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(d, keep, 1), np.take_along_axis(idx, keep, 1)
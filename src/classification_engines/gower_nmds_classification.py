@@ -1,37 +1,218 @@
+import os
+import tempfile
 import numpy as np
 import pandas as pd
-import gower
 from scipy.cluster.hierarchy import linkage, fcluster, dendrogram, cut_tree
-from scipy.spatial.distance import squareform
 
 from sklearn.manifold import MDS
 
+from .gower_blocks import GowerState, categorical_features, numeric_bounds, condense, condensed_start, expand_rows
+from .gower_parallel import parallel_matrix, parallel_condensed
+from .embedding import classical_mds, landmark_mds
+
 class GowerNMDS():
 
+    #where the distances are kept:
+    #   condensed: only the upper triangle (and the diagonal) in memory, like squareform. The
+    #   linkage reads it as it is and the square matrix is only built when it is asked for
+    #   dense: the square matrix in memory
+    #   memmap: the square matrix in a memory-mapped file, computed a tile of rows at a time
+    backends = ['condensed', 'dense', 'memmap']
+    #how the 2D representation is computed:
+    #   nmds: non-metric MDS (sklearn), slow with a few thousand rows
+    #   classical: classical MDS with the top eigenvectors only
+    #   landmark: classical MDS of some rows, the rest placed from their distances to them
+    embeddings = ['nmds', 'classical', 'landmark']
+
     weights_ = None
-    raw_matrix_ = None
     features_vectors_ = None
+    data_ = None #every row classified so far
+    cat_features_ = None
+    bounds_ = None #min and max of the numeric columns of data_
+    matrix_ = None
+    stale_ = False #a numeric range widened, the matrix has to be computed again
+    full_recomputes_avoided_ = 0
+    backend_ = 'condensed'
+    tile_rows_ = 1024
+    memmap_folder_ = None
+    workers_ = 1
+    embedding_ = 'nmds'
+    landmarks_ = 500
+    diagonal_ = None #diagonal of the condensed matrix
+
+    def __init__(self, backend='condensed', tile_rows=1024, memmap_folder=None, workers=1, embedding='nmds', landmarks=500):
+        if backend not in self.backends:
+            raise ValueError('Unknown gower backend %s, use one of %s' % (backend, ', '.join(self.backends)))
+        if tile_rows <= 0:
+            raise ValueError('Please provide a valid number of rows per tile')
+        if workers <= 0:
+            raise ValueError('Please provide a valid number of workers')
+        if embedding not in self.embeddings:
+            raise ValueError('Unknown embedding %s, use one of %s' % (embedding, ', '.join(self.embeddings)))
+        if landmarks <= 2:
+            raise ValueError('Please provide more than 2 landmarks')
+        self.backend_ = backend
+        self.tile_rows_ = tile_rows
+        self.memmap_folder_ = memmap_folder
+        self.workers_ = workers
+        self.embedding_ = embedding
+        self.landmarks_ = landmarks
 
     def setup(self, df, weights):
         self.weights_ = weights
+        self.data_ = df
+        self.stale_ = False
         try:
-            self.raw_matrix_ = gower.gower_matrix(df, weight=self.weights_)
+            self.compute(self.state(np.asarray(df)))
         except IndexError as e:
             print('There was an error building the matrix, check that the columns are ok')
             exit(e)
 
+    #with several workers the tiles are computed by a pool of processes writing to shared memory,
+    #or to the memory-mapped file. The memmap folder is used when shared memory is full
+    def compute(self, state):
+        n = state.Z_cat.shape[0]
+        if self.workers_ > 1 and n > 1:
+            if self.backend_ == 'condensed':
+                self.matrix_, self.diagonal_ = parallel_condensed(state, self.workers_, fallback=self.memmap_folder_)
+            else:
+                folder = (self.memmap_folder_ or tempfile.gettempdir()) if self.backend_ == 'memmap' else None
+                self.matrix_ = parallel_matrix(state, self.workers_, folder, self.tile_rows_, self.memmap_folder_)
+        elif self.backend_ == 'condensed':
+            self.matrix_, self.diagonal_ = state.condensed(tile_rows=self.tile_rows_)
+        elif self.backend_ == 'memmap':
+            self.matrix_ = state.matrix(self.memmap((n, n)), self.tile_rows_)
+            self.matrix_.flush()
+        else:
+            self.matrix_ = state.matrix(tile_rows=self.tile_rows_)
+
+    #float32 array backed by a temporary file, removed when the array is no longer used
+    def memmap(self, shape):
+        if self.memmap_folder_ is not None: os.makedirs(self.memmap_folder_, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.memmap_folder_, suffix='.gower') as f:
+            return np.memmap(f.name, dtype=np.float32, mode='w+', shape=shape)
+
+    def state(self, Z, bounds=None):
+        self.cat_features_ = categorical_features(self.data_)
+        if bounds is None: bounds = numeric_bounds(Z[:, np.logical_not(self.cat_features_)])
+        self.bounds_ = bounds
+        return GowerState(Z, self.cat_features_, self.weights_, *bounds)
+
+    #the matrix is only computed again when it is used after a range widened
+    @property
+    def raw_matrix_(self):
+        self.refresh()
+        if self.backend_ == 'condensed': return expand_rows(self.matrix_, self.diagonal_, range(len(self.diagonal_)))
+        return self.matrix_
+
+    def refresh(self):
+        if self.stale_:
+            self.compute(self.state(np.asarray(self.data_)))
+            self.stale_ = False
+
+    #upper triangle of the matrix as a vector, like squareform
+    def condensed_matrix(self):
+        self.refresh()
+        if self.backend_ == 'condensed': return self.matrix_
+        return condense(self.matrix_, self.tile_rows_)
+
+    #the matrix for the heatmap of the report. Large ones are sampled with evenly spaced rows
+    #and columns so the whole matrix is never expanded
+    def heatmap_matrix(self, max_size=1000):
+        self.refresh()
+        n = len(self.data_)
+        rows = np.arange(n) if n <= max_size else np.linspace(0, n - 1, max_size).astype(int)
+        return self.distance_rows(rows)[:, rows]
+
+    #distances from the given rows to every row
+    def distance_rows(self, rows):
+        self.refresh()
+        if self.backend_ == 'condensed': return expand_rows(self.matrix_, self.diagonal_, rows)
+        return np.asarray(self.matrix_[rows])
+
+    @raw_matrix_.setter
+    def raw_matrix_(self, matrix):
+        if self.backend_ == 'condensed':
+            self.matrix_, self.diagonal_ = condense(matrix, self.tile_rows_), np.array(np.diagonal(matrix))
+        else:
+            self.matrix_ = matrix
+        self.stale_ = False
+
+    #add new rows computing only their distances to the previous rows and between them. The
+    #distances only depend on the min and max of the numeric columns, if one of them changes
+    #every distance changes and the whole matrix is marked to be computed again
+    def append(self, df_new):
+        if self.data_ is None: return self.setup(df_new, self.weights_)
+        n = len(self.data_)
+        self.data_ = pd.concat([self.data_, df_new])
+        Z = np.asarray(self.data_)
+        previous_features, previous_bounds = self.cat_features_, self.bounds_
+        cat_features = categorical_features(self.data_)
+        bounds = numeric_bounds(Z[:, np.logical_not(cat_features)]) if np.array_equal(cat_features, previous_features) else None
+        #the memory-mapped matrix is not extended
+        if self.stale_ or self.backend_ == 'memmap' or bounds is None or not all(np.array_equal(a, b) for a, b in zip(bounds, previous_bounds)):
+            self.stale_ = True
+            return
+        state = self.state(Z, bounds)
+        new_rows = state.block(range(n, len(Z)), range(len(Z)))
+        if self.backend_ == 'condensed':
+            self.matrix_, self.diagonal_ = self.extend_condensed(new_rows, n)
+        else:
+            matrix = np.empty((len(Z), len(Z)), dtype=np.float32)
+            matrix[:n, :n] = self.matrix_
+            matrix[n:, :] = new_rows
+            matrix[:n, n:] = new_rows[:, :n].T
+            self.matrix_ = matrix
+        self.full_recomputes_avoided_ += 1
+
+    #remove the first rows, like the records of the step a sliding window leaves behind. The
+    #distances between the rows that stay don't change unless the min or max of a numeric column
+    #was in the removed rows
+    def drop_first(self, count):
+        if count <= 0: return
+        n = len(self.data_)
+        self.data_ = self.data_.iloc[count:]
+        Z = np.asarray(self.data_)
+        previous_features, previous_bounds = self.cat_features_, self.bounds_
+        cat_features = categorical_features(self.data_)
+        bounds = numeric_bounds(Z[:, np.logical_not(cat_features)]) if np.array_equal(cat_features, previous_features) and len(Z) > 0 else None
+        if self.stale_ or self.backend_ == 'memmap' or bounds is None or not all(np.array_equal(a, b) for a, b in zip(bounds, previous_bounds)):
+            self.stale_ = True
+            return
+        #the rows that stay are at the end of the condensed form, copied so the rest is freed
+        if self.backend_ == 'condensed':
+            self.matrix_, self.diagonal_ = self.matrix_[condensed_start(n, count):].copy(), self.diagonal_[count:].copy()
+        else:
+            self.matrix_ = self.matrix_[count:, count:].copy()
+        self.full_recomputes_avoided_ += 1
+
+    #the part of every previous row gets the distances to the new rows at its end
+    def extend_condensed(self, new_rows, n):
+        total = n + len(new_rows)
+        condensed = np.empty(total * (total - 1) // 2, dtype=np.float32)
+        for i in range(total):
+            start, stop = condensed_start(total, i), condensed_start(total, i + 1)
+            if i < n:
+                previous = self.matrix_[condensed_start(n, i):condensed_start(n, i + 1)]
+                condensed[start:start + len(previous)] = previous
+                condensed[start + len(previous):stop] = new_rows[:, i]
+            else:
+                condensed[start:stop] = new_rows[i - n, i + 1:]
+        diagonal = np.concatenate([self.diagonal_, new_rows[np.arange(len(new_rows)), np.arange(n, total)]])
+        return condensed, diagonal
+
+    #the square matrix, expanded a row at a time from the condensed form
     def matrix_to_dataframe(self):
-        return pd.DataFrame(self.raw_matrix_)
+        return pd.DataFrame(self.raw_matrix_, copy=False)
 
     def calculate_linkage(self):
-        Zd = linkage(squareform(self.raw_matrix_, force='tovector'), 'complete')
+        Zd = linkage(self.condensed_matrix(), 'complete')
         clusters = fcluster(Zd, 2, criterion='maxclust')
         return Zd, clusters
 
     def _2d_representation(self):
         #dimensionality reduction like pca
-        mds = MDS(n_components=2, dissimilarity='precomputed', metric=False)
-        mds_result = mds.fit_transform(self.raw_matrix_)
+        mds_result = self.embed()
         xs = mds_result[:,0]
         ys = mds_result[:,1]
         scaled_x = xs * 1.0/(xs.max() - xs.min())
@@ -39,3 +220,10 @@ class GowerNMDS():
         self.features_vectors_ = np.transpose(mds_result[:2])
         return scaled_x, scaled_y, self.features_vectors_
 
+    def embed(self):
+        if self.embedding_ == 'classical': return classical_mds(self.raw_matrix_)
+        #only the distances to the landmarks are read
+        if self.embedding_ == 'landmark': return landmark_mds(self.distance_rows, len(self.data_), self.landmarks_)
+        mds = MDS(n_components=2, dissimilarity='precomputed', metric=False)
+        return mds.fit_transform(self.raw_matrix_)
+
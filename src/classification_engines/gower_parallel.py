@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .gower_blocks import condensed_start, mirror
+
+#the rows of the gower matrix split in tiles and computed by a pool of processes. The workers
+#receive the GowerState once, when they start, and write their rows straight into a file mapped
+#by every process (in shared memory unless a folder is given or it doesn't fit there), so the
+#results are never sent back. The values are the same as the ones of GowerState.matrix and GowerState.condensed
+
+#state of every worker process
+worker = {}
+
+def start_worker(state, path, shape, layout):
+    worker['state'] = state
+    worker['out'] = np.memmap(path, dtype=np.float32, mode='r+', shape=shape)
+    worker['layout'] = layout
+
+def compute_tile(start, stop):
+    state, out = worker['state'], worker['out']
+    n = state.Z_cat.shape[0]
+    for i in range(start, stop):
+        res = state.row_distances(i, slice(i, n))
+        if worker['layout'] == 'square':
+            out[i, i:] = res
+        else:
+            #the diagonal is stored after the condensed form
+            out[n * (n - 1) // 2 + i] = res[0]
+            out[condensed_start(n, i):condensed_start(n, i + 1)] = res[1:]
+    return stop - start
+
+#tiles of consecutive rows with about the same number of distances each, since the rows of the
+#upper triangle get shorter
+def balanced_tiles(n, tiles):
+    total = n * (n + 1) // 2
+    target = max(total // max(tiles, 1), 1)
+    result, start, work = [], 0, 0
+    for i in range(n):
+        work += n - i
+        if work >= target:
+            result.append((start, i + 1))
+            start, work = i + 1, 0
+    if start < n: result.append((start, n))
+    return result
+
+#float32 array in a file mapped by every process. Shared memory (/dev/shm) by default, the
+#fallback folder (the temporary folder if there is none) when it has no room for the array,
+#writing to a full /dev/shm kills the workers with SIGBUS
+def shared_array(shape, folder=None, fallback=None):
+    if folder is None:
+        size = int(np.prod(shape)) * np.dtype(np.float32).itemsize
+        if os.path.isdir('/dev/shm') and shutil.disk_usage('/dev/shm').free >= size: folder = '/dev/shm'
+        else: folder = fallback or tempfile.gettempdir()
+    os.makedirs(folder, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(dir=folder, suffix='.gower', delete=False)
+    f.close()
+    return f.name, np.memmap(f.name, dtype=np.float32, mode='w+', shape=shape)
+
+def compute(state, layout, workers, folder=None, fallback=None, tiles_per_worker=8):
+    n = state.Z_cat.shape[0]
+    shape = (n, n) if layout == 'square' else (n * (n - 1) // 2 + n,)
+    path, out = shared_array(shape, folder, fallback)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(state, path, shape, layout)) as executor:
+            list(executor.map(compute_tile, *zip(*balanced_tiles(n, workers * tiles_per_worker))))
+    finally:
+        #the processes that mapped the file are done, it stays mapped here until it is not used
+        os.remove(path)
+    return out
+
+#same as GowerState.matrix
+def parallel_matrix(state, workers, folder=None, tile_rows=1024, fallback=None):
+    return mirror(compute(state, 'square', workers, folder, fallback), tile_rows)
+
+#same as GowerState.condensed
+def parallel_condensed(state, workers, folder=None, fallback=None):
+    out = compute(state, 'condensed', workers, folder, fallback)
+    n = state.Z_cat.shape[0]
+    m = n * (n - 1) // 2
+    return out[:m], out[m:]
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from data_drivers.TCPDriver import TCPInputDriver
+from data_drivers.Framing import create_decoder
+
+#same interface and buffering as the TCP driver, but every connection is served by a single
+#asyncio event loop running in a background thread instead of a thread per connection
+class AsyncTCPInputDriver(TCPInputDriver):
+
+    loop = None
+    read_size = 65536
+    backlog = 1024
+
+    async def handle_connection(self, reader, writer):
+        decoder = create_decoder(self.framing, self.max_record_bytes)
+        self.connections.inc()
+        try:
+            while not decoder.closed:
+                data = await reader.read(self.read_size)
+                if len(data) == 0: break
+                self.received_bytes.inc(len(data))
+                await self.put_records(decoder.feed(data))
+            await self.put_records(decoder.flush())
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+        if decoder.errors > 0: self.add_parse_errors(decoder.errors)
+
+    async def put_records(self, records):
+        if len(records) == 0: return
+        loop = asyncio.get_running_loop()
+        #logging writes to the disk, and syncs it from time to time, outside of the loop
+        if self.log is not None:
+            await loop.run_in_executor(None, self.buffer_records, records)
+            return
+        if self.buffer.policy != 'block':
+            self.buffer_records(records)
+            return
+        #the records that don't fit wait for room in another thread, waiting inside the loop
+        #would stop every connection, only this one waits
+        accepted = self.buffer.put_available(records)
+        if accepted < len(records):
+            await loop.run_in_executor(None, self.buffer.put_many, records[accepted:])
+
+    def start_server(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        result = {}
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            try:
+                result['server'] = self.loop.run_until_complete(asyncio.start_server(self.handle_connection, self.host, self.port, reuse_address=True, backlog=self.backlog))
+            except Exception as e:
+                result['error'] = e
+                return
+            finally:
+                started.set()
+            self.loop.run_forever()
+        self.server_thread = threading.Thread(target=serve)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        started.wait()
+        if 'error' in result:
+            self.loop.close()
+            raise result['error']
+        return result['server']
+
+    async def stop_server(self):
+        self.server.close()
+        #drop the connections that are still open
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def disconnect(self):
+        #senders blocked on a full buffer give up
+        self.buffer.close()
+        asyncio.run_coroutine_threadsafe(self.stop_server(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.server_thread.join()
+        self.loop.close()
+        self.buffer.clear()
+        self.close_log()
+        return True
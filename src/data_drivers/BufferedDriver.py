@@ -0,0 +1,145 @@
+import threading
+import pandas as pd
+import telemetry
+from data_drivers.RealTimeDriver import InputDriver
+from data_drivers.RingBuffer import RingBuffer
+from data_drivers.ColumnarDecoder import ColumnarBatchDecoder
+from data_drivers.WriteAheadLog import WriteAheadLog
+
+#real time drivers whose receiving threads put the decoded records in a ring buffer, read in
+#batches by the feature engine. With a write-ahead log the buffered records are also logged,
+#and the ones that were not committed in a previous run are read first when connecting
+class BufferedInputDriver(InputDriver):
+
+    buffer = None
+    batch_decoder = None
+    headers = None
+    counter = 0
+    collection_time = 3600
+    parse_errors = 0
+    errors_lock = None
+    log = None
+    log_lock = None
+    replayed = None
+    replay_batches = None
+
+    def __init__(self):
+        self.buffer = RingBuffer()
+        self.batch_decoder = ColumnarBatchDecoder()
+        self.errors_lock = threading.Lock()
+        self.log_lock = threading.Lock()
+        self.replayed = []
+
+    def setup_buffer(self, collection_time, batch_size, batch_timeout, buffer_capacity, overflow_policy):
+        if collection_time < 0:
+            raise ValueError('Please provide a valid collection time')
+        if batch_size <= 0:
+            raise ValueError('Please provide a valid batch size')
+        if batch_timeout < 0:
+            raise ValueError('Please provide a valid batch timeout')
+        self.collection_time = collection_time
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.buffer = RingBuffer(buffer_capacity, overflow_policy)
+
+    def setup_log(self, folder, segment_size=64 * 2**20, sync_interval=1.0):
+        #records evicted from the buffer would still be in the log, and their offsets would not
+        #match the ones of the records read
+        if self.buffer.policy == 'drop_oldest':
+            raise ValueError('The write-ahead log can\'t be used with the drop_oldest overflow policy')
+        self.log = WriteAheadLog(folder, segment_size, sync_interval)
+
+    #called by the drivers when connecting. Records are numbered by their offset in the log
+    def open_log(self):
+        if self.log is None: return
+        self.log.open()
+        self.counter = self.log.committed_offset()
+        self.replay_batches = self.log.replay(self.counter, self.log.end_offset)
+
+    def close_log(self):
+        if self.log is not None: self.log.close()
+
+    #every record before offset (the ones read so far by default) was processed
+    def commit(self, offset=None):
+        if self.log is not None: self.log.commit(self.counter if offset is None else offset)
+
+    #used by the receiving threads instead of putting the records in the buffer. The records
+    #are logged in the same order they are buffered, and only if they were accepted
+    def buffer_records(self, records):
+        if self.log is None: return self.buffer.put_many(records)
+        if self.buffer.policy != 'block':
+            with self.log_lock:
+                accepted = self.buffer.put_many(records)
+                self.log.append(records[:accepted])
+            return accepted
+        #the lock is only held while the records that fit are added, a sender waiting for room
+        #doesn't stop the others
+        accepted = 0
+        while True:
+            with self.log_lock:
+                added = self.buffer.put_available(records[accepted:])
+                self.log.append(records[accepted:accepted + added])
+            accepted += added
+            if accepted == len(records): return accepted
+            if not self.buffer.wait_for_room():
+                #the buffer was closed
+                self.buffer.drop(len(records) - accepted)
+                return accepted
+
+    #up to max_records of the records left from a previous run, without waiting
+    def take_replayed(self, max_records):
+        while self.replay_batches is not None and len(self.replayed) < max_records:
+            batch = next(self.replay_batches, None)
+            if batch is None: self.replay_batches = None
+            else: self.replayed += batch
+        records = self.replayed[:max_records]
+        del self.replayed[:max_records]
+        return records
+
+    def add_parse_errors(self, errors):
+        with self.errors_lock:
+            self.parse_errors += errors
+
+    #records lost because the buffer was full
+    def dropped(self):
+        return self.buffer.dropped
+
+    #the counters are read when the metrics are scraped, receiving records doesn't change
+    def register_metrics(self, registry):
+        registry.register(
+            telemetry.Counter('anomal_input_records_total', 'Records received by the input driver', lambda: self.buffer.accepted),
+            telemetry.Counter('anomal_input_records_dropped_total', 'Records lost before being processed', self.dropped),
+            telemetry.Counter('anomal_input_decode_errors_total', 'Records that could not be decoded', lambda: self.parse_errors),
+            telemetry.Counter('anomal_input_type_fallbacks_total', 'Batch columns with values of another type than the first records', lambda: self.batch_decoder.fallbacks),
+            telemetry.Gauge('anomal_input_buffer_records', 'Records waiting in the buffer to be processed', lambda: len(self.buffer)),
+            telemetry.Gauge('anomal_input_buffer_capacity', 'Maximum number of records in the buffer', lambda: self.buffer.capacity),
+            telemetry.Gauge('anomal_input_buffer_high_water_mark', 'Most records that were in the buffer at once', lambda: self.buffer.high_water_mark))
+
+    def get_fields(self):
+        records = self.take_replayed(1)
+        if len(records) > 0:
+            self.replayed.insert(0, records[0])
+            self.headers = list(records[0].keys())
+        else:
+            self.headers = list(self.buffer.peek().keys())
+        return self.headers
+
+    def get_register(self):
+        records = self.take_replayed(1)
+        aux = records[0] if len(records) > 0 else self.buffer.get()
+        if aux is None: return None
+        aux = pd.DataFrame(index=[self.counter], data=[aux])
+        self.counter+=1
+        return aux
+
+    #wait until there are records or the timeout expires, then take up to max_records of them
+    #as a single frame. None if nothing arrived
+    def get_batch(self, max_records, timeout):
+        records = self.take_replayed(max_records)
+        if len(records) == 0: records = self.buffer.get_many(max_records, timeout)
+        if len(records) == 0: return None
+        #the schema is locked with the first batch, in the order of the headers if they were read
+        if not self.batch_decoder.is_locked(): self.batch_decoder.lock(records, self.headers)
+        batch = self.batch_decoder.decode(records, range(self.counter, self.counter + len(records)))
+        self.counter += len(records)
+        return batch
@@ -1,37 +1,111 @@
 from data_drivers.StaticDriver import InputDriver, OutputDriver
 import pandas as pd
+import numpy as np
 
 class CSVInputDriver(InputDriver):
 
     df = None
     path = None
+    fields = None
+    dtypes = None #dtypes the whole file has, and the columns with blank cells
 
-    def setup(self, path):
+    def setup(self, path, chunksize=None):
         if not path: raise ValueError('Please provide path to dataset')
+        if chunksize is not None and chunksize <= 0: raise ValueError('Please provide a valid chunk size')
         self.path = path
+        self.chunksize = chunksize
+        self.dtypes = None
+
+    #only the projected columns are parsed
+    def read_csv(self, **kwargs):
+        df = pd.read_csv(self.path, header=0, on_bad_lines='skip', usecols=self.columns, **kwargs)
+        if 'chunksize' in kwargs: return df
+        return self.prepare(df)
+
+    #not inplace, so numeric columns with missing values are upcasted instead of failing
+    def prepare(self, df):
+        df = df.fillna('')
+        df.index.name = 'id'
+        return df
 
     def connect(self):
         try:
-            self.df = pd.read_csv(self.path, header=0, on_bad_lines='skip')
+            #only the header is read here, the data is read when it's requested
+            self.fields = list(pd.read_csv(self.path, header=0, nrows=0).columns)
         except Exception as e:
             return e
-        self.df.fillna('', inplace=True)
-        self.df.index.name = 'id'
 
     def get_fields(self):
-        if self.df.empty:
+        if self.fields is None:
             print('Not connected to dataset')
-        return list(self.df.columns)
+        return self.fields
+
+    def set_projection(self, columns):
+        self.columns = [c for c in self.fields if c in columns]
+        self.dtypes = None
 
     def get_data(self):
-        if self.df.empty:
+        if self.fields is None:
             print('Not connected to dataset')
+        if self.df is None:
+            self.df = self.read_csv()
         return self.df
 
+    def get_chunks(self):
+        if not self.chunksize:
+            yield self.get_data()
+            return
+        dtypes, blanks = self.file_dtypes()
+        #columns with text somewhere are read as text, like when the whole file is read
+        text = {c: str for c, dtype in dtypes.items() if dtype is str}
+        for chunk in self.read_csv(chunksize=self.chunksize, dtype=text):
+            yield self.prepare(self.cast(chunk, dtypes, blanks))
+
+    #every chunk is parsed on its own, so a column can be an int in one and a float or a string
+    #in another. The file is read once before to find the dtype every column has when the whole
+    #file is read, and the chunks are cast to it
+    def file_dtypes(self):
+        if self.dtypes is None:
+            seen, blanks = {}, set()
+            for chunk in self.read_csv(chunksize=self.chunksize):
+                missing = chunk.isna()
+                for c in chunk.columns:
+                    seen.setdefault(c, set())
+                    #a column without values doesn't tell its dtype, and booleans with blanks are objects
+                    if missing[c].all(): continue
+                    seen[c].add(chunk[c].dropna().infer_objects().dtype if missing[c].any() else chunk[c].dtype)
+                blanks.update(chunk.columns[missing.any()])
+            self.dtypes = {c: combined_dtype(d) for c, d in seen.items()}, blanks
+        return self.dtypes
+
+    def cast(self, chunk, dtypes, blanks):
+        for c in chunk.columns:
+            dtype = dtypes[c]
+            if dtype is str: continue
+            #numeric and boolean columns with blank cells become objects when they are filled, the
+            #blanks are kept for it
+            if c in blanks and dtype.kind in 'biuf': chunk[c] = chunk[c].map(lambda v: dtype.type(v).item(), na_action='ignore').astype(object)
+            elif chunk[c].dtype != dtype: chunk[c] = chunk[c].astype(dtype)
+        return chunk
+
+    #read again only the rows with the given ids, one chunk at a time
+    def get_rows(self, ids):
+        ids = pd.Index(ids)
+        rows = [chunk[chunk.index.isin(ids)] for chunk in self.get_chunks()]
+        return pd.concat(rows) if len(rows) > 0 else pd.DataFrame()
+
     def disconnect(self):
         self.df = None
         return True
 
+#dtype of a column read whole from the dtypes of its chunks: integers and floats are floats,
+#anything else mixed is text
+def combined_dtype(dtypes):
+    if len(dtypes) == 0: return np.dtype(np.float64)
+    if all(isinstance(d, np.dtype) and d.kind in 'iuf' for d in dtypes): return np.dtype(np.float64) if len(dtypes) > 1 else next(iter(dtypes))
+    if len(dtypes) == 1 and isinstance(next(iter(dtypes)), np.dtype): return next(iter(dtypes))
+    return str
+
 class CSVOutputDriver(OutputDriver):
 
     path = None
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+#turns batches of json records into frames. The schema (columns and their types) is locked from
+#the first records, so later batches are written straight into typed arrays, one column at a
+#time, instead of letting pandas infer the types of every batch again.
+#   missing keys: NaN in numeric columns (ints become floats for that batch), None (NaN for
+#   strings) in the others
+#   extra keys: ignored, their names are kept in extra_keys
+#   values of another type: the column falls back to an object array for that batch
+class ColumnarBatchDecoder():
+
+    #python types that can be written into the array of each kind, None being a missing value
+    allowed_types = {
+        'bool': {bool},
+        'int': {int, type(None)},
+        'float': {int, float, type(None)}
+    }
+
+    schema = None
+    extra_keys = None
+    missing_values = None
+    fallbacks = None
+
+    def __init__(self):
+        self.extra_keys = set()
+        self.missing_values = 0
+        self.fallbacks = 0
+
+    def is_locked(self):
+        return self.schema is not None
+
+    #columns in the order of the first record unless given, typed with every value seen in the records
+    def lock(self, records, columns=None):
+        if columns is None: columns = list(dict.fromkeys(k for r in records for k in r.keys()))
+        self.schema = [(c, self.infer_kind([r[c] for r in records if c in r])) for c in columns]
+        return columns
+
+    def infer_kind(self, values):
+        #bool is a subclass of int
+        if len(values) > 0 and all(type(v) == bool for v in values): return 'bool'
+        if len(values) > 0 and all(type(v) == int for v in values): return 'int'
+        if all(type(v) in [int, float] for v in values): return 'float'
+        return 'object'
+
+    def decode(self, records, index):
+        if not self.is_locked(): self.lock(records)
+        n = len(records)
+        columns = {}
+        for i, (name, kind) in enumerate(self.schema):
+            columns[name], kind = self.column([r.get(name) for r in records], kind, n)
+            self.schema[i] = (name, kind)
+        self.extra_keys.update(set().union(*(r.keys() for r in records)) - columns.keys())
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    #typed array of the values and the kind of the column, which is widened from int to float
+    #the first time a float arrives
+    def column(self, values, kind, n):
+        missing = values.count(None)
+        self.missing_values += missing
+        if kind == 'object' or (kind == 'bool' and missing > 0):
+            return np.fromiter(values, dtype=object, count=n), kind
+        #numpy would silently convert values of other types, so they are checked first
+        types = set(map(type, values))
+        if kind == 'int' and float in types and types <= self.allowed_types['float']: kind = 'float'
+        if types <= self.allowed_types[kind]:
+            try:
+                if kind == 'bool': return np.fromiter(values, dtype=bool, count=n), kind
+                if kind == 'int' and missing == 0: return np.fromiter(values, dtype=np.int64, count=n), kind
+                #ints with missing values are stored as floats, with NaN for the missing ones
+                if missing == 0: return np.fromiter(values, dtype=np.float64, count=n), kind
+                return np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64, count=n), kind
+            except OverflowError:
+                pass
+        #a value didn't match the locked type
+        self.fallbacks += 1
+        return np.fromiter(values, dtype=object, count=n), kind
@@ -0,0 +1,137 @@
+import json
+import struct
+
+#decoders for records streamed over a long lived connection. feed() receives the bytes as they
+#are read and returns every complete record, keeping partial ones for the next read. flush() is
+#called when the connection is closed. Records that can't be decoded, or that are not json
+#objects, are skipped and counted. So are records longer than max_record_bytes, which are not
+#kept in memory while they arrive
+
+class NDJSONDecoder():
+
+    pending = None
+    errors = None
+    max_record_bytes = None
+    closed = False #a stream can always be read again after a newline
+    skipping = False #the rest of a line that was too long is discarded until its newline
+
+    def __init__(self, max_record_bytes=1048576):
+        if max_record_bytes <= 0: raise ValueError('Please provide a valid maximum record size')
+        self.pending = b''
+        self.errors = 0
+        self.max_record_bytes = max_record_bytes
+        self.skipping = False
+
+    def feed(self, data):
+        if self.skipping:
+            end = data.find(b'\n')
+            if end < 0: return []
+            data = data[end + 1:]
+            self.skipping = False
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        if len(self.pending) > self.max_record_bytes:
+            self.errors += 1
+            self.pending = b''
+            self.skipping = True
+        valid = [l for l in lines if len(l) <= self.max_record_bytes]
+        self.errors += len(lines) - len(valid)
+        return self.decode([l for l in valid if l.strip()])
+
+    #the last record doesn't need a trailing newline
+    def flush(self):
+        lines = [self.pending] if self.pending.strip() else []
+        self.pending = b''
+        self.skipping = False
+        return self.decode(lines)
+
+    #every line of a read is decoded in a single call, one by one only if one of them is invalid.
+    #A line like 1,2 is joined as two values, so there has to be an object for every line
+    def decode(self, lines):
+        if len(lines) == 0: return []
+        try:
+            records = json.loads(b'[' + b','.join(lines) + b']')
+            if len(records) == len(lines) and all(isinstance(r, dict) for r in records): return records
+        except ValueError:
+            pass
+        records = []
+        for line in lines:
+            record = decode_record(line)
+            if record is not None: records.append(record)
+            else: self.errors += 1
+        return records
+
+
+#every record is preceded by its length as a 4 bytes big endian unsigned integer. A length over
+#max_record_bytes can't be skipped safely, the stream may be out of sync, so the decoder is
+#closed and so should be the connection
+class LengthPrefixedDecoder():
+
+    header = struct.Struct('>I')
+
+    pending = None
+    errors = None
+    max_record_bytes = None
+    closed = False
+
+    def __init__(self, max_record_bytes=1048576):
+        if max_record_bytes <= 0: raise ValueError('Please provide a valid maximum record size')
+        self.pending = bytearray()
+        self.errors = 0
+        self.max_record_bytes = max_record_bytes
+        self.closed = False
+
+    def feed(self, data):
+        self.pending += data
+        payloads = []
+        position = 0
+        while len(self.pending) - position >= self.header.size:
+            length = self.header.unpack_from(self.pending, position)[0]
+            if length > self.max_record_bytes:
+                self.errors += 1
+                self.closed = True
+                position = len(self.pending)
+                break
+            end = position + self.header.size + length
+            if end > len(self.pending): break
+            payloads.append(bytes(self.pending[position + self.header.size:end]))
+            position = end
+        del self.pending[:position]
+        records = []
+        for payload in payloads:
+            record = decode_record(payload)
+            if record is not None: records.append(record)
+            else: self.errors += 1
+        return records
+
+    #a truncated record can't be decoded
+    def flush(self):
+        if len(self.pending) > 0: self.errors += 1
+        self.pending = bytearray()
+        return []
+
+
+decoders = {'ndjson': NDJSONDecoder, 'length_prefixed': LengthPrefixedDecoder}
+
+def create_decoder(framing, max_record_bytes=1048576):
+    if framing not in decoders:
+        raise ValueError('Unknown framing %s, use one of %s' % (framing, ', '.join(decoders)))
+    return decoders[framing](max_record_bytes)
+
+#encode records to be sent with the given framing
+def encode(records, framing):
+    if framing not in decoders:
+        raise ValueError('Unknown framing %s, use one of %s' % (framing, ', '.join(decoders)))
+    if framing == 'ndjson':
+        return b''.join(json.dumps(r).encode('utf-8') + b'\n' for r in records)
+    payloads = [json.dumps(r).encode('utf-8') for r in records]
+    return b''.join(LengthPrefixedDecoder.header.pack(len(p)) + p for p in payloads)
+
+
+#a json object, None if it isn't one
+def decode_record(payload):
+    try:
+        record = json.loads(payload)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
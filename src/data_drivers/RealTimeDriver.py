@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
+import pandas as pd
 
 class InputDriver(ABC):
 
+    #records per micro-batch and seconds to wait for them
+    batch_size = 1000
+    batch_timeout = 0.1
+
     @abstractmethod
     def connect(self):
         pass
@@ -18,6 +23,16 @@ class InputDriver(ABC):
     def disconnect(self):
         pass
 
+    #up to max_records registers in a single frame, None if there are none. Drivers that can
+    #wait for new records should override it so callers don't have to poll
+    def get_batch(self, max_records, timeout):
+        registers = []
+        while len(registers) < max_records:
+            register = self.get_register()
+            if register is None: break
+            registers.append(register)
+        return pd.concat(registers) if len(registers) > 0 else None
+
 
 class OutputDriver(ABC):
 
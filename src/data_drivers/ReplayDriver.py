@@ -0,0 +1,78 @@
+from data_drivers.StaticDriver import InputDriver
+from data_drivers.WriteAheadLog import read_log
+from data_drivers.ColumnarDecoder import ColumnarBatchDecoder
+import pandas as pd
+
+#reads the records of a write-ahead log written by a real time driver as a static input, as fast
+#as they can be read from the disk. The rows are numbered by their offset in the log, which
+#doesn't start at 0 when committed segments were removed
+class ReplayInputDriver(InputDriver):
+
+    path = None
+    log = None
+    fields = None
+    start = None
+    first_offset = None #offset of the first record that is read
+
+    #start is the offset of the first record, 0 by default
+    def setup(self, path, chunksize=None, start=0):
+        if not path: raise ValueError('Please provide the folder of the write-ahead log')
+        if chunksize is not None and chunksize <= 0: raise ValueError('Please provide a valid chunk size')
+        self.path = path
+        self.chunksize = chunksize
+        self.start = start
+
+    def connect(self):
+        self.log = read_log(self.path)
+        self.first_offset = max(self.start, self.log.segments[0]) if len(self.log.segments) > 0 else self.start
+        #the first record has every field, like in the real time drivers
+        first = next(self.log.replay(self.first_offset), [])
+        self.fields = list(first[0].keys()) if len(first) > 0 else []
+        return True
+
+    def get_fields(self):
+        if self.fields is None:
+            print('Not connected to the write-ahead log')
+        return self.fields
+
+    def set_projection(self, columns):
+        self.columns = [c for c in self.fields if c in columns]
+
+    def get_data(self):
+        records = [r for batch in self.log.replay(self.first_offset) for r in batch]
+        if len(records) == 0: return pd.DataFrame(columns=self.columns if self.columns is not None else self.fields)
+        return self.decode(ColumnarBatchDecoder(), records, self.first_offset)
+
+    def get_chunks(self):
+        if not self.chunksize:
+            yield self.get_data()
+            return
+        yield from self.read_chunks(self.chunksize)
+
+    #records in chunks of chunksize, decoded with the schema of the first ones
+    def read_chunks(self, chunksize):
+        decoder = ColumnarBatchDecoder()
+        offset = self.first_offset
+        pending = []
+        for records in self.log.replay(self.first_offset):
+            pending += records
+            while len(pending) >= chunksize:
+                yield self.decode(decoder, pending[:chunksize], offset)
+                offset += chunksize
+                del pending[:chunksize]
+        if len(pending) > 0: yield self.decode(decoder, pending, offset)
+
+    def decode(self, decoder, records, offset):
+        if not decoder.is_locked(): decoder.lock(records, self.columns if self.columns is not None else self.fields)
+        chunk = decoder.decode(records, range(offset, offset + len(records)))
+        chunk.index.name = 'id'
+        return chunk
+
+    #read again only the rows with the given ids, one chunk at a time
+    def get_rows(self, ids):
+        ids = pd.Index(ids)
+        rows = [chunk[chunk.index.isin(ids)] for chunk in self.read_chunks(self.chunksize or 100000)]
+        return pd.concat(rows) if len(rows) > 0 else pd.DataFrame()
+
+    def disconnect(self):
+        return True
@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+
+#bounded buffer shared by the threads that receive records and the one that processes them.
+#When it is full the overflow policy decides what happens with a new record:
+#   block: the sender waits until there is room (backpressure)
+#   drop_oldest: the oldest record is discarded to make room
+#   drop_newest: the new record is discarded
+class RingBuffer():
+
+    policies = ['block', 'drop_oldest', 'drop_newest']
+
+    capacity = None
+    policy = None
+    records = None
+    condition = None
+    closed = None
+    accepted = None
+    dropped = None
+    high_water_mark = None
+
+    def __init__(self, capacity=100000, policy='block'):
+        if capacity <= 0:
+            raise ValueError('Please provide a valid buffer capacity')
+        if policy not in self.policies:
+            raise ValueError('Unknown overflow policy %s, use one of %s' % (policy, ', '.join(self.policies)))
+        self.capacity = capacity
+        self.policy = policy
+        self.records = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.accepted = 0
+        self.dropped = 0
+        self.high_water_mark = 0
+
+    #add a record, returns whether it was accepted. Blocking puts give up after timeout seconds
+    #(None waits forever) or when the buffer is closed
+    def put(self, record, timeout=None):
+        with self.condition:
+            if len(self.records) >= self.capacity:
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop_oldest':
+                    self.records.popleft()
+                    self.dropped += 1
+                elif not self.condition.wait_for(lambda: len(self.records) < self.capacity or self.closed, timeout) or self.closed:
+                    self.dropped += 1
+                    return False
+            self.records.append(record)
+            self.accepted += 1
+            self.high_water_mark = max(self.high_water_mark, len(self.records))
+            self.condition.notify_all()
+            return True
+
+    #add several records taking the lock once, returns how many were accepted
+    def put_many(self, records, timeout=None):
+        with self.condition:
+            return sum(self.put(record, timeout) for record in records)
+
+    #add the records that fit without waiting or dropping any, in order. Returns how many were
+    #added, the rest are left to the caller
+    def put_available(self, records):
+        with self.condition:
+            count = max(min(len(records), self.capacity - len(self.records)), 0)
+            if count == 0: return 0
+            self.records.extend(records[:count])
+            self.accepted += count
+            self.high_water_mark = max(self.high_water_mark, len(self.records))
+            self.condition.notify_all()
+            return count
+
+    #wait until there is room for a record. False if the buffer was closed or the timeout expired
+    def wait_for_room(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.records) < self.capacity or self.closed, timeout) and not self.closed
+
+    #records the caller gave up on
+    def drop(self, count):
+        with self.condition:
+            self.dropped += count
+
+    #oldest record, None if the buffer is empty
+    def get(self):
+        with self.condition:
+            if len(self.records) == 0: return None
+            record = self.records.popleft()
+            self.condition.notify_all()
+            return record
+
+    #up to max_records of the oldest records. Waits up to timeout seconds (None waits forever)
+    #for the first one to arrive, returns an empty list if none did
+    def get_many(self, max_records, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.records) > 0 or self.closed, timeout):
+                return []
+            records = [self.records.popleft() for i in range(min(max_records, len(self.records)))]
+            self.condition.notify_all()
+            return records
+
+    #oldest record without removing it, waiting for it like get_many
+    def peek(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.records) > 0 or self.closed, timeout):
+                return None
+            return self.records[0] if len(self.records) > 0 else None
+
+    #wake every waiting thread, blocked senders drop their records
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def clear(self):
+        with self.condition:
+            self.records.clear()
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {'accepted': self.accepted, 'dropped': self.dropped, 'high_water_mark': self.high_water_mark, 'size': len(self.records)}
+
+    def __len__(self):
+        return len(self.records)
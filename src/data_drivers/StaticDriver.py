@@ -2,6 +2,11 @@ from abc import ABC, abstractmethod
 
 class InputDriver(ABC):
 
+    #rows per chunk when the driver streams its data, None if it loads everything at once
+    chunksize = None
+    #columns that will be used, None means every column
+    columns = None
+
     @abstractmethod
     def connect(self):
         pass
@@ -14,6 +19,14 @@ class InputDriver(ABC):
     def get_data(self):
         pass
 
+    #drivers that can read their data in row chunks override this
+    def get_chunks(self):
+        yield self.get_data()
+
+    #drivers that can skip unused columns read only these ones
+    def set_projection(self, columns):
+        self.columns = columns
+
     @abstractmethod
     def disconnect(self):
         pass
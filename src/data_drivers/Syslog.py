@@ -0,0 +1,117 @@
+import re
+import json
+
+#parses the payloads of datagrams into records. Syslog messages (RFC 5424 or RFC 3164) become
+#records with the fields of their header, and a json message is merged into them. Payloads that
+#can't be parsed are skipped and counted
+
+#<PRI>VERSION TIMESTAMP HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA MSG
+#the message may start with a byte order mark
+rfc5424 = re.compile(r'<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\\]|\\.)*\])+)(?: \ufeff?(.*))?$', re.DOTALL)
+#<PRI>Mmm dd hh:mm:ss HOSTNAME TAG[PID]: MSG
+rfc3164 = re.compile(r'<(\d{1,3})>([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (\S+) ([^\s:\[]+)(?:\[([^\]]*)\])?:? ?(.*)$', re.DOTALL)
+
+#record with the fields of the header of a syslog message, None if it isn't one. Fields without
+#a value (- in RFC 5424) are None
+def parse_header(line):
+    match = rfc5424.match(line)
+    if match is not None:
+        pri, timestamp, hostname, app_name, procid, msgid, structured_data, message = match.groups('')
+    else:
+        match = rfc3164.match(line)
+        if match is None: return None
+        pri, timestamp, hostname, app_name, procid, message = match.groups()
+        msgid, structured_data = None, None
+    return header(pri, timestamp, hostname, app_name, procid, msgid, structured_data, message)
+
+def header(pri, timestamp, hostname, app_name, procid, msgid, structured_data, message):
+    pri = int(pri)
+    if pri > 191: return None
+    return {'facility': pri >> 3, 'severity': pri & 7, 'timestamp': None if timestamp == '-' else timestamp,
+            'hostname': None if hostname == '-' else hostname, 'app_name': None if app_name == '-' else app_name,
+            'procid': None if procid == '-' else procid, 'msgid': None if msgid == '-' else msgid,
+            'structured_data': None if structured_data == '-' else structured_data, 'message': message}
+
+#structured messages replace the message field with their own fields. Every message is decoded
+#in a single call, one by one only if one of them is not json
+def merge_json_messages(records):
+    structured = [r for r in records if r['message'].startswith('{')]
+    if len(structured) == 0: return records
+    try:
+        contents = json.loads('[' + ','.join(r['message'] for r in structured) + ']')
+        #a message with several values separated by commas would shift the rest
+        if len(contents) != len(structured): raise ValueError()
+    except ValueError:
+        contents = []
+        for r in structured:
+            try:
+                contents.append(json.loads(r['message']))
+            except ValueError:
+                contents.append(None)
+    for record, content in zip(structured, contents):
+        if isinstance(content, dict):
+            del record['message']
+            record.update(content)
+    return records
+
+def parse_syslog(line):
+    record = parse_header(line)
+    return merge_json_messages([record])[0] if record is not None else None
+
+
+class PayloadParser():
+
+    formats = ['auto', 'json', 'syslog']
+
+    payload_format = None
+    errors = None
+
+    def __init__(self, payload_format='auto'):
+        if payload_format not in self.formats:
+            raise ValueError('Unknown payload format %s, use one of %s' % (payload_format, ', '.join(self.formats)))
+        self.payload_format = payload_format
+        self.errors = 0
+
+    #records of every payload that could be parsed, in order
+    def parse(self, payloads):
+        if self.payload_format == 'json': return self.parse_json([p.strip() for p in payloads])
+        if self.payload_format == 'syslog': return self.parse_syslog(payloads)
+        #json payloads start with a brace and syslog ones with the priority
+        payloads = [p.strip() for p in payloads]
+        if all(p.startswith(b'{') for p in payloads): return self.parse_json(payloads)
+        records = []
+        for p in payloads:
+            records += self.parse_json([p]) if p.startswith(b'{') else self.parse_syslog([p])
+        return records
+
+    #every payload is decoded in a single call, one by one only if one of them is invalid
+    def parse_json(self, payloads):
+        payloads = [p for p in payloads if p]
+        if len(payloads) == 0: return []
+        try:
+            records = json.loads(b'[' + b','.join(payloads) + b']')
+            #a payload like 1,2 is joined as two values
+            if len(records) == len(payloads) and all(isinstance(r, dict) for r in records): return records
+        except ValueError:
+            pass
+        records = []
+        for payload in payloads:
+            try:
+                record = json.loads(payload)
+            except ValueError:
+                record = None
+            if isinstance(record, dict):
+                records.append(record)
+            else:
+                self.errors += 1
+        return records
+
+    def parse_syslog(self, payloads):
+        records = []
+        for payload in payloads:
+            record = parse_header(payload.decode('utf-8', 'replace').rstrip('\r\n\x00'))
+            if record is None:
+                self.errors += 1
+            else:
+                records.append(record)
+        return merge_json_messages(records)
@@ -1,78 +1,94 @@
 import socket
-import json
 import threading
-import time
 from socketserver import BaseRequestHandler, ThreadingMixIn, TCPServer
-from data_drivers.RealTimeDriver import InputDriver, OutputDriver
-import pandas as pd
+from data_drivers.BufferedDriver import BufferedInputDriver
+from data_drivers.Framing import create_decoder
+import telemetry
 
-class TCPInputDriver(InputDriver):
+class TCPInputDriver(BufferedInputDriver):
 
-    cache = []
     server = None
     server_thread = None
-    headers = None
     host = ''
     port = 0
-    counter = 0
-    collection_time = 3600
+    framing = 'ndjson'
+    max_record_bytes = 1048576
+    connections = None
+    received_bytes = None
 
     class ThreadedTCPRequestHandler(BaseRequestHandler):
 
-        buffer_size = 4096
+        buffer_size = 65536
 
+        #connections stay open and stream framed records until the client closes them. Every
+        #record of a read is decoded and buffered together
         def handle(self):
-            data = self.request.recv(self.buffer_size)
-            cur_thread = threading.current_thread()
-            if len(data) > 0:
-                jdata = json.loads(data.decode('utf-8'))
-                TCPInputDriver.cache += [jdata]
+            driver = self.server.driver
+            decoder = create_decoder(driver.framing, driver.max_record_bytes)
+            driver.connections.inc()
+            try:
+                while not decoder.closed:
+                    data = self.request.recv(self.buffer_size)
+                    if len(data) == 0: break
+                    driver.received_bytes.inc(len(data))
+                    #with the block policy the sender waits here until there is room
+                    driver.buffer_records(decoder.feed(data))
+                driver.buffer_records(decoder.flush())
+            #a client that resets the connection loses its partial record
+            except ConnectionError:
+                pass
+            if decoder.errors > 0: driver.add_parse_errors(decoder.errors)
 
     class ThreadedTCPServer(ThreadingMixIn, TCPServer):
-        pass
+        #clients connect once per record, a short backlog makes them wait for a SYN retry
+        request_queue_size = 128
+        allow_reuse_address = True
+        daemon_threads = True
 
     def __init__(self):
-        self.cache.clear()
+        super().__init__()
+        self.connections = telemetry.Counter('anomal_tcp_connections_total', 'Connections accepted by the input driver')
+        self.received_bytes = telemetry.Counter('anomal_tcp_received_bytes_total', 'Bytes received by the input driver')
+
+    def register_metrics(self, registry):
+        super().register_metrics(registry)
+        registry.register(self.connections, self.received_bytes)
 
     def start_server(self):
         server = self.ThreadedTCPServer((self.host, self.port), self.ThreadedTCPRequestHandler)
+        #handlers reach the buffer of this driver through the server
+        server.driver = self
         self.server_thread = threading.Thread(target=server.serve_forever)
         self.server_thread.daemon = True
         self.server_thread.start()
         return server
 
-    def setup(self, host, port, collection_time):
+    def setup(self, host, port, collection_time, batch_size=1000, batch_timeout=0.1, buffer_capacity=100000, overflow_policy='block', framing='ndjson', max_record_bytes=1048576):
         if not host:
             raise ValueError('Please provide a valid host')
         if port < 0:
             raise ValueError('Please provide a valid port number')
-        if collection_time < 0:
-            raise ValueError('Please provide a valid collection time')
+        self.setup_buffer(collection_time, batch_size, batch_timeout, buffer_capacity, overflow_policy)
         self.host = host
         self.port = port
-        self.collection_time = collection_time
+        #fails on unknown framings and sizes
+        create_decoder(framing, max_record_bytes)
+        self.framing = framing
+        self.max_record_bytes = max_record_bytes
 
     def connect(self):
+        self.open_log()
         self.server = self.start_server()
         return True
 
-    def get_fields(self):
-        while len(self.cache) == 0:
-            time.sleep(1)
-        self.headers = list(self.cache[0].keys())
-        return self.headers
-
-    def get_register(self):
-        if len(self.cache) == 0: return None
-        aux = self.cache.pop(0)
-        aux = pd.DataFrame(index=[self.counter], data=[aux])
-        self.counter+=1
-        return aux
-
     def disconnect(self):
         self.server.shutdown()
-        self.cache = []
+        self.server.server_close()
+        #senders blocked on a full buffer give up
+        self.buffer.close()
+        self.buffer.clear()
+        self.close_log()
         return True
 
     def __str__(self):
-        return ','.join([str(x) for x in [self.host, self.port, self.collection_time, self.counter, self.cache, self.server, self.server_thread, self.headers]])
+        return ','.join([str(x) for x in [self.host, self.port, self.collection_time, self.counter, self.buffer.stats(), self.server, self.server_thread, self.headers]])
@@ -0,0 +1,121 @@
+import socket
+import select
+import struct
+import sys
+import threading
+from data_drivers.BufferedDriver import BufferedInputDriver
+from data_drivers.Syslog import PayloadParser
+import telemetry
+
+#receives json or syslog records, one per datagram. A reader thread wakes up when datagrams
+#arrive, reads every datagram waiting in the socket and buffers their records together
+class UDPInputDriver(BufferedInputDriver):
+
+    #linux reports how many datagrams the kernel dropped because the socket buffer was full
+    rxq_ovfl = getattr(socket, 'SO_RXQ_OVFL', 40 if sys.platform.startswith('linux') else None)
+    datagram_size = 65535
+    max_datagrams = 4096
+
+    sock = None
+    reader_thread = None
+    running = None
+    host = ''
+    port = 0
+    payload_format = 'auto'
+    receive_buffer = 8388608
+    kernel_drops = 0
+    datagrams = 0
+
+    def setup(self, host, port, collection_time, batch_size=1000, batch_timeout=0.1, buffer_capacity=100000, overflow_policy='block', payload_format='auto', receive_buffer=8388608):
+        if not host:
+            raise ValueError('Please provide a valid host')
+        if port < 0:
+            raise ValueError('Please provide a valid port number')
+        if receive_buffer <= 0:
+            raise ValueError('Please provide a valid receive buffer size')
+        self.setup_buffer(collection_time, batch_size, batch_timeout, buffer_capacity, overflow_policy)
+        self.host = host
+        self.port = port
+        #fails on unknown formats
+        PayloadParser(payload_format)
+        self.payload_format = payload_format
+        self.receive_buffer = receive_buffer
+
+    def connect(self):
+        self.open_log()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            #the kernel may cap it (net.core.rmem_max)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+            if self.rxq_ovfl is not None:
+                try:
+                    self.sock.setsockopt(socket.SOL_SOCKET, self.rxq_ovfl, 1)
+                except OSError:
+                    self.rxq_ovfl = None
+            self.sock.bind((self.host, self.port))
+        except Exception:
+            self.sock.close()
+            raise
+        self.sock.setblocking(False)
+        self.running = threading.Event()
+        self.running.set()
+        self.reader_thread = threading.Thread(target=self.read_datagrams)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+        return True
+
+    def read_datagrams(self):
+        parser = PayloadParser(self.payload_format)
+        while self.running.is_set():
+            ready, _, _ = select.select([self.sock], [], [], 0.1)
+            if not ready: continue
+            payloads = self.receive()
+            self.datagrams += len(payloads)
+            #with the block policy the datagrams wait in the socket until there is room
+            self.buffer_records(parser.parse(payloads))
+            if parser.errors > 0:
+                self.add_parse_errors(parser.errors)
+                parser.errors = 0
+
+    #every datagram waiting in the socket, up to max_datagrams
+    def receive(self):
+        payloads = []
+        try:
+            #the first one brings the count of dropped datagrams, the rest are read faster without it
+            if self.rxq_ovfl is not None:
+                payload, ancdata, _, _ = self.sock.recvmsg(self.datagram_size, socket.CMSG_SPACE(4))
+                payloads.append(payload)
+                for level, kind, data in ancdata:
+                    if level == socket.SOL_SOCKET and kind == self.rxq_ovfl:
+                        self.kernel_drops = struct.unpack('I', data[:4])[0]
+            while len(payloads) < self.max_datagrams:
+                payloads.append(self.sock.recv(self.datagram_size))
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            #the socket was closed
+            pass
+        return payloads
+
+    #records lost in the socket and in the buffer
+    def dropped(self):
+        return self.kernel_drops + self.buffer.dropped
+
+    def register_metrics(self, registry):
+        super().register_metrics(registry)
+        registry.register(
+            telemetry.Counter('anomal_udp_datagrams_total', 'Datagrams received by the input driver', lambda: self.datagrams),
+            telemetry.Counter('anomal_udp_kernel_drops_total', 'Datagrams dropped by the kernel because the socket buffer was full', lambda: self.kernel_drops))
+
+    def disconnect(self):
+        self.running.clear()
+        #a reader blocked on a full buffer gives up
+        self.buffer.close()
+        self.reader_thread.join()
+        self.sock.close()
+        self.buffer.clear()
+        self.close_log()
+        return True
+
+    def __str__(self):
+        return ','.join([str(x) for x in [self.host, self.port, self.collection_time, self.counter, self.datagrams, self.kernel_drops, self.buffer.stats(), self.headers]])
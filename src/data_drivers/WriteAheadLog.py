@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+
+#append only log of the received records, kept in a folder of segments so the records of an
+#unfinished collection can be read again after a restart. Every append is a single entry with
+#a batch of records:
+#   length of the payload, crc32 of the payload, number of records (4 bytes each, big endian)
+#   payload: the records as a json array
+#Records are numbered from the first one ever appended (their offset). Each segment is named
+#after the offset of its first record, and a new one is started when it reaches segment_size
+#bytes. Appends are written straight to the file, so they survive the process dying, and are
+#synced to the disk at most every sync_interval seconds. The offset of the first record that
+#wasn't processed is committed to a file, and segments with only older records are removed
+class WriteAheadLog():
+
+    header = struct.Struct('>III')
+    extension = '.wal'
+
+    folder = None
+    segment_size = None
+    sync_interval = None
+    segments = None
+    end_offset = None
+    file = None
+    file_size = None
+    last_sync = None
+    lock = None
+
+    def __init__(self, folder, segment_size=64 * 2**20, sync_interval=1.0):
+        if not folder:
+            raise ValueError('Please provide a folder for the write-ahead log')
+        if segment_size <= 0:
+            raise ValueError('Please provide a valid segment size')
+        if sync_interval < 0:
+            raise ValueError('Please provide a valid sync interval')
+        self.folder = folder
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+
+    def open(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.segments = sorted(int(name[:-len(self.extension)]) for name in os.listdir(self.folder) if name.endswith(self.extension))
+        if len(self.segments) == 0:
+            self.end_offset = self.committed_offset()
+            self.start_segment()
+            return self
+        #an entry cut by a crash is discarded
+        start = self.segments[-1]
+        valid_size, count = 0, 0
+        for size, records in self.scan(start):
+            valid_size += size
+            count += records
+        self.end_offset = start + count
+        self.file = open(self.segment_path(start), 'r+b', buffering=0)
+        self.file.truncate(valid_size)
+        self.file.seek(valid_size)
+        self.file_size = valid_size
+        self.last_sync = time.time()
+        return self
+
+    def segment_path(self, start):
+        return os.path.join(self.folder, '%020d%s' % (start, self.extension))
+
+    def start_segment(self):
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            self.file.close()
+        if len(self.segments) == 0 or self.segments[-1] != self.end_offset: self.segments.append(self.end_offset)
+        self.file = open(self.segment_path(self.end_offset), 'ab', buffering=0)
+        self.file_size = 0
+        self.last_sync = time.time()
+
+    #append a batch of records, returns the offset of the first one
+    def append(self, records):
+        if len(records) == 0: return self.end_offset
+        payload = json.dumps(records, separators=(',', ':')).encode('utf-8')
+        entry = self.header.pack(len(payload), zlib.crc32(payload), len(records)) + payload
+        with self.lock:
+            if self.file_size > 0 and self.file_size + len(entry) > self.segment_size: self.start_segment()
+            offset = self.end_offset
+            self.file.write(entry)
+            self.file_size += len(entry)
+            self.end_offset += len(records)
+            if time.time() - self.last_sync >= self.sync_interval: self.sync_file()
+        return offset
+
+    def sync(self):
+        with self.lock:
+            self.sync_file()
+
+    def sync_file(self):
+        os.fsync(self.file.fileno())
+        self.last_sync = time.time()
+
+    def committed_offset(self):
+        try:
+            with open(os.path.join(self.folder, 'committed'), 'r') as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    #every record before offset was processed. The file is replaced at once so a crash can't
+    #leave it half written
+    def commit(self, offset):
+        path = os.path.join(self.folder, 'committed')
+        with open(path + '.tmp', 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        with self.lock:
+            #segments whose records are all older than the offset are not needed anymore
+            while len(self.segments) > 1 and self.segments[1] <= offset:
+                os.remove(self.segment_path(self.segments.pop(0)))
+
+    #size and number of records of every valid entry of a segment
+    def scan(self, start):
+        for size, count, payload in self.entries(start):
+            yield size, count
+
+    def entries(self, start):
+        with open(self.segment_path(start), 'rb') as f:
+            while True:
+                header = f.read(self.header.size)
+                if len(header) < self.header.size: return
+                length, crc, count = self.header.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc: return
+                yield self.header.size + length, count, payload
+
+    #batches of the records from offset (the committed one by default) until end (the end of
+    #the log when it was opened by default), as they were appended
+    def replay(self, offset=None, end=None):
+        if offset is None: offset = self.committed_offset()
+        if end is None: end = self.end_offset
+        segments = list(self.segments)
+        for i, start in enumerate(segments):
+            #segments that end before the offset are skipped
+            if i + 1 < len(segments) and segments[i + 1] <= offset: continue
+            if start >= end: return
+            position = start
+            for size, count, payload in self.entries(start):
+                if position + count > offset:
+                    records = json.loads(payload)
+                    yield records[max(offset - position, 0):end - position]
+                position += count
+                if position >= end: return
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.sync_file()
+                self.file.close()
+                self.file = None
+        return True
+
+
+#opens an existing log only to read it
+def read_log(folder):
+    if not os.path.isdir(folder):
+        raise FileNotFoundError('There is no write-ahead log at %s' % folder)
+    log = WriteAheadLog(folder)
+    log.segments = sorted(int(name[:-len(log.extension)]) for name in os.listdir(folder) if name.endswith(log.extension))
+    log.end_offset = log.segments[-1] + sum(count for size, count in log.scan(log.segments[-1])) if len(log.segments) > 0 else 0
+    return log
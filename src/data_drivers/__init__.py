@@ -1,3 +1,6 @@
 from .CSVDriver import CSVInputDriver, CSVOutputDriver
 from .ElasticDriver import ElasticOutputDriver
 from .TCPDriver import TCPInputDriver
+from .AsyncTCPDriver import AsyncTCPInputDriver
+from .UDPDriver import UDPInputDriver
+from .ReplayDriver import ReplayInputDriver
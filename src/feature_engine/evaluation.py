@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from base64 import b64decode
+
+#build a function object from its base64 encoded code
+def create_func_obj(func_code_str):
+    g = dict()
+    l = dict()
+    exec(b64decode(func_code_str).decode('ascii'), g, l)
+    if l: return list(l.values())[0]
+    return None
+
+#numeric columns read from a csv with blank cells have object dtype, they are compared with
+#numbers as numbers and the cells that aren't one don't match
+def comparable(col, value):
+    if isinstance(value, (int, float)) and not pd.api.types.is_numeric_dtype(col):
+        return pd.to_numeric(col, errors='coerce')
+    return col
+
+#operators of declarative filter expressions, they receive the column and the value
+expression_operators = {
+    '==': lambda col, value: col == value,
+    '!=': lambda col, value: col != value,
+    '<': lambda col, value: comparable(col, value) < value,
+    '<=': lambda col, value: comparable(col, value) <= value,
+    '>': lambda col, value: comparable(col, value) > value,
+    '>=': lambda col, value: comparable(col, value) >= value,
+    'startswith': lambda col, value: col.astype(str).str.startswith(str(value)),
+    'endswith': lambda col, value: col.astype(str).str.endswith(str(value)),
+    'contains': lambda col, value: col.astype(str).str.contains(str(value), regex=False),
+    'matches': lambda col, value: col.astype(str).str.contains(str(value), regex=True),
+    'in': lambda col, value: col.isin(value)
+}
+
+def parse_expression_value(value):
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    for cast in [int, float]:
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+#build a vectorized filter from an expression like 'dns.question.name endswith .local'.
+#Returns the column it needs and the function
+def compile_expression(expression):
+    parts = expression.split(None, 2)
+    if len(parts) != 3 or parts[1] not in expression_operators:
+        raise ValueError('Invalid filter expression \'%s\'' % expression)
+    column, operator, value = parts
+    if operator == 'in':
+        value = [parse_expression_value(v) for v in value.split(',')]
+    else:
+        value = parse_expression_value(value)
+    op = expression_operators[operator]
+    def expression_filter(col):
+        return op(col, value)
+    return column, expression_filter
+
+#a plugin function can declare that it works on whole columns either from the
+#yaml ('vectorized: true') or by setting the attribute on the function itself
+def is_vectorized(yaml_obj, impl, default=False):
+    if 'vectorized' in yaml_obj: return bool(yaml_obj['vectorized'])
+    return bool(getattr(impl, 'vectorized', default))
+
+#column-at-a-time call, every needed column is passed as a whole Series
+def evaluate_vectorized(df, needed, fn, params):
+    args = [df[n] for n in needed]
+    if len(params) != 0: args.append(params)
+    result = fn(*args)
+    if isinstance(result, pd.Series): return result
+    return pd.Series(result, index=df.index)
+
+#row-at-a-time call, kept as fallback for plugins that work on single values
+def evaluate_rows(df, needed, fn, params):
+    has_params = len(params) != 0
+    if len(needed) > 1:
+        if has_params:
+            return df[needed].apply(lambda x: fn(*x, params), axis=1)
+        return df[needed].apply(lambda x: fn(*x), axis=1)
+    if has_params:
+        return df[needed[0]].apply(fn, args=(params,))
+    return df[needed[0]].apply(fn)
+
+#row-at-a-time function called once per distinct value (or tuple of values) of
+#the needed columns, the results are broadcast back to every row through the codes
+def evaluate_unique(df, needed, fn, params, stats=None):
+    has_params = len(params) != 0
+    if len(needed) > 1:
+        codes, uniques = pd.MultiIndex.from_frame(df[needed]).factorize(use_na_sentinel=False)
+    else:
+        codes, uniques = pd.factorize(df[needed[0]], use_na_sentinel=False)
+    if has_params:
+        values = [fn(*u, params) if len(needed) > 1 else fn(u, params) for u in uniques]
+    else:
+        values = [fn(*u) if len(needed) > 1 else fn(u) for u in uniques]
+    if stats is not None:
+        stats['rows'] += len(df)
+        stats['calls'] += len(uniques)
+    #object array so tuples or lists returned by fn are not unpacked by numpy
+    results = np.empty(len(values), dtype=object)
+    results[:] = values
+    return pd.Series(results[codes], index=df.index).infer_objects()
+
+#evaluate a parsed filter, metric or flag over the df. The result is aligned with df's index
+def evaluate(df, f, dedup=False, stats=None):
+    needed = f['data_needed'].split(',')
+    if len(df) == 0: return pd.Series(index=df.index, dtype=object)
+    if f.get('vectorized', False):
+        return evaluate_vectorized(df, needed, f['fn'], f['params'])
+    if dedup:
+        return evaluate_unique(df, needed, f['fn'], f['params'], stats)
+    return evaluate_rows(df, needed, f['fn'], f['params'])
@@ -0,0 +1,98 @@
+from rich.tree import Tree
+
+#DAG built from the parsed yaml. Nodes are:
+#   load: the records read by the input driver
+#   filters: every filter, evaluated as one combined mask
+#   input: the needed columns of one or more metrics/flags, selected once and shared
+#   metric, flag, aggregation: one per parsed metric, direct flag and aggregation flag
+#   features: the feature frame built from the selected fields and the metrics
+class ExecutionPlan():
+
+    nodes = None
+    node_ids = None #id of the node of each parsed metric/flag
+    selected_features = None
+
+    def __init__(self, selected_features, metrics, flags, filters, projection):
+        self.nodes = {}
+        self.node_ids = {}
+        self.selected_features = selected_features
+        self.add_node('load', 'load', [], columns=projection)
+        last = 'load'
+        if len(filters) > 0:
+            last = self.add_node('filters', 'filters', [last], items=filters)
+        metric_ids = []
+        for f in metrics + [f for f in flags if f['type'] != 'aggregation']:
+            needed = f['data_needed'].split(',')
+            input_id = 'input:' + ','.join(needed)
+            if input_id not in self.nodes:
+                self.add_node(input_id, 'input', [last], columns=needed)
+            kind = 'flag' if 'type' in f else 'metric'
+            node_id = self.add_node('%s:%s' % (kind, f['name']), kind, [input_id], item=f)
+            if kind == 'metric': metric_ids.append(node_id)
+        for f in flags:
+            if f['type'] == 'aggregation':
+                self.add_node('aggregation:' + f['name'], 'aggregation', [last], item=f)
+        if len(selected_features) > 0:
+            self.add_node('features', 'features', [last] + metric_ids, columns=selected_features, items=metrics)
+
+    def add_node(self, node_id, kind, depends_on, **kwargs):
+        #names can be repeated between metrics and flags of the same kind
+        unique_id, i = node_id, 1
+        while unique_id in self.nodes:
+            unique_id, i = '%s#%d' % (node_id, i), i + 1
+        node = dict(id=unique_id, kind=kind, depends_on=depends_on, consumers=[], **kwargs)
+        for d in depends_on:
+            self.nodes[d]['consumers'].append(unique_id)
+        self.nodes[unique_id] = node
+        if 'item' in kwargs: self.node_ids[id(kwargs['item'])] = unique_id
+        return unique_id
+
+    def node_id(self, f):
+        return self.node_ids[id(f)]
+
+    #nodes grouped by depth, every node only depends on nodes of previous levels
+    def levels(self):
+        depth = {}
+        for node_id, node in self.nodes.items():
+            #nodes are added after their dependencies
+            depth[node_id] = max([depth[d] + 1 for d in node['depends_on']], default=0)
+        levels = [[] for i in range(max(depth.values()) + 1)]
+        for node_id, d in depth.items():
+            levels[d].append(self.nodes[node_id])
+        return levels
+
+    #intermediate results that can be released once every consumer has run
+    def is_freeable(self, node_id):
+        return self.nodes[node_id]['kind'] in ['input', 'metric']
+
+    #level after which each freeable result is released
+    def release_levels(self):
+        level_of = {n['id']: i for i, level in enumerate(self.levels()) for n in level}
+        return {node_id: max(level_of[c] for c in node['consumers'])
+                for node_id, node in self.nodes.items() if self.is_freeable(node_id) and len(node['consumers']) > 0}
+
+    def describe(self, node):
+        if node['kind'] == 'load':
+            return 'load (%s)' % ('columns: ' + ', '.join(node['columns']) if node['columns'] else 'every column')
+        if node['kind'] == 'filters':
+            return 'filters (%s)' % ' -> '.join(f['name'] for f in node['items'])
+        if node['kind'] == 'features':
+            return 'features (fields: %s)' % ', '.join(node['columns'])
+        text = node['id']
+        if node['kind'] in ['metric', 'flag']:
+            text += ' (%s)' % ('vectorized' if node['item'].get('vectorized', False) else 'per row')
+        return text
+
+    def tree(self):
+        tree = Tree('Execution plan')
+        release = self.release_levels()
+        for i, level in enumerate(self.levels()):
+            branch = tree.add('Level %d%s' % (i, ' (concurrent)' if len(level) > 1 else ''))
+            for node in level:
+                leaf = branch.add(self.describe(node))
+                if len(node['depends_on']) > 0:
+                    leaf.add('after: ' + ', '.join(node['depends_on']))
+            freed = [node_id for node_id, l in release.items() if l == i]
+            if len(freed) > 0:
+                branch.add('frees: ' + ', '.join(freed))
+        return tree
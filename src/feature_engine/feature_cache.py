@@ -0,0 +1,98 @@
+import hashlib
+import os
+import yaml
+import pandas as pd
+from collections import OrderedDict
+
+class FeatureCache():
+
+    folder = None
+    max_bytes = None
+    hits = None
+    misses = None
+    sizes = None #size of every entry, the least recently used first
+    total_bytes = None
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder if folder[-1] == '/' else folder + '/'
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.folder, exist_ok=True)
+        #the folder is only read once, then the sizes are kept up to date in memory
+        entries = sorted((os.stat(p).st_mtime, p, os.stat(p).st_size) for p in self.entries())
+        self.sizes = OrderedDict((p, size) for _, p, size in entries)
+        self.total_bytes = sum(self.sizes.values())
+
+    #code that defines the result of a function: its function_code or every module of its plugin
+    def source_code(self, source):
+        if source is None: return None
+        if 'function_code' in source:
+            code = source['function_code']
+            return code if isinstance(code, bytes) else code.encode('ascii')
+        plugin_folder = os.path.dirname(source['path'])
+        code = source['name'].encode('utf-8')
+        for name in sorted(os.listdir(plugin_folder)):
+            if name.endswith('.py'):
+                with open(os.path.join(plugin_folder, name), 'rb') as f:
+                    code += f.read()
+        return code
+
+    #hash of the input columns, the function's code and its params. None if it can't be cached
+    def key(self, df, f):
+        code = self.source_code(f.get('source'))
+        if code is None: return None
+        needed = f['data_needed'].split(',')
+        h = hashlib.sha256()
+        h.update(code)
+        h.update(f['data_needed'].encode('utf-8'))
+        h.update(yaml.dump(f['params'], sort_keys=True).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(df[needed], index=True).values.tobytes())
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return self.folder + key + '.pkl'
+
+    def get(self, key):
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            result = pd.read_pickle(path)
+        except Exception:
+            self.misses += 1
+            return None
+        #touch the entry so it is still recently used in the next runs
+        os.utime(path)
+        if path in self.sizes: self.sizes.move_to_end(path)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        path = self.entry_path(key)
+        result.to_pickle(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.total_bytes -= self.sizes.pop(path, 0)
+        self.sizes[path] = os.path.getsize(path)
+        self.total_bytes += self.sizes[path]
+        self.evict()
+
+    def entries(self):
+        return [self.folder + name for name in os.listdir(self.folder) if name.endswith('.pkl')]
+
+    #remove the least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.sizes) > 0:
+            path, size = self.sizes.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for path in self.entries():
+            os.remove(path)
+        self.sizes.clear()
+        self.total_bytes = 0
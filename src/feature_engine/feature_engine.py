@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from base64 import b64encode, b64decode
 import requests
@@ -7,8 +8,16 @@ import inspect
 import time
 import sys
 import pickle
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import telemetry
 
 from .plugin_loader import PluginLoader
+from .evaluation import evaluate, is_vectorized, create_func_obj, compile_expression
+from .parallel import evaluate_chunks
+from .profiler import Profiler
+from .execution_plan import ExecutionPlan
 
 class FeatureEngine():
 
@@ -20,6 +29,14 @@ class FeatureEngine():
     pluginLoader = None
     console = None
     terminal_mode = None
+    workers = None
+    executor = None
+    threads = None #runs the nodes of a level of the plan concurrently
+    dedup = None
+    evaluation_stats = None
+    cache = None
+    projection = None
+    profiler = None
 
     #maybe separate into errors module
     class ValidationError(Exception):
@@ -30,7 +47,7 @@ class FeatureEngine():
         def __init__(self, msg):
             self.msg = msg
 
-    def __init__(self, in_driver, out_driver, in_real_time, features_path, save_results, console, terminal_mode):
+    def __init__(self, in_driver, out_driver, in_real_time, features_path, save_results, console, terminal_mode, workers=1, dedup=False, cache=None, profile=False):
         self.in_driver = in_driver
         self.in_real_time = in_real_time
         self.out_driver = out_driver
@@ -39,13 +56,23 @@ class FeatureEngine():
         self.plugin_loader = PluginLoader(console, terminal_mode)
         self.console = console
         self.terminal_mode = terminal_mode
+        self.workers = workers if workers else 1
+        self.dedup = dedup
+        self.evaluation_stats = {}
+        #real time batches are never read again, their results would only fill the cache
+        self.cache = cache if not in_real_time else None
+        self.profiler = Profiler(profile)
 
     def create_func_obj(self, func_code_str):
-        g = dict()
-        l = dict()
-        exec(b64decode(func_code_str).decode('ascii'), g, l)
-        if l: return list(l.values())[0]
-        return None
+        return create_func_obj(func_code_str)
+
+    #where an implementation comes from, so worker processes can rebuild it
+    def fn_source(self, yaml_obj, implemented, module_name):
+        if yaml_obj['name'] in implemented:
+            path = getattr(sys.modules[module_name], '__file__', None)
+            if path is None: return None
+            return {'module': module_name, 'path': path, 'name': yaml_obj['name']}
+        return {'function_code': yaml_obj['function_code']}
 
     def open_yaml(self, path):
         try:
@@ -69,12 +96,14 @@ class FeatureEngine():
 
     def read_yaml(self, path, headers):
         #read yaml
-        yaml_data = self.open_yaml(path)
+        with self.profiler.stage('yaml', 'parse'):
+            yaml_data = self.open_yaml(path)
         #check if all data needed is available
         try:
             self.check_data_needed_available(yaml_data, headers)
         except self.ValidationError as e:
             raise self.ValidationError(e)
+        self.projection = self.projected_columns(yaml_data, headers)
         #build dicts with selected fields, metrics and flags. create feature if needed
         metrics_to_apply = []
         filters = []
@@ -82,10 +111,11 @@ class FeatureEngine():
         metrics_to_apply = []
         flags = []
         if 'plugins' in yaml_data.keys():
-            #load plugins
-            self.plugin_loader.load_plugin(yaml_data['plugins'])
-            #import plugin modules
-            self.plugin_imports()
+            with self.profiler.stage('plugin', 'import'):
+                #load plugins
+                self.plugin_loader.load_plugin(yaml_data['plugins'])
+                #import plugin modules
+                self.plugin_imports()
         if 'filters' in yaml_data.keys():
             if self.terminal_mode: self.console.print('Parsing Filters', style='khaki3')
             try:
@@ -107,6 +137,12 @@ class FeatureEngine():
     def get_module_implementations(self, module):
         return dict(inspect.getmembers(module, inspect.isfunction)) if module.__name__ in sys.modules else {}
 
+    #filters declared with an expression don't need to declare data_needed
+    def data_needed_of(self, f):
+        if 'data_needed' in f.keys(): return f['data_needed']
+        if 'expression' in f.keys(): return f['expression'].split()[0]
+        return f['name']
+
     #check all features have required dataset column
     def check_data_needed_available(self, yaml_data, headers):
         sections = ['filters', 'features', 'flags']
@@ -114,16 +150,38 @@ class FeatureEngine():
         for s in sections:
             if s in yaml_data:
                 for f in yaml_data[s]:
-                    data_needed = f['data_needed'] if 'data_needed' in f.keys() else f['name']
+                    data_needed = self.data_needed_of(f)
                     for dn in data_needed.split(','):
                         if dn not in headers:
                             raise self.ValidationError('%s %s needs %s, which is not in the given dataset' % (s[:-1], f['name'], dn))
                     if 'function_code' in f.keys() and not f['function_code']:
                         raise self.ValidationError('%s %s needs %s, which is not in the given dataset' % (s[:-1], f['name'], dn))
 
+    #every column used by the filters, features and flags, in the dataset's order
+    def projected_columns(self, yaml_data, headers):
+        needed = set(self.needed_columns(yaml_data))
+        return [h for h in headers if h in needed]
+
+    #every column used by the filters, features and flags, in the order they are used
+    def needed_columns(self, yaml_data):
+        needed = []
+        for s in ['filters', 'features', 'flags']:
+            if s in yaml_data:
+                for f in yaml_data[s]:
+                    needed += self.data_needed_of(f).split(',')
+                    #fields are selected by name
+                    if s == 'features' and f.get('type') == 'field': needed.append(f['name'])
+        return list(dict.fromkeys(needed))
+
     def validate_filter(self, _filter, implemented_filters):
         if 'name' not in _filter:
             raise self.ValidationError('Filter doesn\'t have name')
+        if 'expression' in _filter:
+            try:
+                compile_expression(_filter['expression'])
+            except ValueError as e:
+                raise self.ValidationError('The filter %s has an invalid expression: %s' % (_filter['name'], e))
+            return
         if _filter['name'] not in implemented_filters and 'function_code' not in _filter:
             raise self.ValidationError('The filter %s was not found on the implemented filters but it\'s function code was not provided either' % _filter['name'])
         if 'data_needed' not in _filter:
@@ -139,13 +197,28 @@ class FeatureEngine():
                 self.validate_filter(f, implemented_filters)
             except self.ValidationError as e:
                 raise self.ValidationError(e)
+            if 'expression' in f:
+                #declarative filter, evaluated vectorized without calling plugin code
+                column, impl = compile_expression(f['expression'])
+                filters_to_apply += [{
+                    'name': f['name'],
+                    'fn': impl,
+                    'data_needed': column,
+                    'params': {},
+                    'vectorized': True,
+                    'source': {'expression': f['expression']}
+                }]
+                continue
             impl = implemented_filters[f['name']] if f['name'] in implemented_filters else self.create_func_obj(f['function_code'])
             params = f['params'] if 'params' in f.keys() else {}
+            #filters always received the whole column, so they are vectorized unless told otherwise
             filters_to_apply += [{
                 'name': f['name'],
                 'fn': impl,
                 'data_needed': f['data_needed'],
-                'params': params
+                'params': params,
+                'vectorized': is_vectorized(f, impl, default=True),
+                'source': self.fn_source(f, implemented_filters, 'filters')
             }]
         return filters_to_apply
 
@@ -185,7 +258,9 @@ class FeatureEngine():
                     'name': f['name'],
                     'data_needed' : f['data_needed'],
                     'fn' : impl,
-                    'params': params
+                    'params': params,
+                    'vectorized': is_vectorized(f, impl),
+                    'source': self.fn_source(f, implemented_metrics, 'metrics')
                 }]
         return selected_features, metrics_to_apply
 
@@ -226,113 +301,412 @@ class FeatureEngine():
                 'data_needed' : f['data_needed'],
                 'severity': f['severity'],
                 'fn' : impl,
-                'params': params
+                'params': params,
+                'vectorized': is_vectorized(f, impl),
+                'source': self.fn_source(f, implemented_flags, 'flags')
             }
             if 'message' in f:
                 partial_obj['message'] = f['message']
             flags_to_apply += [partial_obj]
         return flags_to_apply
 
-    def apply_filters(self, df, filters):
+    #positions of the rows that survive every filter. Each filter only sees the needed
+    #columns of the rows that the previous ones kept
+    def filters_mask(self, df, filters):
+        keep = np.ones(len(df), dtype=bool)
         for f in filters:
-            if len(f['params']) != 0:
-                df.drop(df[f['fn'](df[f['data_needed']], f['params'])].index, inplace=True)
-            else:
-                df.drop(df[f['fn'](df[f['data_needed']])].index, inplace=True)
+            alive = np.flatnonzero(keep)
+            if len(alive) == 0: break
+            with self.profiler.stage('filter', f['name'], rows_in=len(alive)) as record:
+                subset = df[f['data_needed'].split(',')]
+                if len(alive) < len(df): subset = subset.iloc[alive]
+                drop = np.asarray(evaluate(subset, f), dtype=bool)
+                keep[alive[drop]] = False
+                record['rows_out'] = len(alive) - int(drop.sum())
+        return keep
+
+    #the df is only sliced once, after every filter was evaluated
+    def apply_filters(self, df, filters):
+        keep = self.filters_mask(df, filters)
+        if not keep.all(): df.drop(df.index[~keep], inplace=True)
+
+    #evaluate metrics or direct flags, splitting the rows across the process pool if there are workers
+    def evaluate_all(self, df, fs):
+        parallel = self.workers > 1 and len(df) >= self.workers and all(f.get('source') is not None for f in fs)
+        if len(fs) == 0 or not parallel:
+            results = []
+            for f in fs:
+                stats = {'rows': 0, 'calls': 0}
+                #direct flags have a type, metrics don't
+                with self.profiler.stage('flag' if 'type' in f else 'metric', f['name'], rows_in=len(df)) as record:
+                    result = evaluate(df, f, self.dedup, stats)
+                    record['rows_out'] = int(np.asarray(result, dtype=bool).sum()) if 'type' in f else len(result)
+                results.append((result, stats))
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            #functions evaluated together in the pool can't be timed separately
+            with self.profiler.stage('parallel', ', '.join(f['name'] for f in fs), rows_in=len(df)):
+                results = evaluate_chunks(self.executor, df, fs, self.workers, self.dedup)
+        for f, (_, stats) in zip(fs, results):
+            self.record_evaluation_stats(f['name'], stats)
+        return [r for r, _ in results]
+
+    #keep track of how many calls were saved by evaluating once per distinct value
+    def record_evaluation_stats(self, name, stats):
+        if stats['rows'] == 0: return
+        total = self.evaluation_stats.setdefault(name, {'rows': 0, 'calls': 0})
+        total['rows'] += stats['rows']
+        total['calls'] += stats['calls']
+
+    def print_evaluation_stats(self):
+        for name, stats in self.evaluation_stats.items():
+            hit_ratio = 1 - stats['calls'] / stats['rows']
+            self.console.print('%s: %d calls for %d rows (%.2f%% hit ratio)' % (name, stats['calls'], stats['rows'], hit_ratio * 100), style='khaki3')
+
+    def shutdown_workers(self):
+        if self.threads is not None:
+            self.threads.shutdown()
+            self.threads = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
     def run_flags(self, df, flags):
         flags_results = []
         aux_result = None
+        direct_flags = [f for f in flags if f['type'] != 'aggregation']
+        direct_results = dict(zip([id(f) for f in direct_flags], self.evaluate_all(df, direct_flags)))
         for f in flags:
-            needed = f['data_needed'].split(',')
             if f['type'] == 'aggregation':
-                aux_result, message = f['fn'](df, f['params'])
+                with self.profiler.stage('flag', f['name'], rows_in=len(df)) as record:
+                    aux_result, message = f['fn'](df, f['params'])
+                    record['rows_out'] = len(aux_result) if hasattr(aux_result, '__len__') else None
                 f['message'] = message
                 f['result'] = aux_result
             else:
-                has_params = len(f['params']) != 0
-                if len(needed) > 1:
-                    if has_params:
-                        aux_result = df[needed].apply(lambda x: f['fn'](*x, f['params']), axis=1)
-                    else:
-                        aux_result = df[needed].apply(lambda x: f['fn'](*x), axis=1)
-                else:
-                    if has_params:
-                        aux_result = df[needed[0]].apply(f['fn'], f['params'])
-                    else:
-                        aux_result = df[needed[0]].apply(f['fn'])
+                aux_result = direct_results[id(f)]
                 f['result'] = df.loc[aux_result]
             #we don't need the implementation anymore
             del f['fn']
             flags_results.append(f)
         return flags_results
 
+    #evaluate the metrics, loading from the feature cache the ones that were already computed
+    def compute_metrics(self, df, metrics):
+        if self.cache is None: return self.evaluate_all(df, metrics)
+        with self.profiler.stage('cache', 'lookup', rows_in=len(df)):
+            keys = [self.cache.key(df, f) for f in metrics]
+            results = [self.cache.get(k) if k is not None else None for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        computed = self.evaluate_all(df, [metrics[i] for i in missing])
+        for i, result in zip(missing, computed):
+            results[i] = result
+            if keys[i] is not None: self.cache.put(keys[i], result)
+        return results
+
     # Grab selected features or apply metrics
     def apply_features(self, df, selected_fields, metrics, headers):
-        for f in metrics:
-            needed = f['data_needed'].split(',')
-            has_params = len(f['params']) != 0
-            if len(needed) > 1:
-                if has_params:
-                    df[f['name']] = df[needed].apply(lambda x: f['fn'](*x, f['params']), axis=1)
-                else:
-                    df[f['name']] = df[needed].apply(lambda x: f['fn'](*x), axis=1)
-            else:
-                if has_params:
-                    df[f['name']] = df[needed[0]].apply(f['fn'], f['params'])
-                else:
-                    df[f['name']] = df[needed[0]].apply(f['fn'])
+        for f, result in zip(metrics, self.compute_metrics(df, metrics)):
+            df[f['name']] = result
         #TODO column renaming should be done here
         #erase original columns
-        return df.drop(columns=list(set(headers) - set(selected_fields)), inplace=True)
+        return df.drop(columns=list(set(headers) - set(selected_fields)), inplace=True, errors='ignore')
 
-    def realtime_processing(self, in_driver, selected_features, metrics, headers, collection_time):
-        df = None
-        timeout = time.time() + collection_time
-        while time.time() < timeout:
-            aux_df = in_driver.get_register()
-            if aux_df is None: continue
-            self.apply_features(aux_df, selected_features, metrics, headers)
-            df = pd.concat([df, aux_df])
-        flags_results = run_flags(df, flags)
-        if len(filters) != 0: apply_filters(aux_df, filters)
+    #new frame with only the selected fields (in the df's order) followed by the computed metrics
+    def build_feature_frame(self, df, selected_fields, metrics):
+        return self.assemble_feature_frame(df, selected_fields, metrics, self.compute_metrics(df, metrics))
+
+    def assemble_feature_frame(self, df, selected_fields, metrics, results):
+        columns = {c: df[c] for c in df.columns if c in selected_fields}
+        for f, result in zip(metrics, results):
+            columns[f['name']] = result
+        return pd.DataFrame(columns, index=df.index)
+
+    #run every node of the plan, level by level. Nodes of the same level don't depend on each
+    #other and run in threads when there are workers, unless the memory of every stage is being
+    #profiled. Returns the result of each node that wasn't freed
+    def execute_plan(self, plan, df, skip=()):
+        outputs = {'load': df}
+        if 'filters' in skip and 'filters' in plan.nodes: outputs['filters'] = df
+        remaining = {node_id: len(node['consumers']) for node_id, node in plan.nodes.items()}
+        if self.workers > 1:
+            #created once, so the threads share a single process pool
+            if self.executor is None: self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            if self.threads is None: self.threads = ThreadPoolExecutor(max_workers=self.workers)
+        for level in plan.levels():
+            nodes = [n for n in level if n['kind'] != 'load' and n['kind'] not in skip]
+            groups = self.level_groups(plan, nodes, outputs)
+            concurrent = self.threads is not None and len(groups) > 1 and not self.profiler.enabled
+            results = list(self.threads.map(lambda group: group[1](), groups)) if concurrent else [run() for _, run in groups]
+            for (group_nodes, _), group_results in zip(groups, results):
+                for node, result in zip(group_nodes, group_results):
+                    outputs[node['id']] = result
+            #release the shared inputs and metric results after their last consumer
+            for node in nodes:
+                for d in node['depends_on']:
+                    remaining[d] -= 1
+                    if remaining[d] == 0 and plan.is_freeable(d): del outputs[d]
+        return outputs
+
+    #the metrics of a level are evaluated with a single call, and so are the direct flags, so
+    #the process pool gets the rows once for all of them. They read the columns of their
+    #inputs, put side by side. Every other node runs on its own.
+    #Returns (nodes, function returning their results) pairs
+    def level_groups(self, plan, nodes, outputs):
+        groups = []
+        for kind in ['metric', 'flag']:
+            batch = [n for n in nodes if n['kind'] == kind]
+            if len(batch) == 0: continue
+            inputs = [outputs[i] for i in dict.fromkeys(n['depends_on'][0] for n in batch)]
+            records = inputs[0] if len(inputs) == 1 else combine_inputs(inputs)
+            groups.append((batch, partial(self.run_batch, kind, records, [n['item'] for n in batch])))
+        for node in nodes:
+            if node['kind'] in ['metric', 'flag']: continue
+            groups.append(([node], partial(self.run_single, node, outputs)))
+        return groups
+
+    def run_single(self, node, outputs):
+        return [self.run_node(node, [outputs[d] for d in node['depends_on']])]
+
+    def run_batch(self, kind, df, items):
+        if kind == 'metric': return self.compute_metrics(df, items)
+        return self.evaluate_all(df, items)
+
+    def run_node(self, node, inputs):
+        kind = node['kind']
+        if kind == 'filters':
+            self.apply_filters(inputs[0], node['items'])
+            return inputs[0]
+        if kind == 'input':
+            return inputs[0][node['columns']]
+        if kind == 'aggregation':
+            f = node['item']
+            with self.profiler.stage('flag', f['name'], rows_in=len(inputs[0])) as record:
+                aux_result, message = f['fn'](inputs[0], f['params'])
+                record['rows_out'] = len(aux_result) if hasattr(aux_result, '__len__') else None
+            return aux_result, message
+        if kind == 'features':
+            return self.assemble_feature_frame(inputs[0], node['columns'], node['items'], inputs[1:])
+
+    #store the result of each flag from the outputs of the plan
+    def collect_flags(self, plan, outputs, df, flags):
+        for f in flags:
+            if f['type'] == 'aggregation':
+                f['result'], f['message'] = outputs[plan.node_id(f)]
+            else:
+                f['result'] = df.loc[outputs[plan.node_id(f)]]
+            #we don't need the implementation anymore
+            del f['fn']
+        return flags
+
+    #read the data in chunks and keep only the feature frame and the rows that triggered
+    #the flags. Aggregation flags need every record so only their columns are kept
+    def streaming_processing(self, selected_features, metrics, flags, filters):
+        df, flags, _ = self.process_chunks(self.timed_chunks(), selected_features, metrics, flags, filters)
+        return df, flags
+
+    #filters, direct flags and metrics run on each chunk, the results are concatenated once at
+    #the end. The filtered chunks themselves are only kept if keep_original
+    def process_chunks(self, chunks, selected_features, metrics, flags, filters, keep_original=False):
+        plan = ExecutionPlan(selected_features, metrics, flags, filters, self.projection)
+        direct_flags = [f for f in flags if f['type'] != 'aggregation']
+        aggregation_flags = [f for f in flags if f['type'] == 'aggregation']
+        aggregation_columns = list(dict.fromkeys(c for f in aggregation_flags for c in f['data_needed'].split(',')))
+        feature_chunks = []
+        aggregation_chunks = []
+        original_chunks = []
+        hits = [[] for f in direct_flags]
+        for chunk in chunks:
+            result = self.process_chunk(plan, chunk, filters, direct_flags)
+            if result is None: continue
+            features, chunk_hits = result
+            for flag_hits, h in zip(hits, chunk_hits):
+                flag_hits.append(h)
+            if keep_original: original_chunks.append(chunk)
+            elif len(aggregation_flags) > 0: aggregation_chunks.append(chunk[aggregation_columns])
+            if features is not None: feature_chunks.append(features)
+        df_original = pd.concat(original_chunks) if len(original_chunks) > 0 else None
+        for f, flag_hits in zip(direct_flags, hits):
+            f['result'] = pd.concat(flag_hits) if len(flag_hits) > 0 else pd.DataFrame()
+            del f['fn']
+        if len(aggregation_flags) > 0:
+            if keep_original: aggregation_df = df_original
+            else: aggregation_df = pd.concat(aggregation_chunks) if len(aggregation_chunks) > 0 else None
+            #every record was filtered out
+            if aggregation_df is None: aggregation_df = pd.DataFrame(columns=aggregation_columns)
+            self.run_flags(aggregation_df, aggregation_flags)
+        df = pd.concat(feature_chunks) if len(feature_chunks) > 0 else None
+        return df, flags, df_original
+
+    #filters, direct flags and metrics of a single chunk. Returns its feature frame (None without
+    #selected features) and the rows that triggered each direct flag, or None if every record
+    #was filtered out
+    def process_chunk(self, plan, chunk, filters, direct_flags):
+        if len(filters) > 0: self.apply_filters(chunk, filters)
+        if len(chunk) == 0: return None
+        #aggregation flags run once every chunk was read
+        outputs = self.execute_plan(plan, chunk, skip=('filters', 'aggregation'))
+        return outputs.get('features'), [chunk.loc[outputs[plan.node_id(f)]] for f in direct_flags]
+
+    #chunks from the input driver, timing how long each one takes to load
+    def timed_chunks(self):
+        chunks = self.in_driver.get_chunks()
+        while True:
+            with self.profiler.stage('load', 'chunk') as record:
+                chunk = next(chunks, None)
+                record['rows_out'] = len(chunk) if chunk is not None else 0
+            if chunk is None: return
+            yield chunk
+
+    #batches of up to batch_size records until the collection time is over. The driver blocks
+    #until records arrive or the batch timeout expires, so there is no busy waiting
+    def realtime_batches(self, in_driver, collection_time):
+        return self.batches_until(in_driver, time.time() + collection_time)
+
+    def batches_until(self, in_driver, deadline):
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0: return
+            with self.profiler.stage('load', 'batch') as record:
+                batch = in_driver.get_batch(in_driver.batch_size, min(in_driver.batch_timeout, remaining))
+                record['rows_out'] = len(batch) if batch is not None else 0
+            if batch is None: continue
+            #the batch is processed by the consumer until it asks for the next one
+            started = time.perf_counter()
+            yield batch
+            telemetry.batch_processing_seconds.observe(time.perf_counter() - started)
+            telemetry.batch_records.observe(len(batch))
+            telemetry.batches_processed.inc()
+            telemetry.records_processed.inc(len(batch))
+            telemetry.last_batch_timestamp.set(time.time())
+
+    #micro-batches from a real time driver. The records are kept since they can't be read again
+    def realtime_processing(self, in_driver, selected_features, metrics, flags, filters, collection_time):
+        return self.process_chunks(self.realtime_batches(in_driver, collection_time), selected_features, metrics, flags, filters, keep_original=True)
+
+    #records are grouped in panes of window_step seconds. Filters, direct flags and metrics run
+    #once per pane, and every window is made of the last window_size / window_step panes, so
+    #overlapping windows share the panes instead of computing them again. Only the panes of the
+    #current window are kept. Yields (window number, feature frame, flags results) forever
+    def windowed_processing(self, in_driver, selected_features, metrics, flags, filters, window_size, window_step):
+        if window_step <= 0 or window_size < window_step or abs(window_size / window_step - round(window_size / window_step)) > 1e-9:
+            raise ValueError('The window size has to be a multiple of the window step')
+        plan = ExecutionPlan(selected_features, metrics, flags, filters, self.projection)
+        direct_flags = [f for f in flags if f['type'] != 'aggregation']
+        aggregation_columns = list(dict.fromkeys(c for f in flags if f['type'] == 'aggregation' for c in f['data_needed'].split(',')))
+        panes = deque(maxlen=round(window_size / window_step))
+        window = 0
+        pane_end = time.time() + window_step
+        while True:
+            feature_chunks, aggregation_chunks, hits = [], [], [[] for f in direct_flags]
+            #offset of the first record of the pane, for drivers with a write-ahead log
+            offset = getattr(in_driver, 'counter', None)
+            for batch in self.batches_until(in_driver, pane_end):
+                result = self.process_chunk(plan, batch, filters, direct_flags)
+                if result is None: continue
+                features, batch_hits = result
+                if features is not None: feature_chunks.append(features)
+                for flag_hits, h in zip(hits, batch_hits):
+                    flag_hits.append(h)
+                if len(aggregation_columns) > 0: aggregation_chunks.append(batch[aggregation_columns])
+            panes.append({
+                'features': pd.concat(feature_chunks) if len(feature_chunks) > 0 else None,
+                'hits': [pd.concat(flag_hits) if len(flag_hits) > 0 else pd.DataFrame() for flag_hits in hits],
+                'aggregation': pd.concat(aggregation_chunks) if len(aggregation_chunks) > 0 else pd.DataFrame(columns=aggregation_columns),
+                'offset': offset
+            })
+            pane_end += window_step
+            if len(panes) == panes.maxlen:
+                yield (window,) + self.close_window(panes, flags, direct_flags)
+                window += 1
+                #the window was handled, only the records of the next panes are needed again
+                if hasattr(in_driver, 'commit'): in_driver.commit(panes[1]['offset'] if len(panes) > 1 else in_driver.counter)
+
+    #feature frame and flags results of the panes of a window. The flags keep their
+    #implementation for the next windows, the results are copies without it
+    def close_window(self, panes, flags, direct_flags):
+        features = [p['features'] for p in panes if p['features'] is not None]
+        df = pd.concat(features) if len(features) > 0 else None
+        flags_results = []
+        for f in flags:
+            result = {k: v for k, v in f.items() if k != 'fn'}
+            if f['type'] == 'aggregation':
+                data = pd.concat([p['aggregation'] for p in panes])
+                with self.profiler.stage('flag', f['name'], rows_in=len(data)):
+                    result['result'], result['message'] = f['fn'](data, f['params'])
+            else:
+                i = direct_flags.index(f)
+                result['result'] = pd.concat([p['hits'][i] for p in panes])
+            flags_results.append(result)
         return df, flags_results
 
-    def run(self, features_file):
-        if self.terminal_mode: self.console.print('Connecting with drivers', style='khaki3')
-        #obtain headers
+    #headers and parsed features file, exits if they can't be read
+    def load_features(self, features_file):
         try:
-            headers = self.in_driver.get_fields()
+            with self.profiler.stage('load', 'fields'):
+                headers = self.in_driver.get_fields()
         except Exception as e:
             sys.exit('There was a problem reading the headers of the file')
-        #read features
         if self.terminal_mode: self.console.print('Reading Yaml file', style='khaki3')
+        try:
+            return headers, self.read_yaml(features_file, headers)
+        except self.ValidationError as e:
+            sys.exit(e)
+
+    def run_windowed(self, features_file, window_size, window_step):
+        if self.terminal_mode: self.console.print('Connecting with drivers', style='khaki3')
+        headers, (selected_features, metrics, flags, filters) = self.load_features(features_file)
+        return self.windowed_processing(self.in_driver, selected_features, metrics, flags, filters, window_size, window_step)
+
+    #print the execution plan of a features file without reading the data. The driver isn't
+    #asked for its fields, real time drivers would wait for the first record to give them
+    def explain(self, features_file):
+        headers = self.needed_columns(self.open_yaml(features_file))
         try:
             selected_features, metrics, flags, filters = self.read_yaml(features_file, headers)
         except self.ValidationError as e:
             sys.exit(e)
+        plan = ExecutionPlan(selected_features, metrics, flags, filters, self.projection)
+        self.console.print(plan.tree())
+        return plan
+
+    def run(self, features_file):
+        if self.terminal_mode: self.console.print('Connecting with drivers', style='khaki3')
+        self.profiler.start()
+        #obtain headers and read features
+        headers, (selected_features, metrics, flags, filters) = self.load_features(features_file)
+        #tell the driver which columns are needed so it can skip the rest
+        if not self.in_real_time:
+            if self.terminal_mode: self.console.print('Reading %d of %d columns' % (len(self.projection), len(headers)), style='khaki3')
+            self.in_driver.set_projection(self.projection)
         #apply features
         df = None
-        if not self.in_real_time:
+        if not self.in_real_time and self.in_driver.chunksize:
+            #streaming static data, the original records are not kept
+            df_original = None
+            df, flags_results = self.streaming_processing(selected_features, metrics, flags, filters)
+        elif not self.in_real_time:
             #Read static data
-            df_original = self.in_driver.get_data()
-            #Apply filters if they exist
-            if len(filters) > 0: self.apply_filters(df_original, filters)
-            #Grab selected features
-            if len(selected_features) == 0:
-                if len(flags) > 0: flags_results = self.run_flags(df_original, flags)
-            else:
-                if len(flags) > 0:
-                    df = df_original.copy()
-                    flags_results = self.run_flags(df, flags)
-                else:
-                    df = df_original
-                    flags_results = []
-                self.apply_features(df, selected_features, metrics, headers)
+            with self.profiler.stage('load', 'data') as record:
+                df_original = self.in_driver.get_data()
+                record['rows_out'] = len(df_original)
+            #filters, flags and metrics. Flags read the original records and the feature frame
+            #is a new narrow frame, the original keeps every column
+            plan = ExecutionPlan(selected_features, metrics, flags, filters, self.projection)
+            outputs = self.execute_plan(plan, df_original)
+            flags_results = self.collect_flags(plan, outputs, df_original, flags)
+            df = outputs.get('features')
         else:
-            df, flags_results = self.realtime_processing(self.in_driver, selected_features, metrics, headers, self.in_driver.collection_time)
+            df, flags_results, df_original = self.realtime_processing(self.in_driver, selected_features, metrics, flags, filters, self.in_driver.collection_time)
         #we have the data, we can disconnect from source
         self.in_driver.disconnect()
+        self.shutdown_workers()
+        if self.terminal_mode and self.dedup: self.print_evaluation_stats()
+        if self.terminal_mode and self.cache is not None:
+            self.console.print('Feature cache: %d hits, %d misses' % (self.cache.hits, self.cache.misses), style='khaki3')
+        self.profiler.stop()
+        if self.terminal_mode and self.profiler.enabled: self.console.print(self.profiler.table())
         if self.save_results:
             if df is not None: self.out_driver.save(df, 'behavior_analysis.csv')
             if len(flags_results) > 0:
@@ -341,4 +715,8 @@ class FeatureEngine():
             self.out_driver.disconnect()
         return df_original, df, flags_results
 
-
+#the columns of several inputs as a single frame. Inputs that need some of the same columns
+#have them once
+def combine_inputs(frames):
+    df = pd.concat(frames, axis=1)
+    return df.loc[:, ~df.columns.duplicated()]
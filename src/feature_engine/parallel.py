@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from .evaluation import evaluate, create_func_obj, compile_expression
+from .plugin_loader import PluginLoader
+
+#functions already rebuilt by this (worker) process
+resolved_functions = {}
+
+#keys of a parsed filter, metric or flag that are sent to the workers
+job_keys = ['name', 'data_needed', 'params', 'vectorized', 'source']
+
+#rebuild an implementation from its source. Plugin modules are imported again
+#if the worker didn't inherit them from the parent process
+def resolve_fn(source):
+    key = tuple(sorted(source.items()))
+    if key in resolved_functions: return resolved_functions[key]
+    if 'function_code' in source:
+        fn = create_func_obj(source['function_code'])
+    elif 'expression' in source:
+        fn = compile_expression(source['expression'])[1]
+    else:
+        module = sys.modules.get(source['module'])
+        if module is None or getattr(module, '__file__', None) != source['path']:
+            plugin_folder = os.path.dirname(source['path'])
+            loader = PluginLoader(None, False, plugin_base_folder=os.path.dirname(plugin_folder) + '/')
+            loader.import_plugin_modules(os.path.basename(plugin_folder))
+            module = sys.modules[source['module']]
+        fn = getattr(module, source['name'])
+    resolved_functions[key] = fn
+    return fn
+
+def to_job(f):
+    return {k: f[k] for k in job_keys if k in f}
+
+#worker entry point, evaluates every job over a chunk of rows
+def run_chunk(chunk, jobs, dedup=False):
+    results = []
+    for job in jobs:
+        stats = {'rows': 0, 'calls': 0}
+        results.append((evaluate(chunk, dict(job, fn=resolve_fn(job['source'])), dedup, stats), stats))
+    return results
+
+#split the df in row chunks, evaluate them in the pool and stitch the results back in order.
+#Returns a (result, stats) tuple for each function
+def evaluate_chunks(executor, df, fs, n_chunks, dedup=False):
+    jobs = [to_job(f) for f in fs]
+    columns = list(dict.fromkeys(c for f in fs for c in f['data_needed'].split(',')))
+    bounds = np.linspace(0, len(df), n_chunks + 1, dtype=int)
+    chunks = [df.iloc[a:b][columns] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    partial_results = list(executor.map(run_chunk, chunks, [jobs] * len(chunks), [dedup] * len(chunks)))
+    results = []
+    for i in range(len(jobs)):
+        stats = {'rows': sum(r[i][1]['rows'] for r in partial_results), 'calls': sum(r[i][1]['calls'] for r in partial_results)}
+        results.append((pd.concat([r[i][0] for r in partial_results]), stats))
+    return results
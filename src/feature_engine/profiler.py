@@ -0,0 +1,78 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from rich.table import Table
+
+class Profiler():
+
+    enabled = None
+    stages = None
+    started_tracing = None
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+        self.started_tracing = False
+
+    def start(self):
+        #memory deltas come from tracemalloc, only traced while profiling
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    #time a stage. The yielded record can be updated with rows_in/rows_out from inside the block.
+    #CPU time is the one of the thread running the stage, not of other threads or the worker
+    #processes. Memory is traced for the whole process, so stages running at the same time would
+    #count each other's allocations: the feature engine runs them one at a time while profiling
+    @contextmanager
+    def stage(self, kind, name, rows_in=None):
+        record = {'kind': kind, 'name': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+        memory_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - wall
+            record['cpu_time'] = time.thread_time() - cpu
+            record['memory_delta'] = (tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0) - memory_before
+            self.stages.append(record)
+
+    #stages that ran more than once (e.g. once per chunk) are added up
+    def summary(self):
+        totals = {}
+        for r in self.stages:
+            total = totals.setdefault((r['kind'], r['name']), {'kind': r['kind'], 'name': r['name'], 'calls': 0, 'rows_in': None, 'rows_out': None, 'wall_time': 0.0, 'cpu_time': 0.0, 'memory_delta': 0})
+            total['calls'] += 1
+            for k in ['rows_in', 'rows_out']:
+                if r[k] is not None: total[k] = (total[k] or 0) + r[k]
+            for k in ['wall_time', 'cpu_time', 'memory_delta']:
+                total[k] += r[k]
+        for total in totals.values():
+            rows = total['rows_in'] if total['rows_in'] is not None else total['rows_out']
+            total['rows_per_second'] = rows / total['wall_time'] if rows is not None and total['wall_time'] > 0 else None
+        return list(totals.values())
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'stages': self.summary()}, f, indent=2)
+
+    def table(self):
+        table = Table(title='Feature Engine Profile')
+        for column in ['Stage', 'Name', 'Calls', 'Rows in', 'Rows out', 'Wall (s)', 'CPU (s)', 'Rows/s', 'Memory delta (MB)']:
+            table.add_column(column, justify='left' if column in ['Stage', 'Name'] else 'right')
+        fmt = lambda value, pattern: pattern % value if value is not None else '-'
+        for s in self.summary():
+            table.add_row(s['kind'], s['name'], str(s['calls']), fmt(s['rows_in'], '%d'), fmt(s['rows_out'], '%d'),
+                          '%.3f' % s['wall_time'], '%.3f' % s['cpu_time'], fmt(s['rows_per_second'], '%.0f'),
+                          '%.2f' % (s['memory_delta'] / 2**20))
+        return table
@@ -39,27 +39,32 @@ class Report():
     flags = None
     Zd = None
     clusters = None
+    scores = None #anomaly score of every record, only given by some engines
     gow = None
     scaled_x = None #MDS data
     scaled_y = None #MDS data
-    dend_plot = None #baked dendrogram plot
+    dend_plot = None #baked dendrogram plot, or the scores plot when there is no dendrogram
     corr_plot = None #baked correlation plot
     features_vectors = None #baked features vectors
     only_flags = None
+    original_loader = None #reads the original records when df_original was not kept
 
     md_intro = None
     md_features = None
 
-    def __init__(self, df, df_original, classification_engine, flags):
+    def __init__(self, df, df_original, classification_engine, flags, original_loader=None):
         self.df = df
         self.df_original = df_original
+        self.original_loader = original_loader
         self.flags = flags
         if classification_engine is not None:
             self.only_flags = False
             self.weights = classification_engine.weights_
-            self.gow = classification_engine.raw_matrix_
+            #large matrices are sampled, the whole matrix can't be drawn
+            self.gow = classification_engine.heatmap_matrix()
             self.Zd, self.clusters = classification_engine.calculate_linkage()
             self.df['label'] = self.clusters
+            self.scores = getattr(classification_engine, 'scores_', None)
             self.scaled_x, self.scaled_y, self.features_vectors = classification_engine._2d_representation()
             self.features_vectors = classification_engine.features_vectors_
             self.features_importance = self.df.corr(numeric_only=True)['label'].drop(['label']).abs().sort_values(ascending=True).reset_index().rename(columns={'index': 'variable', 'label':'contribution'})
@@ -79,13 +84,29 @@ class Report():
             self.only_flags = True
 
 
-    def get_suspects(self):
+    #positions of the anomalous group
+    def suspects_positions(self):
+        if self.scores is not None:
+            #ranked by score, the most anomalous first
+            positions = np.where(self.clusters == 2)[0]
+            return positions[np.argsort(-self.scores[positions], kind='stable')]
         #Always grab the last group which is the one with the fewest members
-        suspects_id = self.df.iloc[np.where(self.clusters == list(Counter(self.clusters))[-1])[0]].index
+        return np.where(self.clusters == list(Counter(self.clusters))[-1])[0]
+
+    def get_suspects(self):
+        suspects_id = self.df.iloc[self.suspects_positions()].index
         #add flagged ids
         for flag in self.flags:
             suspects_id = np.append(suspects_id, np.array(flag['result'].index))
-        return self.df_original.loc[suspects_id].sort_index(), self.df.loc[suspects_id].sort_index()
+        suspects_original = self.df_original.loc[suspects_id] if self.df_original is not None else self.original_loader(suspects_id)
+        if self.scores is None:
+            return suspects_original.sort_index(), self.df.loc[suspects_id].sort_index()
+        #sorted by score instead of by id
+        scores = pd.Series(self.scores, index=self.df.index)
+        return self.by_score(suspects_original, scores), self.by_score(self.df.loc[suspects_id], scores)
+
+    def by_score(self, df, scores):
+        return df.assign(score=scores.reindex(df.index).values).sort_values('score', ascending=False, kind='stable')
 
     def bkapp(self, doc):
         max_clusters = 7
@@ -96,6 +117,7 @@ class Report():
         testdf['x'] = self.scaled_x
         testdf['y'] = self.scaled_y
         testdf['colors'] = colors
+        if self.scores is not None: testdf['score'] = self.scores
         source = ColumnDataSource(testdf)
         #callback function to update the values
         def update_mds_result_colors(attrname, old, new):
@@ -113,6 +135,7 @@ class Report():
             ( 'numbers_in_hostname', '@{numbers_in_hostname}'),
             ( 'hostname_entropy', '@{hostname_entropy}')
         ]
+        if self.scores is not None: tooltips.append(('score', '@score'))
         #The plot itself
         mds_result_plot= figure(toolbar_location=None, title='MDS', width=self.graph_size, height=self.graph_size, tooltips=tooltips)
         mds_result_plot.circle('x','y', fill_color='colors',line_color=None,source=source)
@@ -121,7 +144,8 @@ class Report():
         #    mds_result_plot.text(x='x',y='y', text='text', color='color', source=ColumnDataSource(pd.DataFrame.from_records([dict(x=self.features_vectors[i][0],y=self.features_vectors[i][1], text=self.features_importance['variable'][i], color='white')])))
         #    mds_result_plot.segment(x0='x0',y0='y0', x1='x1', y1='y1', line_color='white', source=ColumnDataSource(pd.DataFrame.from_records([dict(x0=0, y0=0, x1=self.features_vectors[i][0],y1=self.features_vectors[i][1])])))
         doc.theme = 'dark_minimal'
-        doc.add_root(column([mds_result_plot, clusters_slider]))
+        #without a hierarchy there are only two groups
+        doc.add_root(column([mds_result_plot, clusters_slider]) if self.Zd is not None else column([mds_result_plot]))
         doc.title = "PF"
 
     def build_dendogram(self):
@@ -130,6 +154,13 @@ class Report():
         fig.update_layout(width=self.graph_size, height=self.graph_size, margin=self.margins, paper_bgcolor="#191d21", plot_bgcolor="#24292e")
         self.dend_plot = fig.to_html(include_plotlyjs="require", full_html=True)
 
+    #distribution of the anomaly scores, coloured by group
+    def build_score_plot(self):
+        pio.templates.default = "plotly_dark"
+        fig = px.histogram(pd.DataFrame({'score': self.scores, 'label': self.clusters.astype(str)}), x='score', color='label')
+        fig.update_layout(width=self.graph_size, height=self.graph_size, margin=self.margins, paper_bgcolor="#191d21", plot_bgcolor="#24292e", showlegend=False)
+        self.dend_plot = fig.to_html(include_plotlyjs="require", full_html=True)
+
     def feature_relevance_graph(self):
         fig = go.Figure(go.Bar(
                 x=[round(i, 2) for i in self.features_importance['contribution']],
@@ -139,8 +170,7 @@ class Report():
         return fig.to_html(include_plotlyjs="require", full_html=False)
 
     def suspects_features_group(self):
-        suspects_id = np.where(self.clusters == list(Counter(self.clusters))[-1])
-        return self.df.iloc[suspects_id].drop(['label'], axis=1).to_html(border=0)
+        return self.df.iloc[self.suspects_positions()].drop(['label'], axis=1).to_html(border=0)
 
     #select input to select feature
     def build_distplot_by_feature(self, feature):
@@ -194,6 +224,14 @@ class Report():
     Use the slider to increase the cluster segmentation. The dendrogram can help to visualize the branching of the clustering.
     '''
 
+    md_main_scores = '''
+    ## Anomaly Scores
+
+    These graphs show the anomaly score of the data, the Gower distance to its nearest neighbours.
+
+    The records with the highest scores form the anomal group. The histogram shows how the scores are distributed.
+    '''
+
     md_main_2 = '''
     ## Similarity Heatmap
 
@@ -253,7 +291,7 @@ class Report():
             main_tab = {'title': 'Main',
                  'content': [
                     put_column([
-                        put_markdown(self.md_main),
+                        put_markdown(self.md_main if self.Zd is not None else self.md_main_scores),
                         put_row([
                             put_column([put_html(self.dend_plot)]),
                             put_scope('bokeh')
@@ -327,7 +365,8 @@ class Report():
                     put_html(self.build_distplot_by_feature(changed['value']))
 
     def bake_data(self):
-        self.build_dendogram()
+        if self.Zd is not None: self.build_dendogram()
+        else: self.build_score_plot()
         self.build_corr_plot()
 
     def start(self):
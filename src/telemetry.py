@@ -0,0 +1,186 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#counters, gauges and histograms exposed in the Prometheus text format. Every thread updates
+#its own cell of a metric, so updates never take a lock, and the cells are only added up when
+#the metrics are read
+
+class Metric():
+
+    kind = None
+    name = None
+    help = None
+    fn = None
+    cells = None
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        #metrics with a function are read from it, e.g. the size of a buffer
+        self.fn = fn
+        self.cells = {}
+
+    def value(self):
+        if self.fn is not None: return self.fn()
+        return sum(list(self.cells.values()))
+
+    def samples(self):
+        return [(self.name, self.value())]
+
+    def exposition(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.kind)]
+        return '\n'.join(lines + ['%s %s' % (name, format_value(value)) for name, value in self.samples()])
+
+
+class Counter(Metric):
+
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        #only this thread writes its cell
+        thread = threading.get_ident()
+        self.cells[thread] = self.cells.get(thread, 0) + amount
+
+
+class Gauge(Metric):
+
+    kind = 'gauge'
+    current = 0
+
+    #the last value set by any thread
+    def set(self, value):
+        self.current = value
+
+    def value(self):
+        return self.fn() if self.fn is not None else self.current
+
+
+class Histogram(Metric):
+
+    kind = 'histogram'
+    buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+    def __init__(self, name, help, buckets=None):
+        super().__init__(name, help)
+        if buckets is not None: self.buckets = sorted(buckets)
+
+    #the cell of every thread has a count per bucket, plus the sum and the count of the values
+    def observe(self, value):
+        thread = threading.get_ident()
+        cell = self.cells.get(thread)
+        if cell is None:
+            cell = [0] * (len(self.buckets) + 1) + [0.0]
+            self.cells[thread] = cell
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        totals = [0] * (len(self.buckets) + 2)
+        for cell in list(self.cells.values()):
+            totals = [t + c for t, c in zip(totals, cell)]
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + ['+Inf'], totals):
+            cumulative += count
+            samples.append(('%s_bucket{le="%s"}' % (self.name, format_value(bound) if bound != '+Inf' else bound), cumulative))
+        return samples + [(self.name + '_sum', totals[-1]), (self.name + '_count', cumulative)]
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer(): return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+class Registry():
+
+    metrics = None
+    lock = None
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    #a metric with the same name replaces the previous one, e.g. of a driver that was created again
+    def register(self, *metrics):
+        with self.lock:
+            for metric in metrics:
+                self.metrics[metric.name] = metric
+        return metrics[0] if len(metrics) == 1 else metrics
+
+    def exposition(self):
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        return ''.join(m.exposition() + '\n' for m in metrics)
+
+
+#serves the metrics of a registry at /metrics from a background thread
+class MetricsServer():
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    registry = None
+    host = None
+    port = None
+    server = None
+    server_thread = None
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] not in ['/', '/metrics']:
+                self.send_error(404)
+                return
+            body = self.server.registry.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', MetricsServer.content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        #scrapes are not logged to the terminal
+        def log_message(self, format, *args):
+            pass
+
+    def __init__(self, registry, host='localhost', port=9100):
+        if port < 0:
+            raise ValueError('Please provide a valid port number')
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self.MetricsRequestHandler)
+        self.server.daemon_threads = True
+        self.server.registry = self.registry
+        self.port = self.server.server_address[1]
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        return True
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        return True
+
+
+#metrics of the whole process, drivers register their own ones
+registry = Registry()
+
+batches_processed = registry.register(Counter('anomal_batches_processed_total', 'Real time batches processed by the feature engine'))
+records_processed = registry.register(Counter('anomal_records_processed_total', 'Real time records processed by the feature engine'))
+batch_records = registry.register(Histogram('anomal_batch_records', 'Records per real time batch', [1, 10, 100, 1000, 10000, 100000]))
+batch_processing_seconds = registry.register(Histogram('anomal_batch_processing_seconds', 'Seconds the feature engine takes to process a real time batch'))
+last_batch_timestamp = registry.register(Gauge('anomal_last_batch_timestamp_seconds', 'Unix time when the feature engine finished the last real time batch'))
+classification_seconds = registry.register(Histogram('anomal_classification_seconds', 'Seconds taken by the classification engine'))
+classified_records = registry.register(Counter('anomal_classified_records_total', 'Records classified by the classification engine'))
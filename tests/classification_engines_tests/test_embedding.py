@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import cdist
+from classification_engines.embedding import classical_mds, landmark_mds, stress
+from classification_engines.gower_nmds_classification import GowerNMDS
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).random((200, 2)) * 10
+
+def test_classical_mds_recovers_euclidean_points(points):
+    distances = cdist(points, points)
+    embedded = classical_mds(distances)
+    assert np.allclose(cdist(embedded, embedded), distances)
+    assert stress(distances, embedded) < 1e-6
+
+def test_landmark_mds_recovers_euclidean_points(points):
+    distances = cdist(points, points)
+    read = []
+    def rows(indexes):
+        read.append(len(indexes))
+        return distances[indexes]
+    embedded = landmark_mds(rows, len(points), landmarks=20)
+    assert np.allclose(cdist(embedded, embedded), distances)
+    #only the distances of the landmarks were read
+    assert read == [20]
+
+def test_small_matrices():
+    assert classical_mds(np.array([[0.0, 1.0], [1.0, 0.0]])).shape == (2, 2)
+
+@pytest.mark.parametrize('embedding', ['classical', 'landmark'])
+def test_engine_embeddings(embedding):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'bytes': rng.integers(0, 100, 80), 'host': pd.Series(rng.choice(['a', 'b'], 80), dtype=object)})
+    engine = GowerNMDS(embedding=embedding, landmarks=30)
+    engine.setup(df, np.array([1, 1]))
+    scaled_x, scaled_y, vectors = engine._2d_representation()
+    assert len(scaled_x) == len(scaled_y) == 80
+    assert stress(engine.raw_matrix_, np.column_stack([scaled_x, scaled_y])) < 0.5
+
+def test_unknown_embedding():
+    with pytest.raises(ValueError):
+        GowerNMDS(embedding='tsne')
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+import pandas as pd
+import gower
+from classification_engines.gower_knn_classification import GowerKNN
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'bytes': rng.integers(0, 100, 60),
+        'ratio': rng.random(60) * 5,
+        'host': pd.Series(rng.choice(['a.com', 'b.com', 'c.com'], 60), dtype=object)
+    })
+    #a record far from every other one
+    df.loc[59, ['bytes', 'ratio', 'host']] = [1000, 50.0, 'z.com']
+    return df
+
+#the k smallest distances of every row to the other rows, from the whole matrix
+def brute_force(df, weights, k):
+    matrix = gower.gower_matrix(df, weight=weights)
+    np.fill_diagonal(matrix, np.inf)
+    return matrix, np.sort(matrix, axis=1)[:, :k]
+
+@pytest.mark.parametrize('tile_rows', [1, 7, 1024])
+def test_same_as_gower(df, tile_rows):
+    weights = np.array([1, 2, 1])
+    matrix, expected = brute_force(df, weights, 5)
+    engine = GowerKNN(k=5, tile_rows=tile_rows)
+    engine.setup(df, weights)
+    assert np.array_equal(engine.distances_, expected)
+    assert np.array_equal(matrix[np.arange(60)[:, None], engine.neighbors_], expected)
+    assert np.array_equal(engine.scores_, expected.mean(axis=1, dtype=np.float64))
+
+def test_kth_score(df):
+    engine = GowerKNN(k=3, score='kth')
+    engine.setup(df, None)
+    assert np.array_equal(engine.scores_, brute_force(df, None, 3)[1][:, 2])
+
+def test_more_neighbours_than_rows(df):
+    engine = GowerKNN(k=10)
+    engine.setup(df.iloc[:4], None)
+    assert engine.distances_.shape == (4, 3)
+    assert np.array_equal(engine.distances_, brute_force(df.iloc[:4], None, 3)[1])
+
+def test_ranking_and_labels(df):
+    engine = GowerKNN(k=5, contamination=0.05)
+    engine.setup(df, None)
+    ranking = engine.ranking()
+    assert ranking.index[0] == 59
+    assert list(ranking['rank']) == list(range(1, 61))
+    assert ranking['score'].is_monotonic_decreasing
+    Zd, clusters = engine.calculate_linkage()
+    assert Zd is None
+    assert (clusters == 2).sum() == 3 and clusters[59] == 2
+
+def test_heatmap_and_representation(df):
+    engine = GowerKNN(landmarks=20)
+    engine.setup(df, None)
+    rows = np.linspace(0, 59, 10).astype(int)
+    assert np.array_equal(engine.heatmap_matrix(10), gower.gower_matrix(df)[rows][:, rows])
+    scaled_x, scaled_y, vectors = engine._2d_representation()
+    assert len(scaled_x) == 60 and len(scaled_y) == 60
+
+def test_result_has_neighbours(df):
+    engine = GowerKNN(k=2)
+    engine.setup(df, None)
+    result = engine.matrix_to_dataframe()
+    assert list(result.columns) == ['score', 'neighbor_1', 'distance_1', 'neighbor_2', 'distance_2']
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        GowerKNN(k=0)
+    with pytest.raises(ValueError):
+        GowerKNN(contamination=1)
+    with pytest.raises(ValueError):
+        GowerKNN(score='max')
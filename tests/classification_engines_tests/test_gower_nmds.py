@@ -0,0 +1,128 @@
+import pytest
+import numpy as np
+import pandas as pd
+import gower
+from scipy.spatial.distance import squareform
+from classification_engines.gower_nmds_classification import GowerNMDS
+from classification_engines.gower_parallel import balanced_tiles, shared_array
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'bytes': rng.integers(0, 100, 60),
+        'ratio': rng.random(60) * 5,
+        'host': pd.Series(rng.choice(['a.com', 'b.com', 'c.com'], 60), dtype=object)
+    })
+    #the first rows hold the min and max of every numeric column
+    df.loc[0, ['bytes', 'ratio']] = [0, 0.0]
+    df.loc[1, ['bytes', 'ratio']] = [100, 5.0]
+    return df
+
+def test_setup_same_as_gower(df):
+    weights = np.array([1, 2, 1])
+    engine = GowerNMDS()
+    engine.setup(df, weights)
+    assert np.array_equal(engine.raw_matrix_, gower.gower_matrix(df, weight=weights))
+
+@pytest.mark.parametrize('backend', ['condensed', 'dense'])
+def test_append_within_ranges(df, backend):
+    weights = np.array([1, 2, 1])
+    engine = GowerNMDS(backend)
+    engine.setup(df.iloc[:40], weights)
+    engine.append(df.iloc[40:50])
+    engine.append(df.iloc[50:])
+    assert engine.full_recomputes_avoided_ == 2
+    assert not engine.stale_
+    assert np.array_equal(engine.raw_matrix_, gower.gower_matrix(df, weight=weights))
+
+def test_append_widening_a_range(df):
+    weights = np.array([1, 2, 1])
+    engine = GowerNMDS()
+    engine.setup(df, weights)
+    new_rows = pd.DataFrame({'bytes': [500], 'ratio': [1.0], 'host': pd.Series(['a.com'], dtype=object)})
+    engine.append(new_rows)
+    #computed again only when used
+    assert engine.stale_ and engine.full_recomputes_avoided_ == 0
+    expected = gower.gower_matrix(pd.concat([df, new_rows]), weight=weights)
+    assert np.array_equal(engine.raw_matrix_, expected)
+    assert not engine.stale_
+
+@pytest.mark.parametrize('backend', ['condensed', 'dense'])
+def test_sliding_rows(df, backend):
+    weights = np.array([1, 2, 1])
+    sliding = GowerNMDS(backend)
+    #the first two rows hold the ranges, they are kept at the end
+    sliding.setup(pd.concat([df.iloc[10:40], df.iloc[:2]]), weights)
+    sliding.drop_first(5)
+    sliding.append(df.iloc[40:50])
+    assert sliding.full_recomputes_avoided_ == 2 and not sliding.stale_
+    expected = gower.gower_matrix(pd.concat([df.iloc[15:40], df.iloc[:2], df.iloc[40:50]]), weight=weights)
+    assert np.array_equal(sliding.raw_matrix_, expected)
+
+def test_dropping_a_range(df):
+    weights = np.array([1, 2, 1])
+    engine = GowerNMDS()
+    engine.setup(df, weights)
+    #the first rows hold the min and max
+    engine.drop_first(2)
+    assert engine.stale_ and engine.full_recomputes_avoided_ == 0
+    assert np.array_equal(engine.raw_matrix_, gower.gower_matrix(df.iloc[2:], weight=weights))
+
+@pytest.mark.parametrize('backend', ['dense', 'memmap', 'condensed'])
+def test_backends_same_as_gower(df, backend, tmp_path):
+    weights = np.array([1, 2, 1])
+    expected = gower.gower_matrix(df, weight=weights)
+    engine = GowerNMDS(backend, tile_rows=7, memmap_folder=str(tmp_path))
+    engine.setup(df, weights)
+    assert np.array_equal(engine.raw_matrix_, expected)
+    assert np.array_equal(engine.condensed_matrix(), squareform(expected, force='tovector', checks=False))
+    dense = GowerNMDS()
+    dense.setup(df, weights)
+    assert np.array_equal(engine.calculate_linkage()[1], dense.calculate_linkage()[1])
+
+@pytest.mark.parametrize('backend', ['dense', 'condensed'])
+def test_heatmap_is_sampled(df, backend):
+    engine = GowerNMDS(backend)
+    engine.setup(df, np.array([1, 1, 1]))
+    rows = np.linspace(0, 59, 10).astype(int)
+    assert np.array_equal(engine.heatmap_matrix(10), gower.gower_matrix(df)[rows][:, rows])
+    assert engine.heatmap_matrix(100).shape == (60, 60)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        GowerNMDS('sparse')
+
+@pytest.mark.parametrize('backend', ['dense', 'memmap', 'condensed'])
+def test_parallel_same_as_gower(df, backend, tmp_path):
+    weights = np.array([1, 2, 1])
+    engine = GowerNMDS(backend, memmap_folder=str(tmp_path), workers=3)
+    engine.setup(df, weights)
+    assert np.array_equal(engine.raw_matrix_, gower.gower_matrix(df, weight=weights))
+    #the shared files are removed once every worker is done
+    assert len(list(tmp_path.iterdir())) == 0
+
+def test_shared_array_falls_back_when_shm_is_full(tmp_path, monkeypatch):
+    import os, shutil
+    usage = shutil.disk_usage
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: usage(path)._replace(free=100) if path == '/dev/shm' else usage(path))
+    path, out = shared_array((10, 10), fallback=str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    assert out.shape == (10, 10)
+    os.remove(path)
+
+def test_balanced_tiles():
+    tiles = balanced_tiles(100, 4)
+    assert tiles[0][0] == 0 and tiles[-1][1] == 100
+    assert all(a[1] == b[0] for a, b in zip(tiles, tiles[1:]))
+    #the first rows are the longest ones
+    assert tiles[0][1] - tiles[0][0] < tiles[-1][1] - tiles[-1][0]
+
+def test_condensed_is_the_primary_storage(df):
+    engine = GowerNMDS()
+    engine.setup(df, np.array([1, 1, 1]))
+    expected = gower.gower_matrix(df)
+    assert engine.matrix_.shape == (60 * 59 // 2,)
+    assert np.array_equal(engine.matrix_to_dataframe().values, expected)
+    engine.raw_matrix_ = expected[:10, :10]
+    assert np.array_equal(engine.condensed_matrix(), squareform(expected[:10, :10], checks=False))
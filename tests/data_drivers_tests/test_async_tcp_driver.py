@@ -0,0 +1,82 @@
+import pytest
+import pandas as pd
+import socket
+import json
+import threading
+import time
+from data_drivers.AsyncTCPDriver import AsyncTCPInputDriver
+from data_drivers.Framing import encode
+
+def test_wrong_server_hostname_setup():
+    input_driver = AsyncTCPInputDriver()
+    input_driver.setup('localhos', 4070, 0)
+    with pytest.raises(socket.gaierror):
+        input_driver.connect()
+
+def test_server_can_start_ok():
+    input_driver = AsyncTCPInputDriver()
+    input_driver.setup('localhost', 4071, 0)
+    input_driver.connect()
+    assert input_driver.disconnect()
+
+def test_read_fields_and_register():
+    HOST, PORT = 'localhost', 4072
+    input_driver = AsyncTCPInputDriver()
+    input_driver.setup(HOST, PORT, 0)
+    input_driver.connect()
+    raw_data = {"foo": "first", "bar": 2}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect((HOST, PORT))
+    sock.sendall(bytes(json.dumps(raw_data), encoding="utf-8"))
+    sock.close()
+    assert list(raw_data.keys()) == input_driver.get_fields()
+    result_df = input_driver.get_register()
+    assert pd.DataFrame(raw_data, index=[0]).equals(result_df)
+    assert input_driver.get_register() is None
+    assert input_driver.disconnect()
+
+def test_many_concurrent_connections():
+    HOST, PORT = 'localhost', 4073
+    input_driver = AsyncTCPInputDriver()
+    input_driver.setup(HOST, PORT, 0)
+    input_driver.connect()
+    #every connection stays open until all of them were established
+    socks = []
+    for i in range(200):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.connect((HOST, PORT))
+        socks.append(sock)
+    for i, sock in enumerate(socks):
+        sock.sendall(encode([{"conn": i, "n": n} for n in range(5)], 'ndjson'))
+    for sock in socks:
+        sock.close()
+    batches = []
+    while sum(len(b) for b in batches) < 1000:
+        batch = input_driver.get_batch(1000, 1)
+        assert batch is not None
+        batches.append(batch)
+    batch = pd.concat(batches)
+    assert len(batch) == 1000
+    assert sorted(batch.groupby('conn').size().unique()) == [5]
+    #a single thread serves every connection
+    assert threading.active_count() < 10
+    assert input_driver.disconnect()
+
+def test_block_policy_waits_for_room():
+    HOST, PORT = 'localhost', 4074
+    input_driver = AsyncTCPInputDriver()
+    input_driver.setup(HOST, PORT, 0, buffer_capacity=10, overflow_policy='block')
+    input_driver.connect()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect((HOST, PORT))
+    sock.sendall(encode([{"n": n} for n in range(50)], 'ndjson'))
+    sock.close()
+    received = []
+    while len(received) < 50:
+        batch = input_driver.get_batch(7, 1)
+        assert batch is not None
+        received += list(batch['n'])
+    assert received == list(range(50))
+    stats = input_driver.buffer.stats()
+    assert stats['dropped'] == 0 and stats['high_water_mark'] <= 10
+    assert input_driver.disconnect()
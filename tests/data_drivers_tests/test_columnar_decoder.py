@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from data_drivers.ColumnarDecoder import ColumnarBatchDecoder
+
+records = [
+    {'ts': 1, 'host': 'a.com', 'ratio': 0.5, 'ok': True},
+    {'ts': 2, 'host': 'b.com', 'ratio': 1, 'ok': False}
+]
+
+def test_same_result_as_pandas():
+    decoder = ColumnarBatchDecoder()
+    result = decoder.decode(records, range(2))
+    expected = pd.DataFrame(records, index=range(2))
+    assert expected.equals(result)
+    assert decoder.schema == [('ts', 'int'), ('host', 'object'), ('ratio', 'float'), ('ok', 'bool')]
+
+def test_missing_and_extra_keys():
+    decoder = ColumnarBatchDecoder()
+    decoder.lock(records)
+    result = decoder.decode([{'ts': 3, 'host': 'c.com', 'extra': 1}, {'ts': 4, 'ratio': 2.5, 'ok': True}], range(2, 4))
+    assert list(result.columns) == ['ts', 'host', 'ratio', 'ok']
+    assert list(result.index) == [2, 3]
+    assert result['ts'].dtype == np.int64
+    assert np.isnan(result.loc[2, 'ratio']) and result.loc[3, 'ratio'] == 2.5
+    assert result.loc[2, 'ok'] is None and pd.isna(result.loc[3, 'host'])
+    assert decoder.extra_keys == {'extra'}
+    assert decoder.missing_values == 3
+
+def test_locked_order_and_type_changes():
+    decoder = ColumnarBatchDecoder()
+    decoder.lock(records[:1], ['host', 'ts'])
+    #ints become floats for good once a float arrives
+    result = decoder.decode([{'ts': 1.5, 'host': 'a.com'}], range(1))
+    assert list(result.columns) == ['host', 'ts']
+    assert result['ts'].dtype == np.float64
+    assert dict(decoder.schema)['ts'] == 'float'
+    #values of other types are not converted
+    result = decoder.decode([{'ts': '2', 'host': 'a.com'}, {'ts': 3, 'host': 'b.com'}], range(2))
+    assert list(result['ts']) == ['2', 3]
+    assert decoder.fallbacks == 1
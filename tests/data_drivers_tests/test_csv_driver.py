@@ -46,6 +46,44 @@ def test_get_fields():
         os.remove(csv_path)
     assert set(fields) == set(obj.keys())
 
+def test_get_chunks():
+    input_driver = CSVInputDriver()
+    expected_df = pd.DataFrame({'key1': ['value%d' % i for i in range(10)], 'key2': range(10)})
+    csv_path = dirname + 'test.csv'
+    expected_df.to_csv(csv_path, index=False)
+    input_driver.setup(csv_path, chunksize=4)
+    input_driver.connect()
+    #only the header is loaded until the chunks are requested
+    assert set(input_driver.get_fields()) == {'key1', 'key2'}
+    chunks = list(input_driver.get_chunks())
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert expected_df.equals(pd.concat(chunks))
+    #read again specific rows
+    rows = input_driver.get_rows([1, 5, 9])
+    input_driver.disconnect()
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+    assert list(rows.index) == [1, 5, 9]
+    assert list(rows['key2']) == [1, 5, 9]
+
+def test_invalid_chunksize():
+    input_driver = CSVInputDriver()
+    with pytest.raises(ValueError):
+        input_driver.setup(dirname + 'test.csv', chunksize=0)
+
+def test_projection():
+    input_driver = CSVInputDriver()
+    obj = {'key1': ['value1'], 'key2': [2], 'key3': [3.5]}
+    pd.DataFrame(obj).to_csv(dirname + 'test.csv', index=False)
+    input_driver.setup(dirname + 'test.csv')
+    input_driver.connect()
+    input_driver.set_projection(['key3', 'key1'])
+    df = input_driver.get_data()
+    input_driver.disconnect()
+    os.remove(dirname + 'test.csv')
+    #only the projected columns are read, in the file's order
+    assert list(df.columns) == ['key1', 'key3']
+
 # ouput driver
 
 def test_no_path_to_output_driver():
@@ -74,3 +112,24 @@ def test_disconnect_exception_without_connect():
     with pytest.raises(ConnectionError):
         output_driver.disconnect()
 
+
+def test_chunks_have_the_dtypes_of_the_whole_file(tmp_path):
+    csv_path = str(tmp_path / 'mixed.csv')
+    with open(csv_path, 'w') as f:
+        f.write('bytes,port,host,ok\n')
+        f.write('10,53,a.com,True\n20,53,b.com,False\n')
+        #a blank number, a port that isn't a number and a blank host in the next chunks
+        f.write(',53,c.com,True\n40,http,d.com,\n50,80,,True\n')
+    whole = CSVInputDriver()
+    whole.setup(csv_path)
+    whole.connect()
+    expected = whole.get_data()
+    input_driver = CSVInputDriver()
+    input_driver.setup(csv_path, chunksize=2)
+    input_driver.connect()
+    chunked = pd.concat(list(input_driver.get_chunks()))
+    assert (chunked.dtypes == expected.dtypes).all()
+    assert chunked.equals(expected)
+    #per row metrics see the same values
+    metric = lambda row: '%s:%s' % (row['bytes'], row['port'])
+    assert list(chunked.apply(metric, axis=1)) == list(expected.apply(metric, axis=1))
@@ -0,0 +1,80 @@
+import pytest
+import json
+import struct
+from data_drivers.Framing import NDJSONDecoder, LengthPrefixedDecoder, create_decoder, encode
+
+records = [{'foo': 'first', 'bar': i} for i in range(5)]
+
+def test_ndjson_split_reads():
+    decoder = NDJSONDecoder()
+    data = encode(records, 'ndjson')
+    #records split across reads are only returned once complete
+    assert decoder.feed(data[:10]) == []
+    assert decoder.feed(data[10:40]) == records[:1]
+    assert decoder.feed(data[40:]) == records[1:]
+    assert decoder.flush() == []
+
+def test_ndjson_last_record_without_newline():
+    decoder = NDJSONDecoder()
+    assert decoder.feed(json.dumps(records[0]).encode('utf-8')) == []
+    assert decoder.flush() == [records[0]]
+
+def test_ndjson_invalid_lines_are_skipped():
+    decoder = NDJSONDecoder()
+    data = b'{"bar": 0}\n{"bar": \n\n{"bar": 2}\n'
+    assert decoder.feed(data) == [{'bar': 0}, {'bar': 2}]
+    assert decoder.errors == 1
+
+def test_ndjson_only_objects_are_records():
+    decoder = NDJSONDecoder()
+    assert decoder.decode([b'{"a":1}', b'2,3', b'"x"']) == [{'a': 1}]
+    assert decoder.errors == 2
+    #two objects in a line are not two records
+    assert decoder.decode([b'{"a":1},{"b":2}']) == []
+    assert decoder.errors == 3
+
+def test_length_prefixed_split_reads():
+    decoder = LengthPrefixedDecoder()
+    data = encode(records, 'length_prefixed')
+    result = []
+    for i in range(0, len(data), 7):
+        result += decoder.feed(data[i:i + 7])
+    assert result == records
+    assert decoder.flush() == []
+    assert decoder.errors == 0
+
+def test_length_prefixed_errors():
+    decoder = LengthPrefixedDecoder()
+    assert decoder.feed(struct.pack('>I', 3) + b'{{{') == []
+    assert decoder.errors == 1
+    #truncated record
+    decoder.feed(struct.pack('>I', 100) + b'{}')
+    assert decoder.flush() == []
+    assert decoder.errors == 2
+    assert decoder.feed(struct.pack('>I', 2) + b'[]') == []
+    assert decoder.errors == 3
+
+def test_ndjson_long_records_are_discarded():
+    decoder = NDJSONDecoder(max_record_bytes=20)
+    assert decoder.feed(b'{"bar": 0}\n{"foo": "' + b'x' * 30) == [{'bar': 0}]
+    assert decoder.errors == 1 and decoder.pending == b''
+    #the rest of the long record is skipped up to its newline
+    assert decoder.feed(b'x' * 30 + b'"}\n{"bar": 1}\n') == [{'bar': 1}]
+    assert decoder.feed(b'{"foo": "' + b'x' * 30 + b'"}\n{"bar": 2}\n') == [{'bar': 2}]
+    assert decoder.errors == 2
+    assert not decoder.closed
+
+def test_length_prefixed_long_record_closes():
+    decoder = LengthPrefixedDecoder(max_record_bytes=40)
+    data = encode(records[:1], 'length_prefixed') + struct.pack('>I', 2**31) + b'{"foo": '
+    assert decoder.feed(data) == records[:1]
+    assert decoder.errors == 1 and decoder.closed
+    assert len(decoder.pending) == 0
+    with pytest.raises(ValueError):
+        LengthPrefixedDecoder(max_record_bytes=0)
+
+def test_unknown_framing():
+    with pytest.raises(ValueError):
+        create_decoder('xml')
+    with pytest.raises(ValueError):
+        encode(records, 'xml')
@@ -0,0 +1,58 @@
+import pytest
+import pandas as pd
+from data_drivers.WriteAheadLog import WriteAheadLog
+from data_drivers.ReplayDriver import ReplayInputDriver
+
+@pytest.fixture
+def log_folder(tmp_path):
+    log = WriteAheadLog(str(tmp_path), segment_size=200).open()
+    for i in range(0, 25, 5):
+        log.append([{'name': 'user%d' % j, 'bytes': j * 10, 'ok': j % 2 == 0} for j in range(i, i + 5)])
+    log.close()
+    return str(tmp_path)
+
+def test_wrong_setup():
+    with pytest.raises(ValueError):
+        ReplayInputDriver().setup('')
+    input_driver = ReplayInputDriver()
+    input_driver.setup('does_not_exist/')
+    with pytest.raises(FileNotFoundError):
+        input_driver.connect()
+
+def test_get_data(log_folder):
+    input_driver = ReplayInputDriver()
+    input_driver.setup(log_folder)
+    input_driver.connect()
+    assert input_driver.get_fields() == ['name', 'bytes', 'ok']
+    df = input_driver.get_data()
+    assert len(df) == 25
+    assert list(df.index) == list(range(25))
+    assert df['bytes'].dtype == 'int64'
+    assert df.loc[7, 'name'] == 'user7'
+
+def test_get_chunks_with_projection(log_folder):
+    input_driver = ReplayInputDriver()
+    input_driver.setup(log_folder, chunksize=10)
+    input_driver.connect()
+    input_driver.set_projection(['bytes'])
+    chunks = list(input_driver.get_chunks())
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert list(chunks[0].columns) == ['bytes']
+    assert pd.concat(chunks)['bytes'].tolist() == [j * 10 for j in range(25)]
+    assert input_driver.get_rows([3, 21])['bytes'].tolist() == [30, 210]
+
+def test_offsets_after_a_commit(log_folder):
+    log = WriteAheadLog(log_folder, segment_size=200).open()
+    log.commit(17)
+    log.close()
+    first = log.segments[0]
+    assert 0 < first <= 17
+    input_driver = ReplayInputDriver()
+    input_driver.setup(log_folder, chunksize=4)
+    input_driver.connect()
+    #the rows keep the offsets of the records, from the first segment that wasn't removed
+    df = input_driver.get_data()
+    assert list(df.index) == list(range(first, 25))
+    assert df.loc[first, 'name'] == 'user%d' % first
+    assert pd.concat(input_driver.get_chunks()).index.tolist() == list(range(first, 25))
+    assert input_driver.get_rows([20])['name'].tolist() == ['user20']
@@ -0,0 +1,69 @@
+import pytest
+import threading
+import time
+from data_drivers.RingBuffer import RingBuffer
+
+def test_invalid_setup():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+    with pytest.raises(ValueError):
+        RingBuffer(10, 'drop_everything')
+
+def test_fifo_order():
+    buffer = RingBuffer(10)
+    for i in range(5):
+        assert buffer.put(i)
+    assert buffer.get() == 0
+    assert buffer.get_many(3) == [1, 2, 3]
+    assert buffer.get_many(3) == [4]
+    assert buffer.get() is None
+    assert buffer.get_many(3, 0.05) == []
+
+def test_drop_oldest():
+    buffer = RingBuffer(3, 'drop_oldest')
+    for i in range(5):
+        assert buffer.put(i)
+    assert buffer.get_many(10) == [2, 3, 4]
+    assert buffer.stats() == {'accepted': 5, 'dropped': 2, 'high_water_mark': 3, 'size': 0}
+
+def test_drop_newest():
+    buffer = RingBuffer(3, 'drop_newest')
+    accepted = [buffer.put(i) for i in range(5)]
+    assert accepted == [True, True, True, False, False]
+    assert buffer.get_many(10) == [0, 1, 2]
+    assert buffer.stats() == {'accepted': 3, 'dropped': 2, 'high_water_mark': 3, 'size': 0}
+
+def test_block_until_there_is_room():
+    buffer = RingBuffer(2, 'block')
+    buffer.put(0)
+    buffer.put(1)
+    #gives up after the timeout
+    assert not buffer.put(2, 0.05)
+    sender = threading.Thread(target=buffer.put, args=(3,))
+    sender.start()
+    time.sleep(0.05)
+    assert sender.is_alive()
+    assert buffer.get() == 0
+    sender.join(1)
+    assert not sender.is_alive()
+    assert buffer.get_many(10) == [1, 3]
+    assert buffer.stats()['dropped'] == 1
+
+def test_close_releases_blocked_senders():
+    buffer = RingBuffer(1, 'block')
+    buffer.put(0)
+    sender = threading.Thread(target=buffer.put, args=(1,))
+    sender.start()
+    buffer.close()
+    sender.join(1)
+    assert not sender.is_alive()
+    assert buffer.get_many(10) == [0]
+
+def test_put_available_never_waits():
+    buffer = RingBuffer(3, 'block')
+    assert buffer.put_available([0, 1]) == 2
+    #only the ones that fit, the rest are not dropped
+    assert buffer.put_available([2, 3, 4]) == 1
+    assert buffer.put_available([5]) == 0
+    assert buffer.get_many(10) == [0, 1, 2]
+    assert buffer.stats() == {'accepted': 3, 'dropped': 0, 'high_water_mark': 3, 'size': 0}
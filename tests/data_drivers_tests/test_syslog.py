@@ -0,0 +1,48 @@
+import pytest
+from data_drivers.Syslog import parse_syslog, PayloadParser
+
+def test_rfc5424():
+    record = parse_syslog('<165>1 2003-10-11T22:14:15.003Z mymachine.example.com evntslog - ID47 [exampleSDID@32473 iut="3" eventSource="Application"] ﻿An application event')
+    assert record == {'facility': 20, 'severity': 5, 'timestamp': '2003-10-11T22:14:15.003Z', 'hostname': 'mymachine.example.com',
+                      'app_name': 'evntslog', 'procid': None, 'msgid': 'ID47', 'structured_data': '[exampleSDID@32473 iut="3" eventSource="Application"]',
+                      'message': 'An application event'}
+
+def test_rfc5424_without_message():
+    record = parse_syslog('<34>1 2003-10-11T22:14:15.003Z host su - - -')
+    assert record['structured_data'] is None
+    assert record['message'] == ''
+
+def test_rfc3164():
+    record = parse_syslog('<34>Oct 11 22:14:15 mymachine su[230]: \'su root\' failed for lonvick on /dev/pts/8')
+    assert record == {'facility': 4, 'severity': 2, 'timestamp': 'Oct 11 22:14:15', 'hostname': 'mymachine', 'app_name': 'su',
+                      'procid': '230', 'msgid': None, 'structured_data': None, 'message': '\'su root\' failed for lonvick on /dev/pts/8'}
+
+def test_json_message_is_merged():
+    record = parse_syslog('<14>1 2003-10-11T22:14:15Z host agent 12 - - {"user": "foo", "bytes": 10}')
+    assert 'message' not in record
+    assert record['user'] == 'foo' and record['bytes'] == 10 and record['hostname'] == 'host'
+
+@pytest.mark.parametrize('line', ['no priority', '<999>1 2003-10-11T22:14:15Z host app - - - msg', '<14>Oct'])
+def test_invalid_syslog(line):
+    assert parse_syslog(line) is None
+
+def test_parse_json_payloads():
+    parser = PayloadParser('json')
+    assert parser.parse([b'{"a": 1}', b'{"a": 2}\n']) == [{'a': 1}, {'a': 2}]
+    assert parser.parse([b'{"a": 1}', b'{"a":', b'[1]']) == [{'a': 1}]
+    assert parser.errors == 2
+    #two objects in a datagram are not two records
+    assert parser.parse([b'{"a": 1},{"a": 2}', b'{"a": 3}']) == [{'a': 3}]
+    assert parser.errors == 3
+
+def test_parse_auto_payloads():
+    parser = PayloadParser()
+    records = parser.parse([b'{"a": 1}', b'<34>Oct 11 22:14:15 host su: hi', b'garbage'])
+    assert records[0] == {'a': 1}
+    assert records[1]['message'] == 'hi'
+    assert len(records) == 2
+    assert parser.errors == 1
+
+def test_unknown_payload_format():
+    with pytest.raises(ValueError):
+        PayloadParser('xml')
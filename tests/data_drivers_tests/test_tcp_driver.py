@@ -205,3 +205,76 @@ def test_multiple_client_get_data():
     #check cache is empty
     assert input_driver.get_register() is None
     assert input_driver.disconnect()
+
+def test_get_batch():
+    #params
+    HOST, PORT = 'localhost', 4049
+    #server
+    input_driver = TCPInputDriver()
+    input_driver.setup(HOST, PORT, 0)
+    input_driver.connect()
+    #nothing arrives before the timeout
+    start = time.time()
+    assert input_driver.get_batch(10, 0.2) is None
+    assert time.time() - start >= 0.2
+    for i in range(5):
+        sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        sock.connect((HOST, PORT))
+        sock.sendall(bytes(json.dumps({"foo": "first", "bar": i}),encoding="utf-8"))
+        sock.close()
+    time.sleep(0.1)
+    batch = input_driver.get_batch(3, 1)
+    assert list(batch.index) == [0, 1, 2]
+    assert list(batch.columns) == ['foo', 'bar']
+    batch = input_driver.get_batch(3, 1)
+    assert list(batch.index) == [3, 4]
+    assert input_driver.get_batch(3, 0) is None
+    assert input_driver.disconnect()
+
+@pytest.mark.parametrize('framing,PORT', [('ndjson', 4055), ('length_prefixed', 4056)])
+def test_persistent_connection(framing, PORT):
+    from data_drivers.Framing import encode
+    HOST = 'localhost'
+    input_driver = TCPInputDriver()
+    input_driver.setup(HOST, PORT, 0, framing=framing)
+    input_driver.connect()
+    records = [{"foo": "x" * 10000, "bar": i} for i in range(100)]
+    #a single connection for every record, with records bigger than a single read
+    sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    sock.connect((HOST, PORT))
+    sock.sendall(encode(records, framing))
+    sock.close()
+    batch = input_driver.get_batch(1000, 1)
+    while len(batch) < len(records):
+        batch = pd.concat([batch, input_driver.get_batch(1000, 1)])
+    assert list(batch['bar']) == list(range(100))
+    assert input_driver.parse_errors == 0
+    assert input_driver.disconnect()
+
+def test_reset_connection():
+    import struct
+    HOST = 'localhost'
+    PORT = 4057
+    input_driver = TCPInputDriver()
+    input_driver.setup(HOST, PORT, 0)
+    input_driver.connect()
+    #the server prints the traceback of a handler that fails
+    failed = []
+    input_driver.server.handle_error = lambda request, address: failed.append(address)
+    #a client that resets the connection in the middle of a record
+    sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    sock.connect((HOST, PORT))
+    sock.sendall(b'{"foo": "x", "bar": 0}\n{"foo": ')
+    time.sleep(0.1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+    sock.close()
+    sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+    sock.connect((HOST, PORT))
+    sock.sendall(b'{"foo": "y", "bar": 1}\n')
+    sock.close()
+    batch = input_driver.get_batch(1000, 1)
+    while len(batch) < 2:
+        batch = pd.concat([batch, input_driver.get_batch(1000, 1)])
+    assert sorted(batch['bar']) == [0, 1]
+    assert failed == []
+    assert input_driver.disconnect()
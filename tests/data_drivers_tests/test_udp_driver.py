@@ -0,0 +1,66 @@
+import pytest
+import socket
+import json
+import time
+from data_drivers.UDPDriver import UDPInputDriver
+
+def send(port, payloads):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for payload in payloads:
+        sock.sendto(payload, ('127.0.0.1', port))
+    sock.close()
+
+def test_wrong_setup():
+    input_driver = UDPInputDriver()
+    with pytest.raises(ValueError):
+        input_driver.setup('', 4080, 0)
+    with pytest.raises(ValueError):
+        input_driver.setup('localhost', 4080, 0, payload_format='xml')
+
+def test_server_can_start_ok():
+    input_driver = UDPInputDriver()
+    input_driver.setup('127.0.0.1', 4081, 0)
+    assert input_driver.connect()
+    assert input_driver.disconnect()
+
+def test_read_fields_and_register():
+    input_driver = UDPInputDriver()
+    input_driver.setup('127.0.0.1', 4082, 0)
+    input_driver.connect()
+    send(4082, [b'{"foo": "first", "bar": 2}'])
+    assert input_driver.get_fields() == ['foo', 'bar']
+    result_df = input_driver.get_register()
+    assert result_df.to_dict('records') == [{'foo': 'first', 'bar': 2}]
+    assert input_driver.get_register() is None
+    assert input_driver.disconnect()
+
+def test_get_batch_of_syslog_messages():
+    input_driver = UDPInputDriver()
+    input_driver.setup('127.0.0.1', 4083, 0, payload_format='syslog')
+    input_driver.connect()
+    send(4083, [b'<34>Oct 11 22:14:15 host su[%d]: {"bytes": %d}' % (i, i) for i in range(100)] + [b'not syslog'])
+    rows = []
+    deadline = time.time() + 5
+    while len(rows) < 100 and time.time() < deadline:
+        batch = input_driver.get_batch(1000, 0.1)
+        if batch is not None: rows += batch.to_dict('records')
+    assert [r['bytes'] for r in rows] == list(range(100))
+    assert rows[0]['facility'] == 4 and rows[0]['procid'] == '0'
+    assert input_driver.parse_errors == 1
+    assert input_driver.disconnect()
+
+def test_many_datagrams():
+    input_driver = UDPInputDriver()
+    input_driver.setup('127.0.0.1', 4084, 0, buffer_capacity=1000000, overflow_policy='drop_newest')
+    input_driver.connect()
+    n = 20000
+    send(4084, [json.dumps({'id': i}).encode('utf-8') for i in range(n)])
+    received = 0
+    deadline = time.time() + 5
+    while received + input_driver.dropped() < n and time.time() < deadline:
+        batch = input_driver.get_batch(10000, 0.1)
+        if batch is not None: received += len(batch)
+    #datagrams can be lost, but they are counted
+    assert received + input_driver.dropped() == n
+    assert received > 0
+    assert input_driver.disconnect()
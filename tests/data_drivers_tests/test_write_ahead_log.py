@@ -0,0 +1,111 @@
+import pytest
+import os
+import socket
+import json
+import time
+from data_drivers.WriteAheadLog import WriteAheadLog, read_log
+from data_drivers.TCPDriver import TCPInputDriver
+
+def replayed(log, offset=None, end=None):
+    return [r for batch in log.replay(offset, end) for r in batch]
+
+def test_append_and_replay(tmp_path):
+    log = WriteAheadLog(str(tmp_path)).open()
+    assert log.append([{'id': 0}, {'id': 1}]) == 0
+    assert log.append([{'id': 2}]) == 2
+    assert replayed(log) == [{'id': 0}, {'id': 1}, {'id': 2}]
+    assert replayed(log, 1, 2) == [{'id': 1}]
+    assert log.close()
+
+def test_segments_are_rotated_and_removed_when_committed(tmp_path):
+    log = WriteAheadLog(str(tmp_path), segment_size=100).open()
+    for i in range(10):
+        log.append([{'id': i, 'padding': 'x' * 50}])
+    assert len(log.segments) == 10
+    assert [r['id'] for r in replayed(log, 4)] == list(range(4, 10))
+    log.commit(4)
+    assert log.committed_offset() == 4
+    assert len([f for f in os.listdir(tmp_path) if f.endswith('.wal')]) == 6
+    assert [r['id'] for r in replayed(log)] == list(range(4, 10))
+    log.close()
+
+def test_reopen_discards_torn_entry(tmp_path):
+    log = WriteAheadLog(str(tmp_path)).open()
+    log.append([{'id': 0}])
+    log.append([{'id': 1}])
+    log.close()
+    segment = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    with open(segment, 'r+b') as f:
+        f.truncate(os.path.getsize(segment) - 3)
+    log = WriteAheadLog(str(tmp_path)).open()
+    assert log.end_offset == 1
+    log.append([{'id': 2}])
+    assert replayed(log) == [{'id': 0}, {'id': 2}]
+    log.close()
+    assert read_log(str(tmp_path)).end_offset == 2
+
+def test_wrong_setup(tmp_path):
+    with pytest.raises(ValueError):
+        WriteAheadLog('')
+    with pytest.raises(ValueError):
+        WriteAheadLog(str(tmp_path), segment_size=0)
+    input_driver = TCPInputDriver()
+    input_driver.setup('localhost', 4091, 0, overflow_policy='drop_oldest')
+    with pytest.raises(ValueError):
+        input_driver.setup_log(str(tmp_path))
+
+def send(port, records):
+    sock = socket.create_connection(('localhost', port))
+    sock.sendall(b''.join(json.dumps(r).encode('utf-8') + b'\n' for r in records))
+    sock.close()
+
+def read_all(input_driver, n):
+    rows = []
+    deadline = time.time() + 5
+    while len(rows) < n and time.time() < deadline:
+        batch = input_driver.get_batch(100, 0.1)
+        if batch is not None: rows += batch.reset_index().to_dict('records')
+    return rows
+
+def test_tcp_driver_reads_uncommitted_records_again(tmp_path):
+    input_driver = TCPInputDriver()
+    input_driver.setup('localhost', 4092, 0)
+    input_driver.setup_log(str(tmp_path))
+    input_driver.connect()
+    send(4092, [{'id': i} for i in range(10)])
+    assert len(read_all(input_driver, 10)) == 10
+    input_driver.commit(6)
+    #the process dies before committing the rest
+    assert input_driver.disconnect()
+    input_driver = TCPInputDriver()
+    input_driver.setup('localhost', 4092, 0)
+    input_driver.setup_log(str(tmp_path))
+    input_driver.connect()
+    send(4092, [{'id': 10}])
+    assert input_driver.get_fields() == ['id']
+    rows = read_all(input_driver, 5)
+    assert [(r['index'], r['id']) for r in rows] == [(i, i) for i in range(6, 11)]
+    input_driver.commit()
+    assert input_driver.disconnect()
+    assert WriteAheadLog(str(tmp_path)).committed_offset() == 11
+
+def test_waiting_for_room_doesnt_hold_the_log(tmp_path):
+    import threading
+    input_driver = TCPInputDriver()
+    input_driver.setup('localhost', 4093, 0, buffer_capacity=2)
+    input_driver.setup_log(str(tmp_path))
+    input_driver.open_log()
+    sender = threading.Thread(target=input_driver.buffer_records, args=([{'id': i} for i in range(4)],))
+    sender.start()
+    time.sleep(0.05)
+    #the sender waits for room, other senders can still log
+    assert sender.is_alive()
+    assert input_driver.log_lock.acquire(timeout=0.5)
+    input_driver.log_lock.release()
+    rows = read_all(input_driver, 4)
+    sender.join(1)
+    assert not sender.is_alive()
+    #logged in the order they were buffered
+    assert [r['id'] for r in rows] == [0, 1, 2, 3]
+    input_driver.close_log()
+    assert replayed(read_log(str(tmp_path))) == [{'id': i} for i in range(4)]
@@ -0,0 +1,34 @@
+from feature_engine.execution_plan import ExecutionPlan
+
+def metric(name, data_needed):
+    return {'name': name, 'data_needed': data_needed, 'params': {}, 'vectorized': False}
+
+def flag(name, data_needed, _type='direct'):
+    return {'name': name, 'data_needed': data_needed, 'params': {}, 'type': _type, 'vectorized': False}
+
+def test_plan_nodes_and_levels():
+    metrics = [metric('len', 'host'), metric('digits', 'host'), metric('avg', 'bytes_in,bytes_out')]
+    flags = [flag('big', 'bytes_in'), flag('count', 'host', 'aggregation')]
+    filters = [{'name': 'odd', 'data_needed': 'timestamp'}]
+    plan = ExecutionPlan(['timestamp'], metrics, flags, filters, ['timestamp', 'host', 'bytes_in', 'bytes_out'])
+    #metrics with the same data needed share their input
+    assert plan.nodes['metric:len']['depends_on'] == ['input:host']
+    assert plan.nodes['metric:digits']['depends_on'] == ['input:host']
+    assert plan.nodes['input:host']['depends_on'] == ['filters']
+    assert plan.node_id(flags[1]) == 'aggregation:count'
+    assert plan.nodes['features']['depends_on'] == ['filters', 'metric:len', 'metric:digits', 'metric:avg']
+    levels = [[n['id'] for n in level] for level in plan.levels()]
+    assert levels[0] == ['load']
+    assert levels[1] == ['filters']
+    assert set(levels[2]) == {'input:host', 'input:bytes_in,bytes_out', 'input:bytes_in', 'aggregation:count'}
+    assert set(levels[3]) == {'metric:len', 'metric:digits', 'metric:avg', 'flag:big'}
+    assert levels[4] == ['features']
+    #inputs are freed after the metrics, metric results after the features
+    release = plan.release_levels()
+    assert release['input:host'] == 3
+    assert release['metric:len'] == 4
+
+def test_repeated_names():
+    plan = ExecutionPlan([], [metric('len', 'host'), metric('len', 'domain')], [], [], None)
+    assert 'metric:len' in plan.nodes and 'metric:len#1' in plan.nodes
+    assert 'features' not in plan.nodes
@@ -0,0 +1,78 @@
+import pytest
+import os
+import time
+import pandas as pd
+from base64 import b64encode
+
+from feature_engine.feature_cache import FeatureCache
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'host': ['a.com', 'bb.com', 'ccc.com'], 'port': [53, 53, 80]})
+
+def metric(code, params={}):
+    return {
+        'name': 'metric1',
+        'data_needed': 'host',
+        'params': params,
+        'source': {'function_code': b64encode(code.encode('ascii'))}
+    }
+
+def test_key_changes_with_data_code_and_params(df, tmp_path):
+    cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    base_key = cache.key(df, metric('def m(host): return len(host)'))
+    #same inputs, same key
+    assert base_key == cache.key(df.copy(), metric('def m(host): return len(host)'))
+    #different code
+    assert base_key != cache.key(df, metric('def m(host): return len(host) + 1'))
+    #different params
+    assert base_key != cache.key(df, metric('def m(host): return len(host)', {'x': 1}))
+    #different data
+    other_df = df.copy()
+    other_df.loc[0, 'host'] = 'd.com'
+    assert base_key != cache.key(other_df, metric('def m(host): return len(host)'))
+    #functions without source can't be cached
+    assert cache.key(df, {'name': 'm', 'data_needed': 'host', 'params': {}}) is None
+
+def test_get_put_and_clear(df, tmp_path):
+    cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    key = cache.key(df, metric('def m(host): return len(host)'))
+    assert cache.get(key) is None
+    expected = df['host'].str.len()
+    cache.put(key, expected)
+    assert expected.equals(cache.get(key))
+    assert cache.hits == 1 and cache.misses == 1
+    cache.clear()
+    assert cache.get(key) is None
+
+def test_lru_eviction(tmp_path):
+    cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    series = pd.Series(range(1000))
+    cache.put('first', series)
+    entry_size = os.path.getsize(cache.entry_path('first'))
+    #room for two entries only
+    cache.max_bytes = 2 * entry_size
+    time.sleep(0.01)
+    cache.put('second', series)
+    time.sleep(0.01)
+    #using the first entry makes the second one the least recently used
+    cache.get('first')
+    time.sleep(0.01)
+    cache.put('third', series)
+    assert os.path.exists(cache.entry_path('first'))
+    assert not os.path.exists(cache.entry_path('second'))
+    assert os.path.exists(cache.entry_path('third'))
+
+def test_sizes_are_kept_in_memory(tmp_path):
+    series = pd.Series(range(1000))
+    cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    cache.put('first', series)
+    time.sleep(0.01)
+    cache.put('second', series)
+    assert cache.total_bytes == sum(os.path.getsize(cache.entry_path(k)) for k in ['first', 'second'])
+    #the entries of a previous run are read when the cache is opened
+    reopened = FeatureCache(str(tmp_path), 1024 * 1024)
+    assert reopened.total_bytes == cache.total_bytes
+    assert list(reopened.sizes) == [cache.entry_path('first'), cache.entry_path('second')]
+    reopened.clear()
+    assert reopened.total_bytes == 0
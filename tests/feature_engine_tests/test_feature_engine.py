@@ -3,11 +3,17 @@ import pytest
 import yaml
 import sys
 import types
+import time
+import threading
 from os import path, remove, urandom
 from base64 import b64encode
 import pandas as pd
 
-from src.feature_engine.feature_engine import FeatureEngine
+from src.feature_engine.feature_engine import FeatureEngine, combine_inputs
+from src.feature_engine.parallel import resolve_fn
+from src.feature_engine.feature_cache import FeatureCache
+from src.feature_engine.execution_plan import ExecutionPlan
+from src.feature_engine.profiler import Profiler
 from src.data_drivers.CSVDriver import CSVInputDriver, CSVOutputDriver
 from src.data_drivers.TCPDriver import TCPInputDriver
 from rich.console import Console
@@ -98,6 +104,15 @@ def test_check_data_needed_available(feature_engine):
     except Exception as err:
         assert False, 'Exception was not expected %s' % err
 
+def test_projected_columns(feature_engine):
+    yaml_obj = {
+        'filters': [{'name': 'filter1', 'data_needed': 'timestamp'}],
+        'features': [{'name': 'bytes_out', 'type': 'field'}, {'name': 'avg', 'type': 'metric', 'data_needed': 'bytes_in,bytes_out'}],
+        'flags': [{'name': 'flag1', 'data_needed': 'src,timestamp'}]
+    }
+    headers = ['id', 'timestamp', 'src', 'dst', 'bytes_in', 'bytes_out', 'comment']
+    assert feature_engine.projected_columns(yaml_obj, headers) == ['timestamp', 'src', 'bytes_in', 'bytes_out']
+
 def test_validate_filter(feature_engine):
     yaml_obj = {}
     #filter without name
@@ -358,6 +373,60 @@ def test_apply_filters(feature_engine, df):
     assert result['bytes_in'] == obj2['bytes_in']
     assert result['bytes_out'] == obj2['bytes_out']
 
+def test_filters_mask_short_circuit(feature_engine):
+    df = pd.DataFrame({'timestamp': range(10), 'host': ['a.local', 'b.com'] * 5})
+    seen = []
+    def odd(timestamp):
+        return timestamp % 2 == 1
+    def record_and_drop_big(timestamp):
+        seen.append(list(timestamp))
+        return timestamp > 6
+    filters = [
+        {'name': 'odd', 'data_needed': 'timestamp', 'fn': odd, 'params': {}, 'vectorized': True},
+        {'name': 'big', 'data_needed': 'timestamp', 'fn': record_and_drop_big, 'params': {}, 'vectorized': True}
+    ]
+    keep = feature_engine.filters_mask(df, filters)
+    #second filter was only evaluated on the surviving rows
+    assert seen == [[0, 2, 4, 6, 8]]
+    assert list(df.index[keep]) == [0, 2, 4, 6]
+
+def test_expression_filters(feature_engine):
+    df = pd.DataFrame({'dns.question.name': ['a.local', 'b.com', 'c.local', 'd.org'], 'bytes': [10, 20, 30, 40]})
+    _filters = [
+        {'name': 'drop_local', 'expression': 'dns.question.name endswith .local'},
+        {'name': 'drop_big', 'expression': 'bytes >= 40'}
+    ]
+    headers = list(df.columns)
+    #data_needed is taken from the expression
+    feature_engine.check_data_needed_available({'filters': _filters}, headers)
+    parsed_filters = feature_engine.parse_filters(_filters)
+    assert parsed_filters[0]['data_needed'] == 'dns.question.name'
+    feature_engine.apply_filters(df, parsed_filters)
+    assert list(df['dns.question.name']) == ['b.com']
+    #values can be quoted and lists used with 'in'
+    df = pd.DataFrame({'status': ['OK', 'NXDOMAIN', 'SERVFAIL'], 'name': ['a b', 'c', 'd']})
+    parsed_filters = feature_engine.parse_filters([
+        {'name': 'errors', 'expression': 'status in NXDOMAIN,SERVFAIL'},
+        {'name': 'spaces', 'expression': 'name == "a b"'}
+    ])
+    assert not feature_engine.filters_mask(df, parsed_filters).any()
+    #unknown operator
+    with pytest.raises(feature_engine.ValidationError):
+        feature_engine.parse_filters([{'name': 'wrong', 'expression': 'status is OK'}])
+
+def test_expression_filters_blank_cells(feature_engine, tmp_path):
+    #blank cells are read as '' and the column is not numeric
+    with open(tmp_path / 'blank.csv', 'w') as f:
+        f.write('host,bytes\na.com,10\nb.com,\nc.com,40\nd.com,50\n')
+    in_driver = CSVInputDriver()
+    in_driver.setup(str(tmp_path / 'blank.csv'))
+    in_driver.connect()
+    df = in_driver.get_data()
+    assert df['bytes'].dtype == object
+    parsed_filters = feature_engine.parse_filters([{'name': 'drop_big', 'expression': 'bytes >= 40'}])
+    feature_engine.apply_filters(df, parsed_filters)
+    assert list(df['host']) == ['a.com', 'b.com']
+
 def test_run_flags(feature_engine, df):
     #create flag's code
     flag_code = 'def timestamp_bigger_than_40_bytes_in_lower_than_30(timestamp, bytes_in): return (timestamp >= 40 and bytes_in < 30)'
@@ -429,6 +498,147 @@ def test_apply_features(feature_engine, df):
     assert first_rec['avg_bytes'] == int((obj1['bytes_in'] + obj1['bytes_out']) / 2)
     assert second_rec['avg_bytes'] == int((obj2['bytes_in'] + obj2['bytes_out']) / 2)
 
+def test_apply_features_vectorized(feature_engine, df):
+    headers = list(df.columns)
+    calls = []
+    #vectorized metric, gets the whole columns at once
+    def avg_fun(bytes_in, bytes_out):
+        calls.append(len(bytes_in))
+        return (bytes_in + bytes_out) // 2
+    avg_fun.vectorized = True
+    metrics = [{'name': 'avg_bytes', 'data_needed': 'bytes_in,bytes_out', 'fn': avg_fun, 'params': {}, 'vectorized': True}]
+    feature_engine.apply_features(df, ['timestamp'], metrics, headers)
+    #called once for the whole column
+    assert calls == [2]
+    assert list(df['avg_bytes']) == [38, 20]
+    assert 'bytes_in' not in df.columns
+
+def test_parse_vectorized_flag(feature_engine, df):
+    flag_code = 'def timestamp_bigger_than_40(timestamp, params): return timestamp >= params["threshold"]'
+    _flag = {
+        'name': 'timestamp_bigger_than_40',
+        'data_needed': 'timestamp',
+        'function_code': b64encode(flag_code.encode('ascii')),
+        'type': 'direct',
+        'description': 'Fields with this params are sus',
+        'message': 'These are the records discovered by the flag',
+        'severity': 'low',
+        'vectorized': True,
+        'params': {'threshold': 40}
+    }
+    parsed_flag = feature_engine.parse_flags([_flag])
+    assert parsed_flag[0]['vectorized']
+    result = feature_engine.run_flags(df, parsed_flag)[0]['result']
+    assert list(result.index) == [1]
+    #function code without the vectorized key falls back to row-at-a-time calls
+    del _flag['vectorized']
+    assert not feature_engine.parse_flags([_flag])[0]['vectorized']
+
+def test_apply_features_parallel(feature_engine):
+    df = pd.DataFrame({'bytes_in': range(100), 'bytes_out': range(100, 200)}, index=range(500, 600))
+    headers = list(df.columns)
+    avg_function_code = 'def avg_fun(bytes_in, bytes_out): return int((bytes_in + bytes_out) / 2)'
+    _metric = {
+        'name': 'avg_bytes',
+        'multiplier': 2,
+        'data_needed': 'bytes_in,bytes_out',
+        'function_code': b64encode(avg_function_code.encode('ascii')),
+        'type': 'metric'
+    }
+    fields, metrics = feature_engine.parse_features([_metric])
+    feature_engine.workers = 3
+    feature_engine.apply_features(df, fields, metrics, headers)
+    feature_engine.shutdown_workers()
+    #results are stitched back in the original order
+    assert list(df.index) == list(range(500, 600))
+    assert list(df['avg_bytes']) == [int((i + i + 100) / 2) for i in range(100)]
+
+def test_resolve_plugin_fn(tmp_path):
+    plugin_folder = tmp_path / 'test-plugin'
+    plugin_folder.mkdir()
+    (plugin_folder / 'utils.py').write_text('def double(x): return 2 * x\n')
+    (plugin_folder / 'metrics.py').write_text('import utils\ndef doubled(x): return utils.double(x)\n')
+    previous = {m: sys.modules.pop(m) for m in ['utils', 'metrics'] if m in sys.modules}
+    try:
+        fn = resolve_fn({'module': 'metrics', 'path': str(plugin_folder / 'metrics.py'), 'name': 'doubled'})
+        assert fn(21) == 42
+    finally:
+        for m in ['utils', 'metrics']: sys.modules.pop(m, None)
+        sys.modules.update(previous)
+
+def test_apply_features_dedup(feature_engine):
+    df = pd.DataFrame({'host': ['a.com', 'bb.com', 'a.com', 'a.com'], 'port': [53, 53, 53, 80]})
+    headers = list(df.columns)
+    calls = []
+    def host_length(host):
+        calls.append(host)
+        return len(host)
+    def host_port(host, port, params):
+        calls.append((host, port))
+        return '%s%s%d' % (host, params['sep'], port)
+    metrics = [
+        {'name': 'host_length', 'data_needed': 'host', 'fn': host_length, 'params': {}},
+        {'name': 'host_port', 'data_needed': 'host,port', 'fn': host_port, 'params': {'sep': ':'}}
+    ]
+    feature_engine.dedup = True
+    feature_engine.apply_features(df, [], metrics, headers)
+    #one call per distinct value or tuple
+    assert sorted(calls[:2]) == ['a.com', 'bb.com']
+    assert len(calls) == 5
+    assert list(df['host_length']) == [5, 6, 5, 5]
+    assert list(df['host_port']) == ['a.com:53', 'bb.com:53', 'a.com:53', 'a.com:80']
+    assert feature_engine.evaluation_stats['host_length'] == {'rows': 4, 'calls': 2}
+    assert feature_engine.evaluation_stats['host_port'] == {'rows': 4, 'calls': 3}
+
+def test_apply_features_cached(feature_engine, tmp_path):
+    df = pd.DataFrame({'bytes_in': [1, 2, 3], 'bytes_out': [3, 4, 5]})
+    headers = list(df.columns)
+    avg_function_code = 'def avg_fun(bytes_in, bytes_out): return int((bytes_in + bytes_out) / 2)'
+    _metric = {
+        'name': 'avg_bytes',
+        'multiplier': 2,
+        'data_needed': 'bytes_in,bytes_out',
+        'function_code': b64encode(avg_function_code.encode('ascii')),
+        'type': 'metric'
+    }
+    feature_engine.cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    _, metrics = feature_engine.parse_features([_metric])
+    feature_engine.apply_features(df.copy(), [], metrics, headers)
+    assert feature_engine.cache.misses == 1
+    #second run loads the column instead of computing it
+    metrics[0]['fn'] = None
+    second_df = df.copy()
+    feature_engine.apply_features(second_df, [], metrics, headers)
+    assert feature_engine.cache.hits == 1
+    assert list(second_df['avg_bytes']) == [2, 3, 4]
+
+def test_streaming_processing(feature_engine):
+    df = pd.DataFrame({'timestamp': range(10), 'bytes_in': range(10, 20), 'bytes_out': range(20, 30)})
+    csv_path = dirname + 'streaming_test.csv'
+    df.to_csv(csv_path, index=False)
+    feature_engine.in_driver.setup(csv_path, chunksize=3)
+    feature_engine.in_driver.connect()
+    filter_code = 'def odd(timestamp): return timestamp % 2 == 1'
+    filters = feature_engine.parse_filters([{'name': 'odd', 'data_needed': 'timestamp', 'function_code': b64encode(filter_code.encode('ascii'))}])
+    avg_function_code = 'def avg_fun(bytes_in, bytes_out): return int((bytes_in + bytes_out) / 2)'
+    fields, metrics = feature_engine.parse_features([
+        {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+        {'name': 'avg_bytes', 'multiplier': 1, 'data_needed': 'bytes_in,bytes_out', 'type': 'metric', 'function_code': b64encode(avg_function_code.encode('ascii'))}
+    ])
+    flag_code = 'def big(bytes_in): return bytes_in >= 16'
+    flags = feature_engine.parse_flags([{
+        'name': 'big', 'data_needed': 'bytes_in', 'function_code': b64encode(flag_code.encode('ascii')),
+        'type': 'direct', 'description': 'big', 'message': 'big', 'severity': 'low'
+    }])
+    result_df, flags_results = feature_engine.streaming_processing(fields, metrics, flags, filters)
+    feature_engine.in_driver.disconnect()
+    remove(csv_path)
+    assert list(result_df.columns) == ['timestamp', 'avg_bytes']
+    assert list(result_df.index) == [0, 2, 4, 6, 8]
+    assert list(result_df['avg_bytes']) == [15, 17, 19, 21, 23]
+    assert list(flags_results[0]['result'].index) == [6, 8]
+    assert 'fn' not in flags_results[0]
+
 def test_read_yaml(feature_engine):
     #define filter
     filter_code = 'def less_than_40(timestamp): return timestamp < 40'
@@ -507,7 +717,212 @@ def test_read_yaml(feature_engine):
     if path.exists(temp_file_path):
         remove(temp_file_path)
 
-#def test_realtime_processing():
-#   TODO
-#   assert False
+def test_run_static(feature_engine):
+    df = pd.DataFrame({'timestamp': range(6), 'bytes_in': range(10, 16), 'bytes_out': range(20, 26), 'unused': ['x'] * 6})
+    csv_path = dirname + 'run_test.csv'
+    df.to_csv(csv_path, index=False)
+    flag_code = 'def big(bytes_in): return bytes_in >= 14'
+    avg_function_code = 'def avg_fun(bytes_in, bytes_out): return int((bytes_in + bytes_out) / 2)'
+    yaml_obj = {
+        'filters': [{'name': 'first', 'expression': 'timestamp == 0'}],
+        'features': [
+            {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+            {'name': 'avg_bytes', 'multiplier': 1, 'data_needed': 'bytes_in,bytes_out', 'type': 'metric', 'function_code': b64encode(avg_function_code.encode('ascii')).decode('ascii')}
+        ],
+        'flags': [{
+            'name': 'big', 'data_needed': 'bytes_in', 'function_code': b64encode(flag_code.encode('ascii')).decode('ascii'),
+            'type': 'direct', 'description': 'big', 'message': 'big', 'severity': 'low'
+        }]
+    }
+    yaml_path = dirname + 'run_test.yaml'
+    with open(yaml_path, 'w') as f:
+        yaml.dump(yaml_obj, f)
+    feature_engine.in_driver.setup(csv_path)
+    feature_engine.in_driver.connect()
+    df_original, result_df, flags_results = feature_engine.run(yaml_path)
+    remove(csv_path)
+    remove(yaml_path)
+    #only the projected columns were read, and the original was not narrowed by the features
+    assert list(df_original.columns) == ['timestamp', 'bytes_in', 'bytes_out']
+    assert list(df_original.index) == [1, 2, 3, 4, 5]
+    assert list(result_df.columns) == ['timestamp', 'avg_bytes']
+    assert list(result_df['avg_bytes']) == [16, 17, 18, 19, 20]
+    assert list(flags_results[0]['result'].index) == [4, 5]
+
+def test_realtime_processing(feature_engine):
+    import socket
+    import json
+    import threading
+    in_driver = TCPInputDriver()
+    in_driver.setup('localhost', 4050, 1, batch_size=4, batch_timeout=0.05)
+    in_driver.connect()
+    def send():
+        for i in range(10):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.connect(('localhost', 4050))
+            sock.sendall(json.dumps({'timestamp': i, 'bytes_in': 10 + i}).encode('utf-8'))
+            sock.close()
+    sender = threading.Thread(target=send)
+    sender.start()
+    filter_code = 'def odd(timestamp): return timestamp % 2 == 1'
+    filters = feature_engine.parse_filters([{'name': 'odd', 'data_needed': 'timestamp', 'function_code': b64encode(filter_code.encode('ascii'))}])
+    double_code = 'def double(bytes_in): return 2 * bytes_in'
+    fields, metrics = feature_engine.parse_features([
+        {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+        {'name': 'double', 'multiplier': 1, 'data_needed': 'bytes_in', 'type': 'metric', 'function_code': b64encode(double_code.encode('ascii'))}
+    ])
+    flag_code = 'def big(bytes_in): return bytes_in >= 16'
+    flags = feature_engine.parse_flags([{
+        'name': 'big', 'data_needed': 'bytes_in', 'function_code': b64encode(flag_code.encode('ascii')),
+        'type': 'direct', 'description': 'big', 'message': 'big', 'severity': 'low'
+    }])
+    df, flags_results, df_original = feature_engine.realtime_processing(in_driver, fields, metrics, flags, filters, in_driver.collection_time)
+    sender.join()
+    in_driver.disconnect()
+    #records arrive in any order, but every even one is kept
+    assert sorted(df['timestamp']) == [0, 2, 4, 6, 8]
+    assert all(df['double'] == 2 * df_original.loc[df.index, 'bytes_in'])
+    assert sorted(flags_results[0]['result']['timestamp']) == [6, 8]
+
+
+def test_execute_plan_concurrently(feature_engine):
+    df = pd.DataFrame({'host': ['a.com', 'bb.com', 'ccc.com', 'bb.com'], 'bytes_in': [1, 20, 3, 40]})
+    len_code = 'def host_len(host): return len(host)'
+    dots_code = 'def dots(host): return host.count(".")'
+    flag_code = 'def big(bytes_in): return bytes_in >= 20'
+    fields, metrics = feature_engine.parse_features([
+        {'name': 'bytes_in', 'multiplier': 1, 'type': 'field'},
+        {'name': 'host_len', 'multiplier': 1, 'data_needed': 'host', 'type': 'metric', 'function_code': b64encode(len_code.encode('ascii'))},
+        {'name': 'dots', 'multiplier': 1, 'data_needed': 'host', 'type': 'metric', 'function_code': b64encode(dots_code.encode('ascii'))}
+    ])
+    flags = feature_engine.parse_flags([{
+        'name': 'big', 'data_needed': 'bytes_in', 'function_code': b64encode(flag_code.encode('ascii')),
+        'type': 'direct', 'description': 'big', 'message': 'big', 'severity': 'low'
+    }])
+    plan = ExecutionPlan(fields, metrics, flags, [], list(df.columns))
+    feature_engine.workers = 2
+    #the metrics are evaluated with a single call, and the flags with another one
+    calls = []
+    evaluate_all = feature_engine.evaluate_all
+    feature_engine.evaluate_all = lambda df, fs: calls.append(([f['name'] for f in fs], list(df.columns))) or evaluate_all(df, fs)
+    outputs = feature_engine.execute_plan(plan, df)
+    #they read the columns selected by their inputs
+    assert sorted(calls) == [(['big'], ['bytes_in']), (['host_len', 'dots'], ['host'])]
+    #the thread pool is kept for the next chunks
+    threads = feature_engine.threads
+    feature_engine.execute_plan(plan, df.copy())
+    assert feature_engine.threads is threads
+    feature_engine.shutdown_workers()
+    assert feature_engine.threads is None
+    #intermediate inputs and metric results were released
+    assert 'input:host' not in outputs and 'metric:dots' not in outputs
+    assert list(outputs['features'].columns) == ['bytes_in', 'host_len', 'dots']
+    assert list(outputs['features']['host_len']) == [5, 6, 7, 6]
+    assert list(outputs['features']['dots']) == [1, 1, 1, 1]
+    flags_results = feature_engine.collect_flags(plan, outputs, df, flags)
+    assert list(flags_results[0]['result'].index) == [1, 3]
+    #while profiling every stage runs in this thread, memory is traced for the whole process
+    threads = []
+    feature_engine.evaluate_all = lambda df, fs: threads.append(threading.get_ident()) or evaluate_all(df, fs)
+    feature_engine.profiler = Profiler(True)
+    feature_engine.execute_plan(plan, df.copy())
+    assert threads == [threading.get_ident()] * 2
+    feature_engine.shutdown_workers()
+
+def test_combine_inputs():
+    df = pd.DataFrame({'a': [1, 2], 'b': [3, 4], 'c': [5, 6]})
+    combined = combine_inputs([df[['a', 'b']], df[['b', 'c']]])
+    assert list(combined.columns) == ['a', 'b', 'c']
+    assert combined.equals(df)
 
+class FakeRealTimeDriver():
+    batch_size = 100
+    batch_timeout = 0.02
+
+    #one batch in the middle of each pane
+    def __init__(self, batches, step):
+        self.batches = batches
+        self.step = step
+        self.given = 0
+        self.start = time.time()
+
+    def get_batch(self, max_records, timeout):
+        due = self.start + (self.given + 0.5) * self.step
+        if self.given < len(self.batches) and time.time() >= due:
+            self.given += 1
+            return self.batches[self.given - 1]
+        time.sleep(timeout)
+        return None
+
+def test_windowed_processing(feature_engine):
+    import itertools
+    batches = [pd.DataFrame({'timestamp': range(i * 3, i * 3 + 3), 'bytes_in': [10, 20, 30]}, index=range(i * 3, i * 3 + 3)) for i in range(3)]
+    double_code = 'def double(bytes_in): return 2 * bytes_in'
+    fields, metrics = feature_engine.parse_features([
+        {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+        {'name': 'double', 'multiplier': 1, 'data_needed': 'bytes_in', 'type': 'metric', 'function_code': b64encode(double_code.encode('ascii'))}
+    ])
+    flag_code = 'def big(bytes_in): return bytes_in >= 30'
+    count_code = 'def count(df, params): return df, "%d records" % len(df)'
+    flags = feature_engine.parse_flags([
+        {'name': 'big', 'data_needed': 'bytes_in', 'function_code': b64encode(flag_code.encode('ascii')),
+         'type': 'direct', 'description': 'big', 'message': 'big', 'severity': 'low'},
+        {'name': 'count', 'data_needed': 'timestamp', 'function_code': b64encode(count_code.encode('ascii')),
+         'type': 'aggregation', 'description': 'count', 'severity': 'low'}
+    ])
+    feature_engine.dedup = True
+    step = 0.2
+    in_driver = FakeRealTimeDriver(batches, step)
+    windows = feature_engine.windowed_processing(in_driver, fields, metrics, flags, [], 2 * step, step)
+    results = list(itertools.islice(windows, 2))
+    #sliding windows of two panes
+    assert [w for w, _, _ in results] == [0, 1]
+    assert list(results[0][1].index) == list(range(6))
+    assert list(results[1][1].index) == list(range(3, 9))
+    assert list(results[1][1]['double']) == [20, 40, 60] * 2
+    assert list(results[1][2][0]['result'].index) == [5, 8]
+    assert results[1][2][1]['message'] == '6 records'
+    #the shared pane was only evaluated once
+    assert feature_engine.evaluation_stats['double']['rows'] == 9
+    #the parsed flags are kept for the next windows
+    assert 'fn' in flags[0] and 'fn' not in results[0][2][0]
+    with pytest.raises(ValueError):
+        next(feature_engine.windowed_processing(in_driver, fields, metrics, flags, [], 0.3, 0.2))
+
+def test_realtime_skips_cache(tmp_path):
+    import itertools
+    cache = FeatureCache(str(tmp_path), 1024 * 1024)
+    feature_engine = FeatureEngine(CSVInputDriver(), CSVOutputDriver(), True, '', False, Console(), False, cache=cache)
+    assert feature_engine.cache is None
+    batches = [pd.DataFrame({'timestamp': range(i * 3, i * 3 + 3), 'bytes_in': [10, 20, 30]}, index=range(i * 3, i * 3 + 3)) for i in range(2)]
+    double_code = 'def double(bytes_in): return 2 * bytes_in'
+    fields, metrics = feature_engine.parse_features([
+        {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+        {'name': 'double', 'multiplier': 1, 'data_needed': 'bytes_in', 'type': 'metric', 'function_code': b64encode(double_code.encode('ascii'))}
+    ])
+    step = 0.2
+    windows = feature_engine.windowed_processing(FakeRealTimeDriver(batches, step), fields, metrics, [], [], 2 * step, step)
+    results = list(itertools.islice(windows, 2))
+    assert list(results[0][1]['double']) == [20, 40, 60] * 2
+    #no entry was written
+    assert list(tmp_path.iterdir()) == []
+
+def test_explain_doesnt_wait_for_records(tmp_path):
+    #a real time driver without records would block when asked for its fields
+    in_driver = TCPInputDriver()
+    in_driver.setup('localhost', 4051, 1)
+    in_driver.connect()
+    feature_engine = FeatureEngine(in_driver, CSVOutputDriver(), True, '', False, Console(), False)
+    double_code = 'def double(bytes_in): return 2 * bytes_in'
+    yaml_obj = {'features': [
+        {'name': 'timestamp', 'multiplier': 1, 'type': 'field'},
+        {'name': 'double', 'multiplier': 1, 'data_needed': 'bytes_in', 'type': 'metric', 'function_code': b64encode(double_code.encode('ascii'))}
+    ]}
+    with open(tmp_path / 'features.yaml', 'w') as f:
+        yaml.dump(yaml_obj, f, default_flow_style=False)
+    start = time.time()
+    plan = feature_engine.explain(str(tmp_path / 'features.yaml'))
+    in_driver.disconnect()
+    assert time.time() - start < 1
+    assert plan.nodes['load']['columns'] == ['timestamp', 'bytes_in']
+    assert 'metric:double' in plan.nodes
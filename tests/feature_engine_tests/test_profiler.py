@@ -0,0 +1,53 @@
+import json
+import os
+
+from feature_engine.profiler import Profiler
+
+dirname = os.path.dirname(__file__) + '/'
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(False)
+    with profiler.stage('metric', 'metric1', rows_in=10) as record:
+        record['rows_out'] = 10
+    assert profiler.stages == []
+
+def test_stages_summary():
+    profiler = Profiler(True)
+    profiler.start()
+    #same stage for two chunks
+    for rows in [10, 20]:
+        with profiler.stage('filter', 'filter1', rows_in=rows) as record:
+            data = [0] * 100000
+            record['rows_out'] = rows // 2
+    with profiler.stage('yaml', 'parse'):
+        pass
+    profiler.stop()
+    summary = {(s['kind'], s['name']): s for s in profiler.summary()}
+    filter_summary = summary[('filter', 'filter1')]
+    assert filter_summary['calls'] == 2
+    assert filter_summary['rows_in'] == 30
+    assert filter_summary['rows_out'] == 15
+    assert filter_summary['wall_time'] > 0
+    assert filter_summary['rows_per_second'] > 0
+    assert summary[('yaml', 'parse')]['rows_in'] is None
+    #saved as json
+    profiler.save(dirname + 'profile.json')
+    with open(dirname + 'profile.json') as f:
+        saved = json.load(f)
+    os.remove(dirname + 'profile.json')
+    assert len(saved['stages']) == 2
+
+def test_cpu_time_of_the_stage_thread():
+    import threading, time
+    profiler = Profiler(True)
+    def spin():
+        end = time.perf_counter() + 0.3
+        while time.perf_counter() < end: pass
+    thread = threading.Thread(target=spin)
+    thread.start()
+    #another thread using the CPU doesn't count for this stage
+    with profiler.stage('metric', 'sleep'):
+        time.sleep(0.3)
+    thread.join()
+    assert profiler.stages[0]['wall_time'] >= 0.3
+    assert profiler.stages[0]['cpu_time'] < 0.1
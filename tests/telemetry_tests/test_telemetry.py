@@ -0,0 +1,66 @@
+import pytest
+import threading
+import socket
+import json
+import time
+import urllib.request
+from telemetry import Counter, Gauge, Histogram, Registry, MetricsServer
+from data_drivers.TCPDriver import TCPInputDriver
+
+def test_counter_from_many_threads():
+    counter = Counter('test_total', 'Test counter')
+    threads = [threading.Thread(target=lambda: [counter.inc() for i in range(10000)]) for t in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert counter.value() == 40000
+
+def test_gauge_function():
+    values = [1, 2, 3]
+    gauge = Gauge('test_size', 'Test gauge', lambda: len(values))
+    values.append(4)
+    assert gauge.value() == 4
+
+def test_histogram_exposition():
+    histogram = Histogram('test_seconds', 'Test histogram', [0.1, 1])
+    for value in [0.05, 0.1, 0.5, 2]:
+        histogram.observe(value)
+    assert histogram.exposition().split('\n') == [
+        '# HELP test_seconds Test histogram',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        'test_seconds_sum 2.65',
+        'test_seconds_count 4']
+
+def test_registry_replaces_metrics():
+    registry = Registry()
+    registry.register(Counter('test_total', 'Old'))
+    counter = registry.register(Counter('test_total', 'New'))
+    counter.inc(5)
+    assert registry.exposition() == '# HELP test_total New\n# TYPE test_total counter\ntest_total 5\n'
+
+def test_metrics_server_and_tcp_driver():
+    registry = Registry()
+    input_driver = TCPInputDriver()
+    input_driver.setup('localhost', 4090, 0)
+    input_driver.register_metrics(registry)
+    input_driver.connect()
+    server = MetricsServer(registry, 'localhost', 0)
+    server.start()
+    sock = socket.create_connection(('localhost', 4090))
+    sock.sendall(b''.join(json.dumps({'id': i}).encode('utf-8') + b'\n' for i in range(10)) + b'{broken\n')
+    sock.close()
+    deadline = time.time() + 5
+    while input_driver.parse_errors == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    input_driver.get_batch(5, 1)
+    body = urllib.request.urlopen('http://localhost:%d/metrics' % server.port).read().decode('utf-8')
+    assert 'anomal_input_records_total 10' in body
+    assert 'anomal_input_decode_errors_total 1' in body
+    assert 'anomal_input_buffer_records 5' in body
+    assert 'anomal_tcp_connections_total 1' in body
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen('http://localhost:%d/other' % server.port)
+    assert server.stop()
+    assert input_driver.disconnect()